@@ -1,73 +1,395 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, make_response, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
-from datetime import datetime, date
+from flask_sqlalchemy.session import Session as SessaoFlask
+from sqlalchemy import text, event, create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from datetime import datetime, date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
 import os
+import sqlite3
+import io
+import csv
+import re
+import json
+import bisect
+import hashlib
+import functools
+import threading
+import contextlib
+import contextvars
+import queue
+import time
+import cProfile
+import pstats
+from collections import OrderedDict
 import calendar
+import math
+import itertools
+import click
+import gzip
+
+try:
+    import orjson  # opcional: serialização rápida das listas grandes (pip install orjson)
+except ImportError:
+    orjson = None
+try:
+    import brotli  # opcional: Content-Encoding br (pip install brotli)
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'financeiro.db')
+
+# Banco: SQLite ao lado do app por padrão; DATABASE_URL aponta para outro (ex.: PostgreSQL)
+_db_url = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'financeiro.db')
+if _db_url.startswith('postgres://'):
+    _db_url = 'postgresql://' + _db_url[len('postgres://'):]
+app.config['SQLALCHEMY_DATABASE_URI'] = _db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+
+# Pool de conexões (tamanho/overflow só valem para bancos servidor, não para SQLite)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes', 'on'),
+}
+if not _db_url.startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),  # segundos
+    })
+
+# SQLite: pragmas aplicados a cada nova conexão (WAL permite leituras durante escritas
+# com vários workers do gunicorn). Valor vazio na variável de ambiente desativa o pragma.
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT', '5000'),        # ms
+    'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'cache_size': os.environ.get('SQLITE_CACHE_SIZE', '-65536'),          # negativo = KiB (64 MB)
+}
+# Multi-tenant: cada requisição /api/ pertence a um tenant, lido do header APP_TENANT_HEADER. O header
+# deve vir do proxy que autentica o usuário (o app não autentica); sem ele vale o tenant padrão.
+#   APP_TENANT_HEADER=X-Tenant
+#   APP_TENANT_PADRAO=padrao    tenant sem header, de scripts e da CLI; dono dos dados anteriores aos tenants
+#   APP_TENANT_OBRIGATORIO=0    1 = requisição /api/ sem o header recebe 401
+#   APP_TENANT_CRIAR=0          1 = tenant desconhecido no header é criado no primeiro acesso (desenvolvimento);
+#                               senão recebe 404 e tenants novos vêm de `flask criar-tenant`
+#   APP_TENANT_ARQUIVOS=        pasta: um arquivo SQLite por tenant (<pasta>/<tenant>.db) em vez de DATABASE_URL;
+#                               cada tenant tem sua trava de escrita
+#   APP_TENANT_ENGINES=64       arquivos abertos ao mesmo tempo por processo (os menos usados são fechados)
+app.config['TENANT_HEADER'] = os.environ.get('APP_TENANT_HEADER') or 'X-Tenant'
+app.config['TENANT_PADRAO'] = os.environ.get('APP_TENANT_PADRAO') or 'padrao'
+app.config['TENANT_OBRIGATORIO'] = os.environ.get('APP_TENANT_OBRIGATORIO', '').lower() in ('1', 'true', 'yes', 'on')
+app.config['TENANT_CRIAR'] = os.environ.get('APP_TENANT_CRIAR', '').lower() in ('1', 'true', 'yes', 'on')
+app.config['TENANT_ARQUIVOS'] = os.environ.get('APP_TENANT_ARQUIVOS') or None
+app.config['TENANT_ENGINES'] = int(os.environ.get('APP_TENANT_ENGINES') or 64)
+
+class SessaoTenant(SessaoFlask):
+    """No modo um-arquivo-por-tenant, a sessão usa o engine do arquivo do tenant atual."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and app.config['TENANT_ARQUIVOS']:
+            return _engine_tenant(_tenant_slug())
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': SessaoTenant})
+
+@event.listens_for(Engine, 'connect')
+def _aplicar_pragmas_sqlite(dbapi_conn, _):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    for nome, valor in app.config['SQLITE_PRAGMAS'].items():
+        if valor not in (None, ''):
+            cur.execute(f"PRAGMA {nome}={valor}")
+    cur.close()
+
+# Dinheiro: guardado como inteiro em centavos (somas exatas no banco); em Python o atributo é float em reais
+def _para_centavos(v):
+    return int((Decimal(str(v)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def _para_reais(centavos):
+    return int(centavos) / 100
+
+class Centavos(db.TypeDecorator):
+    impl = db.BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return _para_centavos(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return _para_reais(value) if value is not None else None
+
+def _centavos(col):
+    """Coluna monetária como inteiro cru (centavos), para agregar no banco sem conversão."""
+    return db.type_coerce(col, db.BigInteger)
+
+# Instrumentação opcional (desligada por padrão):
+#   APP_INSTRUMENTACAO=1       latência por rota, nº/tempo de SQL, header Server-Timing e /metrics (Prometheus)
+#   APP_PROFILE_LENTAS_MS=500  grava perfil cProfile das requisições mais lentas que o limite
+# As métricas são por processo (com vários workers do gunicorn, cada um expõe as suas).
+app.config['INSTRUMENTACAO'] = os.environ.get('APP_INSTRUMENTACAO', '').lower() in ('1', 'true', 'yes', 'on')
+app.config['PROFILE_LENTAS_MS'] = float(os.environ.get('APP_PROFILE_LENTAS_MS') or 0)
+app.config['PROFILE_DIR'] = os.environ.get('APP_PROFILE_DIR') or os.path.join(basedir, 'profiles')
+
+# Migrações do schema ao importar o app (cada worker do gunicorn confere a versão ao subir)
+#   APP_MIGRAR=0              não migra na importação (rode `flask --app app migrar` no deploy)
+#   APP_MIGRACAO_ESPERA=600   segundos esperando outro processo terminar de migrar
+app.config['MIGRAR_AO_INICIAR'] = os.environ.get('APP_MIGRAR', '1').lower() in ('1', 'true', 'yes', 'on')
+app.config['MIGRACAO_ESPERA'] = float(os.environ.get('APP_MIGRACAO_ESPERA') or 600)
+
+# Eventos de alteração (log na tabela `evento`, lido por GET /api/stream em todos os workers)
+#   APP_EVENTOS=0              não grava eventos (e /api/stream responde 404)
+#   APP_SSE_INTERVALO=0.5      segundos entre leituras do log
+#   APP_SSE_DURACAO=300        segundos de cada conexão; o navegador reconecta sozinho (Last-Event-ID)
+# Só no SQLite: a entrega segue os ids do log, que lá crescem na ordem dos commits (um escritor por vez).
+# No PostgreSQL um id menor pode ser confirmado depois de um maior e o evento dele nunca seria entregue.
+app.config['EVENTOS'] = (os.environ.get('APP_EVENTOS', '1').lower() in ('1', 'true', 'yes', 'on')
+                         and (_db_url.startswith('sqlite') or bool(app.config['TENANT_ARQUIVOS'])))
+app.config['SSE_INTERVALO'] = float(os.environ.get('APP_SSE_INTERVALO') or 0.5)
+app.config['SSE_DURACAO'] = float(os.environ.get('APP_SSE_DURACAO') or 300)
+
+# Limite de requisições pesadas simultâneas por worker (exportações, relatório e analytics). Com workers
+# gthread (gunicorn.conf.py), sobram threads para as rotas leves mesmo com várias exportações em andamento.
+#   APP_LIMITE_PESADAS=4   0 = sem limite
+#   APP_LIMITE_ESPERA=10   segundos esperando vaga antes de responder 503
+app.config['LIMITE_PESADAS'] = int(os.environ.get('APP_LIMITE_PESADAS') or 4)
+app.config['LIMITE_ESPERA'] = float(os.environ.get('APP_LIMITE_ESPERA') or 10)
+
+# Respostas JSON: orjson quando instalado (APP_JSON=json força o módulo padrão). Nos dois casos datas saem
+# como AAAA-MM-DD, então as listas grandes passam date/datetime direto, sem strftime por linha.
+# Compressão conforme Accept-Encoding (br se o módulo brotli existir, senão gzip) acima de APP_GZIP_MIN bytes.
+#   APP_GZIP_MIN=1024   0 = não comprime
+#   APP_GZIP_NIVEL=5
+app.config['JSON_ORJSON'] = orjson is not None and os.environ.get('APP_JSON', 'orjson').lower() != 'json'
+app.config['GZIP_MIN'] = int(os.environ.get('APP_GZIP_MIN') or 1024)
+app.config['GZIP_NIVEL'] = int(os.environ.get('APP_GZIP_NIVEL') or 5)
+
+def _json_padrao(o):
+    if isinstance(o, date):  # datetime é subclasse de date
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return float(o)
+    raise TypeError(f"{type(o).__name__} não é serializável em JSON")
+
+class JSONRapido(DefaultJSONProvider):
+    """jsonify/app.json com orjson (bytes direto no corpo) ou json padrão, com a mesma saída."""
+    default = staticmethod(_json_padrao)
+    ensure_ascii = False
+    sort_keys = False
+
+    def _orjson(self, obj, indentar=False):
+        opcoes = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indentar else 0)
+        return orjson.dumps(obj, default=_json_padrao, option=opcoes)
+
+    def dumps(self, obj, **kwargs):
+        if not self._app.config['JSON_ORJSON'] or kwargs:
+            if 'indent' not in kwargs:
+                kwargs.setdefault('separators', (',', ':'))
+            return super().dumps(obj, **kwargs)
+        return self._orjson(obj).decode()
+
+    def response(self, *args, **kwargs):
+        if not self._app.config['JSON_ORJSON']:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self._orjson(obj, indentar) + b'\n', mimetype=self.mimetype)
+
+app.json = JSONRapido(app)
+
+LATENCIA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # segundos
+_metricas = {}  # (método, rota, status) -> [contagem por bucket..., soma, total, nº SQL, segundos SQL]
+_metricas_lock = threading.Lock()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _sql_inicio(conn, cursor, statement, parameters, context, executemany):
+    if app.config['INSTRUMENTACAO'] and has_request_context():
+        conn.info['instr_t0'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _sql_fim(conn, cursor, statement, parameters, context, executemany):
+    t0 = conn.info.pop('instr_t0', None)
+    if t0 is not None and has_request_context():
+        g.sql_n = g.get('sql_n', 0) + 1
+        g.sql_s = g.get('sql_s', 0.0) + time.perf_counter() - t0
+
+@app.before_request
+def _instr_inicio():
+    if not (app.config['INSTRUMENTACAO'] or app.config['PROFILE_LENTAS_MS']):
+        return
+    g.instr_t0 = time.perf_counter()
+    if app.config['PROFILE_LENTAS_MS']:
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def _instr_fim(resp):
+    t0 = g.pop('instr_t0', None)
+    if t0 is None:
+        return resp
+    dur = time.perf_counter() - t0
+    rota = request.url_rule.rule if request.url_rule else 'nao_encontrada'
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        if dur * 1000 >= app.config['PROFILE_LENTAS_MS']:
+            _salvar_perfil(profiler, rota, dur)
+
+    if app.config['INSTRUMENTACAO']:
+        sql_n, sql_s = g.get('sql_n', 0), g.get('sql_s', 0.0)
+        with _metricas_lock:
+            m = _metricas.setdefault((request.method, rota, resp.status_code), [0] * (len(LATENCIA_BUCKETS) + 4))
+            i = bisect.bisect_left(LATENCIA_BUCKETS, dur)
+            if i < len(LATENCIA_BUCKETS):
+                m[i] += 1
+            m[-4] += dur
+            m[-3] += 1
+            m[-2] += sql_n
+            m[-1] += sql_s
+        resp.headers.add('Server-Timing', f'app;dur={dur * 1000:.1f}, db;dur={sql_s * 1000:.1f};desc="{sql_n} queries"')
+    return resp
+
+def _salvar_perfil(profiler, rota, dur):
+    """Grava o perfil (.prof para snakeviz/pstats + .txt com as 40 funções mais caras)."""
+    try:
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        nome = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.method}-{re.sub(r'[^A-Za-z0-9]+', '_', rota).strip('_') or 'raiz'}"
+        caminho = os.path.join(app.config['PROFILE_DIR'], nome)
+        profiler.dump_stats(caminho + '.prof')
+        with open(caminho + '.txt', 'w') as f:
+            f.write(f"{request.method} {request.full_path} - {dur * 1000:.1f} ms\n\n")
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+        app.logger.warning("Requisição lenta (%.0f ms) %s %s: perfil em %s.prof", dur * 1000, request.method, rota, caminho)
+    except OSError as e:
+        app.logger.warning("Não foi possível gravar o perfil: %s", e)
+
+def _label(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not app.config['INSTRUMENTACAO']:
+        return jsonify({'error': 'Instrumentação desligada (defina APP_INSTRUMENTACAO=1)'}), 404
+    with _metricas_lock:
+        itens = sorted((k, list(v)) for k, v in _metricas.items())
+
+    linhas = ['# HELP http_request_duration_seconds Latência das requisições por rota.',
+              '# TYPE http_request_duration_seconds histogram']
+    for (metodo, rota, status), m in itens:
+        labels = f'method="{metodo}",route="{_label(rota)}",status="{status}"'
+        acumulado = 0
+        for le, n in zip(LATENCIA_BUCKETS, m):
+            acumulado += n
+            linhas.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {acumulado}')
+        linhas.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {m[-3]}')
+        linhas.append(f'http_request_duration_seconds_sum{{{labels}}} {m[-4]:.6f}')
+        linhas.append(f'http_request_duration_seconds_count{{{labels}}} {m[-3]}')
+    for nome, pos, ajuda in (('db_queries_total', -2, 'Comandos SQL executados por rota.'),
+                             ('db_query_duration_seconds_total', -1, 'Tempo gasto em SQL por rota.')):
+        linhas += [f'# HELP {nome} {ajuda}', f'# TYPE {nome} counter']
+        for (metodo, rota, status), m in itens:
+            valor = f'{m[pos]:.6f}' if isinstance(m[pos], float) else m[pos]
+            linhas.append(f'{nome}{{method="{metodo}",route="{_label(rota)}",status="{status}"}} {valor}')
+    return Response('\n'.join(linhas) + '\n', mimetype='text/plain; version=0.0.4')
 
 # Modelos do Banco de Dados
-class Ciclo(db.Model):
+class Tenant(db.Model):
+    """Dono dos dados (usuário/família), identificado pelo slug que o proxy manda no header."""
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(64), nullable=False, unique=True)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PorTenant:
+    """Coluna tenant_id: preenchida com o tenant atual; linhas anteriores aos tenants ficam no 1 (o padrão)."""
+    tenant_id = db.Column(db.Integer, nullable=False, default=lambda: _tenant_id(), server_default='1')
+
+class Ciclo(PorTenant, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
     data_inicio = db.Column(db.Date, nullable=False)
     data_fim = db.Column(db.Date, nullable=False)
-    orcamento = db.Column(db.Float, nullable=False)
-    ativo = db.Column(db.Boolean, default=True)
+    orcamento = db.Column(Centavos, nullable=False)
+    ativo = db.Column(db.Boolean, default=True)  # um ativo por tenant
+
+    __table_args__ = (
+        db.Index('ix_ciclo_tenant_inicio', 'tenant_id', 'data_inicio'),
+    )
 
-class GastoFixo(db.Model):
+class GastoFixo(PorTenant, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
+    valor = db.Column(Centavos, nullable=False)
     categoria = db.Column(db.String(50), nullable=False)
     forma_pgto = db.Column(db.String(10), nullable=False, default='Debito')  # Debito | Credito
-    ciclo_id = db.Column(db.Integer, db.ForeignKey('ciclo.id'), nullable=False, index=True)
+    ciclo_id = db.Column(db.Integer, db.ForeignKey('ciclo.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_gasto_fixo_tenant_ciclo', 'tenant_id', 'ciclo_id'),
+    )
 
     
-class Lancamento(db.Model):
+class Lancamento(PorTenant, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     data = db.Column(db.Date, nullable=False)
     descricao = db.Column(db.String(200), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
+    valor = db.Column(Centavos, nullable=False)
     categoria = db.Column(db.String(50), nullable=False)
     forma_pgto = db.Column(db.String(10), nullable=False, default='Debito')  # Debito | Credito
     divida_id = db.Column(db.Integer, nullable=True)
     parcela_num = db.Column(db.Integer, nullable=True)
     ultima_parcela = db.Column(db.Integer, nullable=False, default=0)  # 0=normal | 1=pagamento do final
 
-class Investimento(db.Model):
+    __table_args__ = (
+        # filtros por período (+ débito/crédito) e pagamentos por dívida, sempre dentro do tenant
+        db.Index('ix_lancamento_tenant_data_forma_pgto', 'tenant_id', 'data', 'forma_pgto'),
+        db.Index('ix_lancamento_tenant_divida_data', 'tenant_id', 'divida_id', 'data'),
+    )
+
+class Investimento(PorTenant, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
-    valor = db.Column(db.Float, nullable=False)
+    valor = db.Column(Centavos, nullable=False)
     tipo = db.Column(db.String(50), nullable=False)
 
-class CartaoCredito(db.Model):
+    __table_args__ = (
+        db.Index('ix_investimento_tenant', 'tenant_id'),
+    )
+
+class CartaoCredito(PorTenant, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
-    valor_atual = db.Column(db.Float, nullable=False)
-    limite = db.Column(db.Float, nullable=False)
+    valor_atual = db.Column(Centavos, nullable=False)
+    limite = db.Column(Centavos, nullable=False)
     data_vencimento = db.Column(db.Date, nullable=False)
 
-class Divida(db.Model):
+    __table_args__ = (
+        db.Index('ix_cartao_credito_tenant', 'tenant_id'),
+    )
+
+class Divida(PorTenant, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(120), nullable=False)          # Ex: Financiamento Carro
     tipo = db.Column(db.String(50), nullable=False)           # Ex: Financiamento, Empréstimo
-    saldo_inicial = db.Column(db.Float, nullable=False)
-    saldo_atual = db.Column(db.Float, nullable=False)
-    parcela_mensal = db.Column(db.Float, nullable=True)       # opcional
+    saldo_inicial = db.Column(Centavos, nullable=False)
+    saldo_atual = db.Column(Centavos, nullable=False)
+    parcela_mensal = db.Column(Centavos, nullable=True)       # opcional
     taxa_mensal = db.Column(db.Float, nullable=True)          # % ao mês (opcional)
     data_inicio = db.Column(db.Date, nullable=True)
     data_fim_prevista = db.Column(db.Date, nullable=True)
     total_parcelas = db.Column(db.Integer, nullable=True)
     status = db.Column(db.String(20), nullable=False, default='Ativa')  # Ativa | Quitada
 
+    __table_args__ = (
+        db.Index('ix_divida_tenant', 'tenant_id'),
+    )
+
 
-class ChecklistStatus(db.Model):
+class ChecklistStatus(PorTenant, db.Model):
     __tablename__ = 'checklist_status'
     id = db.Column(db.Integer, primary_key=True)
     ciclo_id = db.Column(db.Integer, nullable=False)
@@ -77,13 +399,414 @@ class ChecklistStatus(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     __table_args__ = (
-        db.UniqueConstraint('ciclo_id', 'tipo', 'ref_id', name='uq_checklist_item'),
+        db.UniqueConstraint('ciclo_id', 'tipo', 'ref_id', name='uq_checklist_item'),  # ciclo_id já é de um tenant
+        db.Index('ix_checklist_status_tenant_ciclo', 'tenant_id', 'ciclo_id'),
+    )
+
+
+class ResumoCategoria(PorTenant, db.Model):
+    """Soma/quantidade de lançamentos por (ciclo, categoria, forma_pgto), mantida junto com cada escrita."""
+    __tablename__ = 'resumo_categoria'
+    ciclo_id = db.Column(db.Integer, primary_key=True)
+    categoria = db.Column(db.String(50), primary_key=True)
+    forma_pgto = db.Column(db.String(10), primary_key=True)
+    total = db.Column(Centavos, nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_resumo_categoria_tenant_ciclo', 'tenant_id', 'ciclo_id'),
     )
 
 
+class VersaoTabela(PorTenant, db.Model):
+    """Contador por (tenant, tabela), incrementado na mesma transação de cada escrita (invalida o cache de respostas)."""
+    __tablename__ = 'versao_tabela'
+    tenant_id = db.Column(db.Integer, primary_key=True, default=lambda: _tenant_id(), server_default='1')
+    tabela = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Evento(PorTenant, db.Model):
+    """Log de alterações (tabela, operação, id, linha nova), gravado na transação da escrita; alimenta /api/stream."""
+    __tablename__ = 'evento'
+    __table_args__ = (
+        db.Index('ix_evento_tenant_id', 'tenant_id', 'id'),  # replay de um tenant (Last-Event-ID)
+        {'sqlite_autoincrement': True},  # ids nunca reaproveitados (Last-Event-ID dos clientes)
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    tabela = db.Column(db.String(50), nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # insert | update | delete | lote
+    ref_id = db.Column(db.Integer)
+    dados = db.Column(db.Text)  # JSON da linha, no formato das rotas GET
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Tenant atual: o do header em cada requisição /api/, o de usar_tenant() em scripts; fora disso, o 1 (padrão).
+# As consultas do ORM recebem o filtro tenant_id automaticamente (_filtrar_tenant); INSERTs recebem o
+# tenant_id pelo default da coluna. SQL montado sobre Table (Core) precisa filtrar explicitamente.
+TENANT_SLUG = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+_tenant_atual = contextvars.ContextVar('tenant_atual', default=None)  # (slug, id)
+_tenant_ids = {}  # slug -> id, por processo
+_tenant_migrados = set()  # modo arquivos: tenants cujo arquivo já foi conferido/migrado neste processo
+
+def _tenant_slug():
+    t = _tenant_atual.get()
+    return t[0] if t else app.config['TENANT_PADRAO']
+
+def _tenant_id():
+    t = _tenant_atual.get()
+    return t[1] if t else 1
+
+def _arquivo_tenant(slug):
+    return os.path.join(app.config['TENANT_ARQUIVOS'], f'{slug}.db')
+
+def _resolver_tenant(slug, criar=False):
+    """(slug, id) do tenant; no primeiro acesso migra o arquivo dele. ValueError se inválido, LookupError se
+    não existe e não pode ser criado aqui (criar, APP_TENANT_CRIAR ou o tenant padrão)."""
+    if not TENANT_SLUG.match(slug or ''):
+        raise ValueError(f'Tenant inválido: {slug!r} (use letras minúsculas, números, _ e -)')
+    criar = criar or app.config['TENANT_CRIAR'] or slug == app.config['TENANT_PADRAO']
+    if app.config['TENANT_ARQUIVOS']:
+        # cada arquivo tem um tenant só, sempre o 1
+        if slug not in _tenant_migrados:
+            if not criar and not os.path.exists(_arquivo_tenant(slug)):
+                raise LookupError(f'Tenant não encontrado: {slug}')
+            token = _tenant_atual.set((slug, 1))
+            try:
+                migrar()
+            finally:
+                _tenant_atual.reset(token)
+            _tenant_migrados.add(slug)
+        return slug, 1
+    tid = _tenant_ids.get(slug)
+    if tid is None:
+        t = Tenant.__table__
+        conn = db.session.connection()  # Core: sem versões/eventos da sessão
+        tid = conn.execute(db.select(t.c.id).where(t.c.slug == slug)).scalar()
+        if tid is None:
+            if not criar:
+                db.session.rollback()
+                raise LookupError(f'Tenant não encontrado: {slug}')
+            conn.execute(_upsert_insert()(t).values(slug=slug, criado_em=datetime.utcnow())
+                         .on_conflict_do_nothing(index_elements=['slug']))
+            tid = conn.execute(db.select(t.c.id).where(t.c.slug == slug)).scalar()
+        db.session.commit()
+        _tenant_ids[slug] = tid
+    return slug, tid
+
+@contextlib.contextmanager
+def usar_tenant(slug, criar=False):
+    """Executa o bloco como o tenant `slug` (scripts, CLI); com criar, cria o tenant se ainda não existe."""
+    token = _tenant_atual.set(_resolver_tenant(slug, criar))
+    try:
+        yield
+    finally:
+        _tenant_atual.reset(token)
+
+def com_tenant(f):
+    """Opção --tenant num comando da CLI: o comando roda como esse tenant (padrão: APP_TENANT_PADRAO)."""
+    @click.option('--tenant', help='Tenant (padrão: APP_TENANT_PADRAO)')
+    @functools.wraps(f)
+    def wrapper(*args, tenant=None, **kwargs):
+        tenant = tenant or app.config['TENANT_PADRAO']
+        try:
+            _resolver_tenant(tenant)
+        except (ValueError, LookupError) as e:
+            raise click.BadParameter(str(e), param_hint='--tenant')
+        with usar_tenant(tenant):
+            return f(*args, **kwargs)
+    return wrapper
+
+@app.before_request
+def _definir_tenant():
+    if not request.path.startswith('/api/'):
+        return None
+    slug = request.headers.get(app.config['TENANT_HEADER'], '').strip().lower()
+    if not slug:
+        if app.config['TENANT_OBRIGATORIO']:
+            return jsonify({'error': f"Tenant não informado (header {app.config['TENANT_HEADER']})"}), 401
+        slug = app.config['TENANT_PADRAO']
+    try:
+        g.tenant = _resolver_tenant(slug)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    _tenant_atual.set(g.tenant)
+    return None
+
+@app.teardown_request
+def _limpar_tenant(_):
+    if g.pop('tenant', None) is not None:
+        _tenant_atual.set(None)
+
+# Modo um-arquivo-por-tenant: engines abertos num LRU (cada um com seu pool de conexões)
+_engines_tenant = OrderedDict()
+_engines_tenant_lock = threading.Lock()
+
+def _engine_tenant(slug):
+    with _engines_tenant_lock:
+        engine = _engines_tenant.get(slug)
+        if engine is not None:
+            _engines_tenant.move_to_end(slug)
+            return engine
+        os.makedirs(app.config['TENANT_ARQUIVOS'], exist_ok=True)
+        engine = create_engine('sqlite:///' + _arquivo_tenant(slug), **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        _engines_tenant[slug] = engine
+        while len(_engines_tenant) > app.config['TENANT_ENGINES']:
+            _, velho = _engines_tenant.popitem(last=False)
+            velho.dispose()  # conexões em uso seguem até o fim e são fechadas ao voltar ao pool
+        return engine
+
+# Registrado antes dos outros listeners de do_orm_execute: eles executam a instrução (invoke_statement)
+@event.listens_for(db.session, 'do_orm_execute')
+def _filtrar_tenant(estado):
+    """SELECT/UPDATE/DELETE do ORM só enxergam as linhas do tenant atual (inclusive em subconsultas e joins)."""
+    if not (estado.is_select or estado.is_update or estado.is_delete):
+        return None
+    if estado.execution_options.get('todos_tenants'):
+        return None
+    tenant_id = _tenant_id()
+    estado.statement = estado.statement.options(db.with_loader_criteria(
+        PorTenant, lambda cls: cls.tenant_id == tenant_id, include_aliases=True))
+    return None
+
+
+# Versões por tabela (e tenant): toda escrita feita pela sessão (ORM ou INSERT/UPDATE/DELETE direto)
+# incrementa a versão da tabela na mesma transação, então vale para todos os workers.
+def _incrementar_versoes(conn, tabelas):
+    tabelas = sorted(set(tabelas) - {VersaoTabela.__tablename__})
+    if not tabelas:
+        return
+    # Upsert: a 1ª escrita de um tenant novo cria a linha; dois workers criando juntos não colidem na chave
+    t = VersaoTabela.__table__
+    stmt = _upsert_insert()(t).values([{'tenant_id': _tenant_id(), 'tabela': tab, 'versao': 1} for tab in tabelas])
+    conn.execute(stmt.on_conflict_do_update(index_elements=['tenant_id', 'tabela'],
+                                            set_={'versao': t.c.versao + 1}))
+
+@event.listens_for(db.session, 'after_flush')
+def _versoes_apos_flush(session, _):
+    objs = itertools.chain(session.new, session.dirty, session.deleted)
+    _incrementar_versoes(session.connection(), {o.__table__.name for o in objs if hasattr(o, '__table__')})
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _versoes_dml(estado):
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return None
+    resultado = estado.invoke_statement()
+    tabela = getattr(estado.statement, 'table', None)
+    if tabela is not None:
+        _incrementar_versoes(estado.session.connection(), {tabela.name})
+    return resultado
+
+def _versoes(tabelas):
+    rows = (VersaoTabela.query
+            .filter(VersaoTabela.tabela.in_(tabelas))
+            .with_entities(VersaoTabela.tabela, VersaoTabela.versao)
+            .all())
+    atual = dict(rows)
+    return tuple(atual.get(t, 0) for t in tabelas)
+
+
+# Compressão das respostas (Content-Encoding negociado pelo Accept-Encoding). Exportações em streaming
+# passam direto; respostas do cache_resposta já são guardadas comprimidas, uma entrada por codificação.
+COMPRIMIVEIS = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+
+def _codificacao():
+    """'br', 'gzip' ou None para a requisição atual."""
+    if not app.config['GZIP_MIN']:
+        return None
+    aceitas = request.accept_encodings
+    if brotli is not None and aceitas['br']:
+        return 'br'
+    if aceitas['gzip']:
+        return 'gzip'
+    return None
+
+def _comprimir(resp, cod):
+    if (cod is None or resp.status_code != 200 or resp.is_streamed or resp.direct_passthrough
+            or 'Content-Encoding' in resp.headers or resp.mimetype not in COMPRIMIVEIS):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    corpo = resp.get_data()
+    if len(corpo) < app.config['GZIP_MIN']:
+        return resp
+    if cod == 'br':
+        resp.set_data(brotli.compress(corpo, quality=app.config['GZIP_NIVEL']))
+    else:
+        resp.set_data(gzip.compress(corpo, compresslevel=app.config['GZIP_NIVEL'], mtime=0))
+    resp.headers['Content-Encoding'] = cod
+    return resp
+
+@app.after_request
+def _comprimir_resposta(resp):
+    return _comprimir(resp, _codificacao())
+
+# Cache de respostas (LRU em memória, por processo) + ETag/If-None-Match.
+# A chave inclui o tenant e as versões das tabelas lidas, então entradas antigas só envelhecem.
+RESPOSTAS_CACHE_MAX_BYTES = int(os.environ.get('RESPOSTAS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+_respostas_cache = OrderedDict()
+_respostas_cache_bytes = 0
+_respostas_cache_lock = threading.Lock()
+
+def _cache_get(chave):
+    with _respostas_cache_lock:
+        item = _respostas_cache.get(chave)
+        if item is not None:
+            _respostas_cache.move_to_end(chave)
+        return item
+
+def _cache_put(chave, corpo, mimetype, codificacao):
+    global _respostas_cache_bytes
+    if len(corpo) > RESPOSTAS_CACHE_MAX_BYTES // 4:
+        return
+    with _respostas_cache_lock:
+        if chave in _respostas_cache:
+            return
+        _respostas_cache[chave] = (corpo, mimetype, codificacao)
+        _respostas_cache_bytes += len(corpo)
+        while _respostas_cache_bytes > RESPOSTAS_CACHE_MAX_BYTES:
+            _, (velho, *_) = _respostas_cache.popitem(last=False)
+            _respostas_cache_bytes -= len(velho)
+
+def cache_resposta(*tabelas, por_dia=False):
+    """Cacheia a resposta JSON do GET enquanto as `tabelas` não mudarem; responde 304 se o ETag bater.
+    `por_dia`: a resposta usa a data de hoje (ex.: previsões de dívidas sem pagamento) e vence à meia-noite.
+
+    Acerto no cache (ou 304) não é de graça: custa uma consulta, as versões das `tabelas` em versao_tabela
+    (pela chave primária), que valem para todos os workers. Só o corpo deixa de ser recalculado."""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            # versões antes dos dados: no pior caso um dado mais novo fica sob uma versão velha (nunca o contrário)
+            versoes = _versoes(tabelas)
+            cod = _codificacao()  # cada codificação é uma representação, com ETag própria
+            chave = (_tenant_slug(), request.endpoint, tuple(sorted(kwargs.items())),
+                     tuple(sorted(request.args.items(multi=True))), versoes, cod)
+            if por_dia:
+                chave += (date.today(),)
+            etag = hashlib.sha1(repr(chave).encode()).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                resp = Response(status=304)
+            else:
+                item = _cache_get(chave)
+                if item is None:
+                    resp = make_response(f(*args, **kwargs))
+                    if resp.status_code != 200 or resp.is_streamed:
+                        return resp
+                    _comprimir(resp, cod)
+                    item = (resp.get_data(), resp.mimetype, resp.headers.get('Content-Encoding'))
+                    _cache_put(chave, *item)
+                resp = Response(item[0], mimetype=item[1])
+                if item[2]:
+                    resp.headers['Content-Encoding'] = item[2]
+            resp.vary.add('Accept-Encoding')
+            resp.set_etag(etag)
+            resp.headers['Cache-Control'] = 'no-cache'
+            return resp
+        wrapper.cache_tabelas = tabelas
+        return wrapper
+    return decorator
+
+# Semáforo por grupo de rotas (por processo), criado no 1º uso com o limite LIMITE_<GRUPO> da config
+_limites = {}
+_limites_lock = threading.Lock()
+
+def _semaforo(grupo):
+    with _limites_lock:
+        if grupo not in _limites:
+            n = app.config[f'LIMITE_{grupo.upper()}']
+            _limites[grupo] = threading.BoundedSemaphore(n) if n > 0 else None
+        return _limites[grupo]
+
+def limitar(grupo, se=None):
+    """Limita as execuções simultâneas da rota ao limite do grupo; 503 se a vaga não abrir em LIMITE_ESPERA.
+
+    `se`: função sem argumentos chamada a cada requisição; se devolver falso a requisição não ocupa vaga.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            sem = _semaforo(grupo)
+            if sem is None or (se is not None and not se()):
+                return f(*args, **kwargs)
+            if not sem.acquire(timeout=app.config['LIMITE_ESPERA']):
+                resp = jsonify({'error': 'Servidor ocupado, tente novamente'})
+                resp.status_code = 503
+                resp.headers['Retry-After'] = '1'
+                return resp
+            try:
+                resp = make_response(f(*args, **kwargs))
+            except BaseException:
+                sem.release()
+                raise
+            if resp.is_streamed:
+                resp.call_on_close(sem.release)  # exportação: a vaga fica ocupada até o fim do streaming
+            else:
+                sem.release()
+            return resp
+        return wrapper
+    return decorator
+
+
+
+class IndiceCiclos:
+    """Intervalos (data_inicio, data_fim) dos ciclos ordenados, para achar o ciclo de uma data com bisect."""
+
+    def __init__(self, ciclos, versao=None):
+        self.versao = versao
+        self.ciclos = sorted(ciclos)  # [(data_inicio, data_fim, id)]
+        self.inicios = [c[0] for c in self.ciclos]
+        # maior data_fim até cada posição: permite parar a busca para trás cedo
+        self.max_fim = list(itertools.accumulate((c[1] for c in self.ciclos), max))
+
+    def buscar(self, d):
+        """Id do ciclo que contém `d` (o de início mais recente, se houver sobreposição) ou None."""
+        i = bisect.bisect_right(self.inicios, d) - 1
+        while i >= 0 and self.max_fim[i] >= d:
+            if self.ciclos[i][1] >= d:
+                return self.ciclos[i][2]
+            i -= 1
+        return None
+
+    def sobreposicoes(self):
+        """Pares (id_a, id_b) de ciclos cujos períodos se sobrepõem."""
+        pares = []
+        for i, (inicio, _, cid) in enumerate(self.ciclos):
+            j = i - 1
+            while j >= 0 and self.max_fim[j] >= inicio:
+                if self.ciclos[j][1] >= inicio:
+                    pares.append((self.ciclos[j][2], cid))
+                j -= 1
+        return pares
+
+# Cache por processo e tenant; as rotas de ciclo invalidam, e a versão da tabela ciclo
+# detecta alterações feitas por outros workers.
+_indice_ciclos_cache = {}
+
+def _indice_ciclos():
+    idx = _indice_ciclos_cache.get(_tenant_slug())
+    versao = _versoes(('ciclo',))[0]
+    if idx is None or idx.versao != versao:
+        idx = IndiceCiclos(Ciclo.query.with_entities(Ciclo.data_inicio, Ciclo.data_fim, Ciclo.id).all(), versao)
+        _indice_ciclos_cache[_tenant_slug()] = idx
+    return idx
+
+def _invalidar_indice_ciclos():
+    _indice_ciclos_cache.pop(_tenant_slug(), None)
+
+def _aviso_sobreposicao(ciclo_id):
+    """Mensagem de aviso se o ciclo se sobrepõe a outros (ou None)."""
+    outros = sorted({a if b == ciclo_id else b for a, b in _indice_ciclos().sobreposicoes() if ciclo_id in (a, b)})
+    if not outros:
+        return None
+    nomes = [n for (n,) in Ciclo.query.filter(Ciclo.id.in_(outros)).with_entities(Ciclo.nome).all()]
+    return f"Atenção: o período deste ciclo se sobrepõe a: {', '.join(nomes)}"
+
 def _ciclo_para_data(data_lanc):
-    """Retorna o ciclo que contém a data informada (ou None)."""
-    return Ciclo.query.filter(Ciclo.data_inicio <= data_lanc, Ciclo.data_fim >= data_lanc).first()
+    """Retorna o id do ciclo que contém a data informada (ou None)."""
+    return _indice_ciclos().buscar(data_lanc)
 
 def _add_months(dt, months: int):
     if dt is None:
@@ -129,40 +852,139 @@ def criar_ciclo():
         ativo=True
     )
     db.session.add(novo_ciclo)
-    db.session.commit()
+    db.session.flush()  # precisa do id para copiar os fixos
 
-    # COPIA fixos do ciclo anterior -> novo ciclo
+    # COPIA fixos do ciclo anterior -> novo ciclo (mesma transação: o ciclo nunca aparece sem fixos)
     if ciclo_anterior:
-        fixos_antigos = GastoFixo.query.filter_by(ciclo_id=ciclo_anterior.id).all()
-        for f in fixos_antigos:
-            db.session.add(GastoFixo(
-                nome=f.nome,
-                valor=f.valor,
-                categoria=f.categoria,
-                forma_pgto=getattr(f, 'forma_pgto', 'Debito'),
-                ciclo_id=novo_ciclo.id
-            ))
-        db.session.commit()
+        _copiar_fixos(ciclo_anterior.id, [novo_ciclo.id])
+    _rollup_reconstruir([(novo_ciclo.data_inicio, novo_ciclo.data_fim)])  # lançamentos do período passam para ele
+    db.session.commit()
+    _invalidar_indice_ciclos()
+
+    resp = {'message': 'Ciclo criado com sucesso', 'id': novo_ciclo.id}
+    aviso = _aviso_sobreposicao(novo_ciclo.id)
+    if aviso:
+        resp['aviso'] = aviso
+    return jsonify(resp), 201
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+def _copiar_fixos(origem_id, destino_ids):
+    """Copia os fixos de um ciclo para outros com um único INSERT ... SELECT (só entre ciclos do tenant atual)."""
+    gf = GastoFixo.__table__
+    tenant_id = _tenant_id()
+    destinos = (db.select(Ciclo.id).where(Ciclo.id.in_(destino_ids), Ciclo.tenant_id == tenant_id)).subquery()
+    origem = (db.select(gf.c.nome, gf.c.valor, gf.c.categoria, gf.c.forma_pgto, destinos.c.id, gf.c.tenant_id)
+              .select_from(gf.join(destinos, db.true()))
+              .where(gf.c.ciclo_id == origem_id, gf.c.tenant_id == tenant_id))
+    db.session.execute(gf.insert().from_select(['nome', 'valor', 'categoria', 'forma_pgto', 'ciclo_id', 'tenant_id'],
+                                               origem))
+
+def gerar_ciclos(data_inicio, orcamento, meses=None, data_fim=None, fixos_de=None):
+    """Cria ciclos mensais consecutivos a partir de `data_inicio` (até `meses` ciclos ou até `data_fim`).
+
+    Os fixos de `fixos_de` são clonados para todos; tudo numa transação. Não altera o ciclo ativo.
+    Retorna (ids, erro).
+    """
+    periodos = []
+    inicio = data_inicio
+    while (meses is None or len(periodos) < meses) and (data_fim is None or inicio <= data_fim):
+        proximo = _add_months(data_inicio, len(periodos) + 1)
+        periodos.append((inicio, proximo - timedelta(days=1)))
+        inicio = proximo
+        if len(periodos) > 1200:
+            return [], 'Período longo demais (máximo 100 anos)'
+    if not periodos:
+        return [], 'Nenhum ciclo no período informado'
+
+    indice = _indice_ciclos()
+    conflitos = sorted({cid for ini, fim in periodos for (i, f, cid) in indice.ciclos if i <= fim and f >= ini})
+    if conflitos:
+        return [], f"Já existem ciclos nesse período (ids: {', '.join(map(str, conflitos))})"
+
+    novos = [Ciclo(nome=f"{MESES[fim.month - 1]} {fim.year}", data_inicio=ini, data_fim=fim,
+                   orcamento=orcamento, ativo=False) for ini, fim in periodos]
+    db.session.add_all(novos)
+    db.session.flush()
+    ids = [c.id for c in novos]
+    if fixos_de:
+        _copiar_fixos(fixos_de, ids)
+    _rollup_reconstruir(periodos)  # lançamentos antigos sem ciclo podem cair nos novos
+    db.session.commit()
+    _invalidar_indice_ciclos()
+    return ids, None
 
-    return jsonify({'message': 'Ciclo criado com sucesso', 'id': novo_ciclo.id}), 201
+@app.route('/api/ciclos/gerar', methods=['POST'])
+def gerar_ciclos_api():
+    data = request.json or {}
+    try:
+        data_inicio = datetime.strptime(data['data_inicio'], '%Y-%m-%d').date()
+        data_fim = datetime.strptime(data['data_fim'], '%Y-%m-%d').date() if data.get('data_fim') else None
+        meses = int(data['meses']) if data.get('meses') not in (None, '') else None
+        orcamento = float(data['orcamento'])
+        # ausente/null: fixos do ciclo ativo; "" ou 0: não copia
+        fixos_de = data.get('copiar_fixos_de')
+        fixos_de = int(fixos_de) if fixos_de not in (None, '') else fixos_de
+    except KeyError as e:
+        return jsonify({'error': f"Campo obrigatório ausente: {e.args[0]}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if meses is None and data_fim is None:
+        return jsonify({'error': 'Informe meses ou data_fim'}), 400
+
+    if fixos_de is None:
+        ativo = Ciclo.query.filter_by(ativo=True).first()
+        fixos_de = ativo.id if ativo else None
+
+    ids, erro = gerar_ciclos(data_inicio, orcamento, meses=meses, data_fim=data_fim, fixos_de=fixos_de or None)
+    if erro:
+        return jsonify({'error': erro}), 400
+    return jsonify({'message': f'{len(ids)} ciclo(s) criado(s)', 'ids': ids}), 201
+
+@app.cli.command('gerar-ciclos')
+@com_tenant
+@click.option('--inicio', required=True, help='Data inicial (AAAA-MM-DD)')
+@click.option('--meses', type=int, help='Quantidade de ciclos mensais')
+@click.option('--fim', help='Gera ciclos até esta data (AAAA-MM-DD)')
+@click.option('--orcamento', type=float, required=True)
+@click.option('--fixos-de', type=int, help='Ciclo de onde copiar os fixos (padrão: ciclo ativo)')
+def gerar_ciclos_cli(inicio, meses, fim, orcamento, fixos_de):
+    """Gera ciclos mensais para um período (backfill de histórico)."""
+    if meses is None and fim is None:
+        raise click.UsageError('Informe --meses ou --fim')
+    if fixos_de is None:
+        ativo = Ciclo.query.filter_by(ativo=True).first()
+        fixos_de = ativo.id if ativo else None
+    ids, erro = gerar_ciclos(datetime.strptime(inicio, '%Y-%m-%d').date(), orcamento, meses=meses,
+                             data_fim=datetime.strptime(fim, '%Y-%m-%d').date() if fim else None,
+                             fixos_de=fixos_de)
+    if erro:
+        raise click.ClickException(erro)
+    click.echo(f"{len(ids)} ciclo(s) criado(s).")
 
 # API - Ciclos (listar/ativar/editar/deletar)
 @app.route('/api/ciclos', methods=['GET'])
+@cache_resposta('ciclo')
 def listar_ciclos():
     ciclos = Ciclo.query.order_by(Ciclo.data_inicio.desc()).all()
-    return jsonify([{
+    return jsonify([_ciclo_dict(c) for c in ciclos])
+
+def _ciclo_dict(c):
+    return {
         'id': c.id,
         'nome': c.nome,
         'data_inicio': c.data_inicio.strftime('%Y-%m-%d'),
         'data_fim': c.data_fim.strftime('%Y-%m-%d'),
         'orcamento': c.orcamento,
         'ativo': c.ativo
-    } for c in ciclos])
+    }
 
 @app.route('/api/ciclos/<int:id>', methods=['PUT'])
 def atualizar_ciclo(id):
     ciclo = Ciclo.query.get_or_404(id)
     data = request.json or {}
+    antes = (ciclo.data_inicio, ciclo.data_fim)
     if 'nome' in data:
         ciclo.nome = data['nome']
     if 'data_inicio' in data:
@@ -171,8 +993,16 @@ def atualizar_ciclo(id):
         ciclo.data_fim = datetime.strptime(data['data_fim'], '%Y-%m-%d').date()
     if 'orcamento' in data:
         ciclo.orcamento = float(data['orcamento'])
+    if 'data_inicio' in data or 'data_fim' in data:
+        _rollup_reconstruir([antes, (ciclo.data_inicio, ciclo.data_fim)], [ciclo.id])
     db.session.commit()
-    return jsonify({'message': 'Ciclo atualizado'}), 200
+    _invalidar_indice_ciclos()
+
+    resp = {'message': 'Ciclo atualizado'}
+    aviso = _aviso_sobreposicao(ciclo.id)
+    if aviso:
+        resp['aviso'] = aviso
+    return jsonify(resp), 200
 
 @app.route('/api/ciclos/<int:id>/ativar', methods=['POST'])
 def ativar_ciclo(id):
@@ -180,17 +1010,25 @@ def ativar_ciclo(id):
     ciclo = Ciclo.query.get_or_404(id)
     ciclo.ativo = True
     db.session.commit()
+    _invalidar_indice_ciclos()
     return jsonify({'message': 'Ciclo ativado'}), 200
 
 @app.route('/api/ciclos/<int:id>', methods=['DELETE'])
 def deletar_ciclo(id):
     ciclo = Ciclo.query.get_or_404(id)
+    periodo = (ciclo.data_inicio, ciclo.data_fim)
+    # Fixos e checklist são do ciclo: saem junto (no PostgreSQL a FK de gasto_fixo barraria o DELETE)
+    GastoFixo.query.filter_by(ciclo_id=id).delete(synchronize_session=False)
+    ChecklistStatus.query.filter_by(ciclo_id=id).delete(synchronize_session=False)
     db.session.delete(ciclo)
+    _rollup_reconstruir([periodo], [id])
     db.session.commit()
+    _invalidar_indice_ciclos()
     return jsonify({'message': 'Ciclo deletado'}), 200
 
 # API - Gastos Fixos
 @app.route('/api/gastos-fixos', methods=['GET'])
+@cache_resposta('gasto_fixo', 'ciclo')
 def get_gastos_fixos():
     ciclo_id = request.args.get('ciclo_id', type=int)
 
@@ -205,14 +1043,17 @@ def get_gastos_fixos():
 
     gastos = q.order_by(GastoFixo.id.desc()).all()
 
-    return jsonify([{
+    return jsonify([_gasto_fixo_dict(g) for g in gastos])
+
+def _gasto_fixo_dict(g):
+    return {
         'id': g.id,
         'nome': g.nome,
         'valor': g.valor,
         'categoria': g.categoria,
         'forma_pgto': getattr(g, 'forma_pgto', 'Debito'),
         'ciclo_id': g.ciclo_id
-    } for g in gastos])
+    }
 
 @app.route('/api/gastos-fixos', methods=['POST'])
 def criar_gasto_fixo():
@@ -225,6 +1066,7 @@ def criar_gasto_fixo():
         if not ciclo_ativo:
             return jsonify({'error': 'Nenhum ciclo ativo e ciclo_id não informado'}), 400
         ciclo_id = ciclo_ativo.id
+    Ciclo.query.get_or_404(int(ciclo_id))  # ciclo de outro tenant: 404
 
     novo_gasto = GastoFixo(
         nome=data['nome'],
@@ -262,27 +1104,83 @@ def deletar_gasto_fixo(id):
     return jsonify({'message': 'Gasto fixo deletado'}), 200
 
 # API - Lançamentos
+
+# Campos expostos por /api/lancamentos (campo -> coluna); ?fields= escolhe um subconjunto.
+# Datas ficam como date: o serializador JSON (e o csv) já escrevem AAAA-MM-DD.
+LANCAMENTO_CAMPOS = {
+    'id': Lancamento.id,
+    'data': Lancamento.data,
+    'descricao': Lancamento.descricao,
+    'valor': Lancamento.valor,
+    'categoria': Lancamento.categoria,
+    'forma_pgto': Lancamento.forma_pgto,
+
+    # ✅ NOVOS (pra não “sumir” ao editar)
+    'divida_id': Lancamento.divida_id,
+    'parcela_num': Lancamento.parcela_num,
+    'ultima_parcela': db.func.coalesce(Lancamento.ultima_parcela, 0),
+}
+LANCAMENTOS_LIMITE_MAX = 1000
+
 @app.route('/api/lancamentos', methods=['GET'])
+@cache_resposta('lancamento', 'ciclo')
+@limitar('pesadas', se=lambda: not request.args.get('limit') and not request.args.get('cursor'))
 def get_lancamentos():
     ciclo_id = request.args.get('ciclo_id', type=int)
-    query = Lancamento.query
-    if ciclo_id:
-        ciclo = Ciclo.query.get_or_404(ciclo_id)
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+
+    campos = list(LANCAMENTO_CAMPOS)
+    if request.args.get('fields'):
+        campos = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        invalidos = [f for f in campos if f not in LANCAMENTO_CAMPOS]
+        if invalidos:
+            return jsonify({'error': f"Campos inválidos: {', '.join(invalidos)}"}), 400
+
+    ciclo = Ciclo.query.get_or_404(ciclo_id) if ciclo_id else None
+
+    # Keyset: cursor = "<data>_<id>" do último item da página anterior
+    if cursor:
+        try:
+            c_data, c_id = cursor.split('_', 1)
+            cursor = (datetime.strptime(c_data, '%Y-%m-%d').date(), int(c_id))
+        except ValueError:
+            return jsonify({'error': 'cursor inválido'}), 400
+
+    items, next_cursor = _pagina_lancamentos(ciclo, campos, limit, cursor)
+
+    # Sem limit/cursor mantém a resposta antiga (lista completa)
+    if not limit and not cursor:
+        return jsonify(items)
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+def _pagina_lancamentos(ciclo=None, campos=None, limit=None, cursor=None):
+    """(items, next_cursor) em ordem data/id decrescente; `cursor` = (data, id) já validado."""
+    campos = campos or list(LANCAMENTO_CAMPOS)
+    # id e data sempre são lidos (ordenação/cursor), mesmo que não sejam devolvidos
+    colunas = campos + [f for f in ('id', 'data') if f not in campos]
+    query = Lancamento.query.with_entities(*[LANCAMENTO_CAMPOS[f] for f in colunas])
+    if ciclo is not None:
         query = query.filter(Lancamento.data >= ciclo.data_inicio, Lancamento.data <= ciclo.data_fim)
-    lancamentos = query.order_by(Lancamento.data.desc()).all()
-    return jsonify([{
-        'id': l.id,
-        'data': l.data.strftime('%Y-%m-%d'),
-        'descricao': l.descricao,
-        'valor': l.valor,
-        'categoria': l.categoria,
-        'forma_pgto': getattr(l, 'forma_pgto', 'Debito'),
-
-        # ✅ NOVOS (pra não “sumir” ao editar)
-        'divida_id': getattr(l, 'divida_id', None),
-        'parcela_num': getattr(l, 'parcela_num', None),
-        'ultima_parcela': int(getattr(l, 'ultima_parcela', 0) or 0)
-    } for l in lancamentos])
+    if cursor:
+        c_data, c_id = cursor
+        query = query.filter(Lancamento.data <= c_data,
+                             db.or_(Lancamento.data < c_data, Lancamento.id < c_id))
+
+    query = query.order_by(Lancamento.data.desc(), Lancamento.id.desc())
+    if limit:
+        limit = max(1, min(limit, LANCAMENTOS_LIMITE_MAX))
+        query = query.limit(limit + 1)
+    rows = query.all()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        ultima = rows[-1]
+        next_cursor = f"{ultima[colunas.index('data')].strftime('%Y-%m-%d')}_{ultima[colunas.index('id')]}"
+
+    # Tuplas na ordem de `campos` (as colunas extras ficam no fim e o zip ignora)
+    return [dict(zip(campos, r)) for r in rows], next_cursor
 
 @app.route('/api/lancamentos', methods=['POST'])
 def criar_lancamento():
@@ -303,11 +1201,15 @@ def criar_lancamento():
     if divida_id not in (None, '', 0, '0'):
         if parcela_num in (None, '', 0, '0'):
             return jsonify({'error': 'Informe a parcela paga para a dívida selecionada.'}), 400
+    try:
+        valor = _parse_valor(data['valor'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     novo_lancamento = Lancamento(
         data=data_lanc,
         descricao=data['descricao'],
-        valor=float(data['valor']),
+        valor=valor,
         categoria=data['categoria'],
         forma_pgto=data.get('forma_pgto', 'Debito'),
         divida_id=int(divida_id) if divida_id not in (None, '', 0, '0') else None,
@@ -336,7 +1238,10 @@ def atualizar_lancamento(id):
 
     lancamento.descricao = data.get('descricao', lancamento.descricao)
     if 'valor' in data:
-        lancamento.valor = float(data['valor'])
+        try:
+            lancamento.valor = _parse_valor(data['valor'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     lancamento.categoria = data.get('categoria', lancamento.categoria)
 
     if 'forma_pgto' in data and data.get('forma_pgto'):
@@ -373,16 +1278,321 @@ def deletar_lancamento(id):
     db.session.commit()
     return jsonify({'message': 'Lançamento deletado'}), 200
 
+# Resumo por categoria (rollup): (ciclo, categoria, forma_pgto) -> soma/quantidade.
+# Lançamentos gravados pelo ORM aplicam seus deltas no flush (_rollup_apos_flush), na mesma transação;
+# INSERT direto na tabela (importação em lote) aplica os seus; mudanças de ciclo recalculam os ciclos afetados.
+ROLLUP_LOTE = 500
+
+def _rollup_linha(lanc, antigo=False):
+    """(chave, centavos) de um lançamento; com `antigo`, pelos valores de antes das mudanças do flush."""
+    estado = db.inspect(lanc)
+    def valor(campo):
+        hist = estado.attrs[campo].history
+        return hist.deleted[0] if antigo and hist.deleted else getattr(lanc, campo)
+    chave = (_ciclo_para_data(valor('data')), valor('categoria'), valor('forma_pgto'))
+    return chave, _para_centavos(valor('valor'))
+
+@event.listens_for(db.session, 'after_flush')
+def _rollup_apos_flush(session, _):
+    deltas = {}
+    def somar(linha, sinal):
+        chave, cent = linha
+        c0, n0 = deltas.get(chave, (0, 0))
+        deltas[chave] = (c0 + sinal * cent, n0 + sinal)
+
+    for o in session.new:
+        if isinstance(o, Lancamento):
+            somar(_rollup_linha(o), 1)
+    for o in session.deleted:
+        if isinstance(o, Lancamento):
+            somar(_rollup_linha(o, antigo=True), -1)
+    for o in session.dirty:
+        if isinstance(o, Lancamento) and session.is_modified(o):
+            antes, depois = _rollup_linha(o, antigo=True), _rollup_linha(o)
+            if antes != depois:  # data pode ter mudado de ciclo
+                somar(antes, -1)
+                somar(depois, 1)
+    if deltas:
+        _rollup_ajustar(deltas)
+
+def _rollup_ajustar(deltas):
+    """Soma deltas {(ciclo_id, categoria, forma_pgto): (centavos, quantidade)} com upsert."""
+    valores = [{'ciclo_id': cid, 'categoria': cat, 'forma_pgto': forma,
+                'total': _para_reais(cent), 'quantidade': n}
+               for (cid, cat, forma), (cent, n) in deltas.items() if cid is not None and (cent or n)]
+    if not valores:
+        return
+    t = ResumoCategoria.__table__
+    upsert = _upsert_insert()
+    for i in range(0, len(valores), ROLLUP_LOTE):
+        stmt = upsert(ResumoCategoria).values(valores[i:i + ROLLUP_LOTE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['ciclo_id', 'categoria', 'forma_pgto'],
+            set_={'total': t.c.total + stmt.excluded.total,
+                  'quantidade': t.c.quantidade + stmt.excluded.quantidade})
+        db.session.execute(stmt)
+    if any(v['quantidade'] < 0 for v in valores):
+        db.session.execute(t.delete().where(t.c.tenant_id == _tenant_id(), t.c.quantidade <= 0))
+
+def _juntar_faixas(faixas):
+    """Faixas de datas [(início, fim)] ordenadas, com as que se tocam ou sobrepõem unidas."""
+    juntas = []
+    for ini, fim in sorted(faixas):
+        if juntas and ini <= juntas[-1][1] + timedelta(days=1):
+            juntas[-1] = (juntas[-1][0], max(juntas[-1][1], fim))
+        else:
+            juntas.append((ini, fim))
+    return juntas
+
+def _rollup_calcular(ciclos=None, faixas=None):
+    """Rollup esperado a partir de `lancamento`: agrega por dia no banco e mapeia dia -> ciclo pelo índice.
+    `faixas` [(início, fim)] limita os lançamentos lidos (as chaves dos dias de fora não saem completas)."""
+    if ciclos is None:
+        ciclos = Ciclo.query.with_entities(Ciclo.data_inicio, Ciclo.data_fim, Ciclo.id).all()
+    indice = IndiceCiclos(ciclos)
+    rows = db.session.query(Lancamento.data, Lancamento.categoria, Lancamento.forma_pgto,
+                            db.func.sum(_centavos(Lancamento.valor)), db.func.count())
+    if faixas is not None:
+        rows = rows.filter(db.or_(db.false(), *[Lancamento.data.between(ini, fim)
+                                                for ini, fim in _juntar_faixas(faixas)]))
+    rows = rows.group_by(Lancamento.data, Lancamento.categoria, Lancamento.forma_pgto)
+    esperado = {}
+    for d, cat, fp, cent, n in rows:
+        cid = indice.buscar(d)
+        if cid is None:
+            continue
+        c0, n0 = esperado.get((cid, cat, fp), (0, 0))
+        esperado[(cid, cat, fp)] = (c0 + int(cent), n0 + n)
+    return esperado
+
+def _rollup_reconstruir(periodos=None, ciclo_ids=()):
+    """Recalcula o resumo do tenant atual (na transação atual); devolve o nº de linhas calculadas.
+
+    Com `periodos` [(início, fim)] (datas antigas e novas de ciclos criados, editados ou apagados), só os dias
+    desses períodos mudam de ciclo: recalcula os ciclos que os cruzam mais `ciclo_ids`, lendo só os lançamentos
+    dentro desses ciclos, em vez do histórico inteiro.
+    """
+    t = ResumoCategoria.__table__
+    apagar = t.delete().where(t.c.tenant_id == _tenant_id())
+    if periodos is None:
+        esperado = _rollup_calcular()
+    else:
+        ciclos = Ciclo.query.with_entities(Ciclo.data_inicio, Ciclo.data_fim, Ciclo.id).all()
+        afetados = set(ciclo_ids) | {cid for ini, fim, cid in ciclos
+                                     if any(ini <= p_fim and fim >= p_ini for p_ini, p_fim in periodos)}
+        faixas = [(ini, fim) for ini, fim, cid in ciclos if cid in afetados]
+        esperado = {k: v for k, v in _rollup_calcular(ciclos, faixas).items() if k[0] in afetados}
+        apagar = apagar.where(t.c.ciclo_id.in_(afetados))
+    db.session.execute(apagar)
+    _rollup_ajustar(esperado)
+    return len(esperado)
+
+def _rollup_divergencias():
+    """Diferenças entre a tabela e o recálculo: [(chave, (centavos, qtd) na tabela, esperado)]."""
+    esperado = _rollup_calcular()
+    atual = {(cid, cat, fp): (_para_centavos(total), n) for cid, cat, fp, total, n in
+             db.session.query(ResumoCategoria.ciclo_id, ResumoCategoria.categoria, ResumoCategoria.forma_pgto,
+                              ResumoCategoria.total, ResumoCategoria.quantidade)}
+    return [(k, atual.get(k), esperado.get(k)) for k in sorted(set(atual) | set(esperado), key=str)
+            if atual.get(k) != esperado.get(k)]
+
+@app.cli.command('rollup-reconstruir')
+@com_tenant
+def rollup_reconstruir_cli():
+    """Recalcula o resumo por categoria a partir dos lançamentos."""
+    n = _rollup_reconstruir()
+    db.session.commit()
+    click.echo(f"{n} linha(s) no resumo por categoria.")
+
+@app.cli.command('rollup-verificar')
+@com_tenant
+def rollup_verificar_cli():
+    """Compara o resumo por categoria com os lançamentos (sai com código 1 se divergir)."""
+    divergencias = _rollup_divergencias()
+    for chave, atual, esperado in divergencias:
+        click.echo(f"{chave}: tabela={atual} esperado={esperado}")
+    if divergencias:
+        raise SystemExit(1)
+    click.echo("Resumo por categoria consistente.")
+
+# Importação em lote (extratos CSV/OFX/JSON)
+VALOR_MAXIMO = 10 ** 12  # acima disso o float já não guarda os centavos (e o BIGINT em centavos estoura antes de inf)
+
+def _parse_valor(v):
+    """Valor em reais (número ou texto, aceita "R$ 1.234,56"); ValueError se não for um valor finito e plausível."""
+    texto = v
+    if not isinstance(v, (int, float)):
+        texto = str(v).strip().replace('R$', '').replace(' ', '')
+        if ',' in texto:  # formato brasileiro: 1.234,56
+            texto = texto.replace('.', '').replace(',', '.')
+    try:
+        valor = float(texto)
+    except OverflowError:  # int grande demais para float
+        valor = math.inf
+    if not math.isfinite(valor) or abs(valor) >= VALOR_MAXIMO:
+        raise ValueError(f"valor inválido: {v}")
+    return valor
+
+def _parse_data(v):
+    v = str(v).strip()
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(v, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"data inválida: {v}")
+
+def _ler_csv(conteudo):
+    try:
+        dialeto = csv.Sniffer().sniff(conteudo[:4096], delimiters=',;')
+    except csv.Error:
+        dialeto = csv.excel
+    return [dict(r) for r in csv.DictReader(io.StringIO(conteudo), dialect=dialeto)]
+
+def _ler_ofx(conteudo):
+    """Extrai <STMTTRN> de um OFX (SGML ou XML). Só saídas (TRNAMT < 0) viram lançamentos."""
+    registros = []
+    for bloco in re.findall(r'<STMTTRN>(.*?)</STMTTRN>', conteudo, flags=re.S | re.I):
+        tags = dict((k.upper(), v.strip()) for k, v in re.findall(r'<(\w+)>([^<\r\n]*)', bloco))
+        valor = _parse_valor(tags.get('TRNAMT', '0').replace(',', '.'))
+        if valor >= 0:
+            continue
+        dt = tags.get('DTPOSTED', '')[:8]
+        registros.append({
+            'data': f"{dt[:4]}-{dt[4:6]}-{dt[6:8]}" if len(dt) == 8 else dt,
+            'descricao': tags.get('MEMO') or tags.get('NAME') or 'Sem descrição',
+            'valor': -valor,
+        })
+    return registros
+
+def importar_lancamentos(registros, parcial=False, categoria_padrao='Importado', forma_pgto_padrao='Debito'):
+    """Valida e insere vários lançamentos numa única transação (executemany).
+
+    Retorna (inseridos, erros). Sem `parcial`, qualquer erro cancela a importação inteira.
+    """
+    indice = _indice_ciclos()
+    linhas, erros = [], []
+    for n, r in enumerate(registros, start=1):
+        if not isinstance(r, dict):
+            erros.append({'linha': n, 'error': 'Registro deve ser um objeto'})
+            continue
+        try:
+            data_lanc = _parse_data(r['data'])
+            divida_id = r.get('divida_id')
+            parcela_num = r.get('parcela_num')
+            linha = {
+                'data': data_lanc,
+                'descricao': str(r['descricao']).strip()[:200],
+                'valor': _parse_valor(r['valor']),
+                'categoria': str(r.get('categoria') or categoria_padrao).strip(),
+                'forma_pgto': str(r.get('forma_pgto') or forma_pgto_padrao).strip(),
+                'divida_id': int(divida_id) if divida_id not in (None, '', 0, '0') else None,
+                'parcela_num': int(parcela_num) if parcela_num not in (None, '', 0, '0') else None,
+                'ultima_parcela': 1 if str(r.get('ultima_parcela', 0)).lower() in ('1','true','yes','on') else 0,
+            }
+        except KeyError as e:
+            erros.append({'linha': n, 'error': f"Campo obrigatório ausente: {e.args[0]}"})
+            continue
+        except (ValueError, TypeError) as e:
+            erros.append({'linha': n, 'error': str(e)})
+            continue
+
+        if not linha['descricao']:
+            erros.append({'linha': n, 'error': 'Descrição vazia'})
+        elif indice.buscar(data_lanc) is None:
+            erros.append({'linha': n, 'error': f"Nenhum ciclo cobre a data {data_lanc.strftime('%Y-%m-%d')}"})
+        elif linha['divida_id'] is not None and linha['parcela_num'] is None:
+            erros.append({'linha': n, 'error': 'Informe a parcela paga para a dívida selecionada.'})
+        else:
+            linhas.append(linha)
+
+    if erros and not parcial:
+        return 0, erros
+    if linhas:
+        db.session.execute(Lancamento.__table__.insert(), linhas)
+        deltas = {}
+        for l in linhas:
+            chave = (indice.buscar(l['data']), l['categoria'], l['forma_pgto'])
+            cent, n = deltas.get(chave, (0, 0))
+            deltas[chave] = (cent + _para_centavos(l['valor']), n + 1)
+        _rollup_ajustar(deltas)
+        db.session.commit()
+    return len(linhas), erros
+
+def _registros_importacao(conteudo, formato):
+    if formato == 'json':
+        dados = json.loads(conteudo)
+        return dados.get('lancamentos', []) if isinstance(dados, dict) else dados
+    if formato == 'csv':
+        return _ler_csv(conteudo)
+    if formato == 'ofx':
+        return _ler_ofx(conteudo)
+    raise ValueError('formato deve ser json, csv ou ofx')
+
+@app.route('/api/lancamentos/bulk', methods=['POST'])
+def importar_lancamentos_bulk():
+    parcial = str(request.args.get('parcial', 0)).lower() in ('1','true','yes','on')
+    formato = (request.args.get('formato') or '').lower()
+    try:
+        if request.is_json:
+            dados = request.get_json()
+            registros = dados.get('lancamentos', []) if isinstance(dados, dict) else dados
+        else:
+            arquivo = request.files.get('arquivo')
+            if arquivo:
+                conteudo = arquivo.read()
+                formato = formato or os.path.splitext(arquivo.filename or '')[1].lstrip('.').lower()
+            else:
+                conteudo = request.get_data()
+            registros = _registros_importacao(conteudo.decode('utf-8-sig', errors='replace'), formato or 'csv')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not isinstance(registros, list):
+        return jsonify({'error': 'Envie uma lista de lançamentos'}), 400
+
+    inseridos, erros = importar_lancamentos(
+        registros, parcial=parcial,
+        categoria_padrao=request.args.get('categoria') or 'Importado',
+        forma_pgto_padrao=request.args.get('forma_pgto') or 'Debito')
+    if erros and not parcial:
+        return jsonify({'error': 'Importação cancelada: corrija as linhas com erro', 'erros': erros}), 400
+    return jsonify({'message': 'Importação concluída', 'inseridos': inseridos, 'erros': erros}), 201
+
+@app.cli.command('importar')
+@com_tenant
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'ofx', 'json']), help='Padrão: extensão do arquivo')
+@click.option('--parcial', is_flag=True, help='Importa as linhas válidas mesmo se houver erros')
+@click.option('--categoria', default='Importado', show_default=True)
+@click.option('--forma-pgto', default='Debito', show_default=True)
+def importar_cli(arquivo, formato, parcial, categoria, forma_pgto):
+    """Importa lançamentos de um extrato (CSV/OFX/JSON)."""
+    formato = formato or os.path.splitext(arquivo)[1].lstrip('.').lower()
+    with open(arquivo, encoding='utf-8-sig', errors='replace') as f:
+        registros = _registros_importacao(f.read(), formato)
+    inseridos, erros = importar_lancamentos(registros, parcial=parcial,
+                                            categoria_padrao=categoria, forma_pgto_padrao=forma_pgto)
+    for e in erros:
+        click.echo(f"Linha {e['linha']}: {e['error']}", err=True)
+    if erros and not parcial:
+        raise click.ClickException('Importação cancelada (use --parcial para importar as linhas válidas)')
+    click.echo(f"{inseridos} lançamento(s) importado(s).")
+
 # API - Investimentos
 @app.route('/api/investimentos', methods=['GET'])
+@cache_resposta('investimento')
 def get_investimentos():
     investimentos = Investimento.query.all()
-    return jsonify([{
+    return jsonify([_investimento_dict(i) for i in investimentos])
+
+def _investimento_dict(i):
+    return {
         'id': i.id,
         'nome': i.nome,
         'valor': i.valor,
         'tipo': i.tipo
-    } for i in investimentos])
+    }
 
 @app.route('/api/investimentos', methods=['POST'])
 def criar_investimento():
@@ -416,15 +1626,19 @@ def deletar_investimento(id):
 
 # API - Cartões de Crédito
 @app.route('/api/cartoes', methods=['GET'])
+@cache_resposta('cartao_credito')
 def get_cartoes():
     cartoes = CartaoCredito.query.all()
-    return jsonify([{
+    return jsonify([_cartao_dict(c) for c in cartoes])
+
+def _cartao_dict(c):
+    return {
         'id': c.id,
         'nome': c.nome,
         'valor_atual': c.valor_atual,
         'limite': c.limite,
         'data_vencimento': c.data_vencimento.strftime('%Y-%m-%d')
-    } for c in cartoes])
+    }
 
 @app.route('/api/cartoes', methods=['POST'])
 def criar_cartao():
@@ -463,29 +1677,44 @@ def deletar_cartao(id):
 
 # API - Dívidas
 @app.route('/api/dividas', methods=['GET'])
+@cache_resposta('divida', 'lancamento', por_dia=True)
+@limitar('pesadas')
 def get_dividas():
     dividas = Divida.query.order_by(Divida.id.desc()).all()
+    return jsonify(_dividas_lista(dividas))
+
+def _dividas_stats():
+    """{divida_id: (maior parcela da frente, nº parcelas da frente, nº antecipadas do final, último pagamento)}."""
+    # Agregado único por dívida (evita 2 queries extras por linha)
+    frente = db.func.coalesce(Lancamento.ultima_parcela, 0) == 0
+    final = db.func.coalesce(Lancamento.ultima_parcela, 0) == 1
+    agregados = (db.session.query(
+                    Lancamento.divida_id,
+                    db.func.max(db.case((frente, Lancamento.parcela_num))),
+                    db.func.count(db.distinct(db.case((frente, Lancamento.parcela_num)))),
+                    db.func.count(db.distinct(db.case((final, Lancamento.parcela_num)))),
+                    db.func.max(Lancamento.data))
+                 .filter(Lancamento.divida_id.isnot(None))
+                 .group_by(Lancamento.divida_id)
+                 .all())
+    return {int(did): (mx, n_frente, n_final, ult) for (did, mx, n_frente, n_final, ult) in agregados}
+
+def _dividas_lista(dividas):
+    """Dívidas com progresso das parcelas (a partir dos lançamentos vinculados)."""
+    stats = _dividas_stats()
+
     out = []
     for d in dividas:
-        rows = (Lancamento.query
-                .filter(Lancamento.divida_id == d.id)
-                .with_entities(Lancamento.parcela_num, getattr(Lancamento, 'ultima_parcela', 0))
-                .all())
-
-        forward_nums = [int(p) for (p, u) in rows if p is not None and int(u or 0) == 0]
-        end_nums = [int(p) for (p, u) in rows if p is not None and int(u or 0) == 1]
-
-        forward_set = set(forward_nums)
-        end_set = set(end_nums)
+        max_frente, n_frente, n_final, ultima_data = stats.get(d.id, (None, 0, 0, None))
 
         total = getattr(d, 'total_parcelas', None)
         total_i = int(total) if total not in (None, '') else None
 
         # parcela_atual: maior parcela informada no fluxo normal (frente)
-        parcela_atual = max(forward_nums) if forward_nums else 0
+        parcela_atual = int(max_frente) if max_frente is not None else 0
 
         # antecipações do final reduzem o total efetivo
-        total_ajustado = (total_i - len(end_set)) if total_i is not None else None
+        total_ajustado = (total_i - n_final) if total_i is not None else None
         
         # Fim previsto ajustado (dinâmico): data_inicio + (total_ajustado - 1) meses
         fim_prev_ajustada = None
@@ -501,15 +1730,7 @@ def get_dividas():
         if d.data_inicio and total_ajustado is not None:
             fim_contratual_ajustada = _add_months(d.data_inicio, max(int(total_ajustado) - 1, 0))
 
-        base_ref = None
-        last_dt = (Lancamento.query
-                .filter(Lancamento.divida_id == d.id)
-                .with_entities(Lancamento.data)
-                .order_by(Lancamento.data.desc())
-                .first())
-        base_ref = last_dt[0] if last_dt and last_dt[0] else None
-        if not base_ref:
-            base_ref = date.today()
+        base_ref = ultima_data or date.today()
 
         fim_estimado_atual = None
         if faltam is not None:
@@ -538,11 +1759,177 @@ def get_dividas():
             'faltam': faltam,
             'proxima_parcela': proxima,
 
-            'parcelas_registradas': len(forward_set) + len(end_set),
-            'antecipadas_final': len(end_set)
+            'parcelas_registradas': n_frente + n_final,
+            'antecipadas_final': n_final
         })
+    return out
+
+# Projeção de dívidas: cronogramas Price/SAC em forma fechada (saldo, juros e prazo de cada
+# dívida saem de fórmulas, sem simular mês a mês); o resultado fica no cache de respostas
+# até a dívida ou os lançamentos vinculados mudarem.
+SISTEMAS_AMORTIZACAO = ('price', 'sac')
+PROJECAO_MAX_PARCELAS = 1200  # 100 anos
+
+def _parcelas_price(saldo, taxa, parcela):
+    """Nº de parcelas para quitar `saldo` pagando `parcela` fixa (None se não cobre os juros)."""
+    if saldo <= 0:
+        return 0
+    if taxa == 0:
+        n = math.ceil(saldo / parcela)
+    elif parcela <= saldo * taxa:
+        return None
+    else:
+        n = math.ceil(-math.log(1 - taxa * saldo / parcela) / math.log(1 + taxa))
+    # resíduo de arredondamento (< meio centavo) não vira parcela extra
+    return n - 1 if n > 1 and _saldo_price(saldo, taxa, parcela, n - 1) < 0.005 else n
+
+def _saldo_price(saldo, taxa, parcela, k):
+    """Saldo devedor após k parcelas Price."""
+    if taxa == 0:
+        return saldo - parcela * k
+    q = (1 + taxa) ** k
+    return saldo * q - parcela * (q - 1) / taxa
+
+def amortizacao(saldo, taxa, sistema='price', parcela=None, n=None, extra_mensal=0.0, extra_unico=0.0):
+    """Resumo da amortização: parcelas restantes, 1ª/última prestação, juros e total pagos
+    (`constante` = prestação no Price, amortização no SAC).
+
+    `taxa` é a taxa mensal em fração (0.02 = 2%). Price usa `parcela` (ou a calcula de `n`);
+    SAC usa `n` (ou o deriva da 1ª prestação `parcela`). `extra_mensal` soma à prestação
+    (Price) ou à amortização (SAC); `extra_unico` abate o saldo agora. None se não quita.
+    """
+    saldo = max(saldo - extra_unico, 0.0)
+    if saldo <= 0:
+        return {'parcelas': 0, 'primeira': 0.0, 'ultima': 0.0, 'juros': 0.0, 'total': 0.0, 'constante': 0.0}
+
+    if sistema == 'price':
+        if parcela is None:
+            if not n:
+                return None
+            parcela = saldo / n if taxa == 0 else saldo * taxa / (1 - (1 + taxa) ** -n)
+        parcela += extra_mensal
+        if parcela <= 0:
+            return None
+        n = _parcelas_price(saldo, taxa, parcela)
+        if n is None or n > PROJECAO_MAX_PARCELAS:
+            return None
+        ultima = _saldo_price(saldo, taxa, parcela, n - 1) * (1 + taxa)
+        total = parcela * (n - 1) + ultima
+        return {'parcelas': n, 'primeira': parcela if n > 1 else ultima, 'ultima': ultima,
+                'juros': total - saldo, 'total': total, 'constante': parcela}
+
+    # SAC: amortização constante A; juros da parcela k = taxa * (saldo - (k-1)A)
+    if n:
+        amort = saldo / n
+    elif parcela:
+        amort = parcela - saldo * taxa
+    else:
+        return None
+    amort += extra_mensal
+    if amort <= 0:
+        return None
+    n = math.ceil(saldo / amort)
+    if n > 1 and saldo - amort * (n - 1) < 0.005:
+        n -= 1
+    if n > PROJECAO_MAX_PARCELAS:
+        return None
+    juros = taxa * (n * saldo - amort * n * (n - 1) / 2)
+    resto = saldo - amort * (n - 1)
+    return {'parcelas': n, 'primeira': min(amort, saldo) + saldo * taxa, 'ultima': resto * (1 + taxa),
+            'juros': juros, 'total': saldo + juros, 'constante': amort}
+
+def cronograma(saldo, taxa, sistema='price', parcela=None, n=None, extra_mensal=0.0, extra_unico=0.0):
+    """Linhas (parcela, prestacao, juros, amortizacao, saldo) do cronograma; cada uma pela fórmula fechada."""
+    res = amortizacao(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico)
+    if res is None:
+        return None
+    saldo = max(saldo - extra_unico, 0.0)
+    total, c = res['parcelas'], res['constante']
+    if sistema == 'price':
+        saldos = [_saldo_price(saldo, taxa, c, k) for k in range(total)] + [0.0]
+    else:
+        saldos = [saldo - c * k for k in range(total)] + [0.0]
+    linhas = []
+    for k in range(1, total + 1):
+        juros = saldos[k - 1] * taxa
+        amortizado = saldos[k - 1] - saldos[k]
+        linhas.append({'parcela': k, 'prestacao': round(juros + amortizado, 2), 'juros': round(juros, 2),
+                       'amortizacao': round(amortizado, 2), 'saldo': round(saldos[k], 2)})
+    return linhas
+
+def _projecao_args():
+    """(sistema, extra_mensal, extra_unico) da query string; ValueError se inválidos."""
+    sistema = (request.args.get('sistema') or 'price').lower()
+    if sistema not in SISTEMAS_AMORTIZACAO:
+        raise ValueError("sistema deve ser 'price' ou 'sac'")
+    extra_mensal = _parse_valor(request.args.get('extra_mensal') or 0)
+    extra_unico = _parse_valor(request.args.get('extra_unico') or 0)
+    if extra_mensal < 0 or extra_unico < 0:
+        raise ValueError('Pagamentos extras não podem ser negativos')
+    return sistema, extra_mensal, extra_unico
+
+def _projecao_base(d, stats):
+    """(saldo, taxa, parcela, parcelas restantes, data do último pagamento) de uma dívida."""
+    max_frente, _, n_final, ultima_data = stats.get(d.id, (None, 0, 0, None))
+    faltam = None
+    if d.total_parcelas:
+        faltam = max(int(d.total_parcelas) - n_final - (int(max_frente) if max_frente is not None else 0), 0)
+    return (d.saldo_atual or 0.0, (d.taxa_mensal or 0.0) / 100, d.parcela_mensal, faltam,
+            ultima_data or date.today())
+
+def _projecao_dict(res, base_ref):
+    if res is None:
+        return None
+    return {'parcelas_restantes': res['parcelas'],
+            'prestacao_inicial': round(res['primeira'], 2), 'prestacao_final': round(res['ultima'], 2),
+            'juros_totais': round(res['juros'], 2), 'total_a_pagar': round(res['total'], 2),
+            'data_quitacao': _add_months(base_ref, res['parcelas']).strftime('%Y-%m-%d')}
+
+# API - Projeção de quitação das dívidas ativas (opcional: cenário com pagamentos extras)
+@app.route('/api/dividas/projecao', methods=['GET'])
+@cache_resposta('divida', 'lancamento', por_dia=True)
+def projecao_dividas():
+    try:
+        sistema, extra_mensal, extra_unico = _projecao_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    stats = _dividas_stats()
+    out = []
+    for d in Divida.query.filter(Divida.status != 'Quitada').order_by(Divida.id.desc()):
+        saldo, taxa, parcela, faltam, base_ref = _projecao_base(d, stats)
+        atual = _projecao_dict(amortizacao(saldo, taxa, sistema, parcela, faltam), base_ref)
+        item = {'id': d.id, 'nome': d.nome, 'sistema': sistema, 'saldo_atual': d.saldo_atual,
+                'taxa_mensal': d.taxa_mensal, 'parcela_mensal': d.parcela_mensal, 'projecao': atual}
+        if atual is None:
+            item['aviso'] = 'Sem dados suficientes ou a parcela não cobre os juros do mês'
+        if extra_mensal or extra_unico:
+            cenario = _projecao_dict(amortizacao(saldo, taxa, sistema, parcela, faltam, extra_mensal, extra_unico),
+                                     base_ref)
+            if cenario and atual:
+                cenario['economia_juros'] = round(atual['juros_totais'] - cenario['juros_totais'], 2)
+                cenario['parcelas_a_menos'] = atual['parcelas_restantes'] - cenario['parcelas_restantes']
+            item['cenario'] = cenario
+        out.append(item)
     return jsonify(out)
 
+@app.route('/api/dividas/<int:id>/cronograma', methods=['GET'])
+@cache_resposta('divida', 'lancamento', por_dia=True)
+def cronograma_divida(id):
+    d = Divida.query.get_or_404(id)
+    try:
+        sistema, extra_mensal, extra_unico = _projecao_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    saldo, taxa, parcela, faltam, base_ref = _projecao_base(d, _dividas_stats())
+    linhas = cronograma(saldo, taxa, sistema, parcela, faltam, extra_mensal, extra_unico)
+    if linhas is None:
+        return jsonify({'error': 'Sem dados suficientes ou a parcela não cobre os juros do mês'}), 400
+    for linha in linhas:
+        linha['data'] = _add_months(base_ref, linha['parcela']).strftime('%Y-%m-%d')
+    return jsonify({'id': d.id, 'nome': d.nome, 'sistema': sistema, 'parcelas': linhas})
+
 @app.route('/api/dividas', methods=['POST'])
 
 def criar_divida():
@@ -597,34 +1984,37 @@ def deletar_divida(id):
 
 # API - Checklist de Pagamentos (por ciclo)
 @app.route('/api/checklist', methods=['GET'])
+@cache_resposta('checklist_status', 'ciclo', 'gasto_fixo', 'lancamento', 'cartao_credito', 'divida')
+@limitar('pesadas')
 def get_checklist():
     ciclo_id = request.args.get('ciclo_id', type=int)
     if not ciclo_id:
         return jsonify({'error': 'ciclo_id é obrigatório'}), 400
 
     ciclo = Ciclo.query.get_or_404(ciclo_id)
+    fixos = GastoFixo.query.filter(GastoFixo.ciclo_id == ciclo_id).all()
+    return jsonify(_checklist(ciclo, fixos, CartaoCredito.query.all(), Divida.query.all()))
 
+def _checklist(ciclo, fixos, cartoes, dividas):
+    """Itens do checklist do ciclo; fixos/cartões/dívidas já carregados são reaproveitados."""
     # Estados salvos no banco (por ciclo)
     rows = (ChecklistStatus.query
-            .filter(ChecklistStatus.ciclo_id == ciclo_id)
+            .filter(ChecklistStatus.ciclo_id == ciclo.id)
             .with_entities(ChecklistStatus.tipo, ChecklistStatus.ref_id, ChecklistStatus.checked)
             .all())
     state = {(t, int(r)): int(ch or 0) for (t, r, ch) in rows}
 
     # Itens do ciclo
-    fixos = (GastoFixo.query
-         .filter(GastoFixo.ciclo_id == ciclo_id)
-         .filter(GastoFixo.forma_pgto == 'Debito')
-         .order_by(GastoFixo.nome.asc())
-         .all())
+    fixos = sorted((g for g in fixos if g.forma_pgto == 'Debito'), key=lambda g: g.nome)
 
     lancs = (Lancamento.query
              .filter(Lancamento.data >= ciclo.data_inicio, Lancamento.data <= ciclo.data_fim)
              .filter(Lancamento.forma_pgto == 'Debito')
-             .order_by(Lancamento.data.asc(), Lancamento.descricao.asc())
+             .order_by(Lancamento.data.asc(), Lancamento.descricao.asc(), Lancamento.id.asc())
+             .with_entities(Lancamento.id, Lancamento.descricao, Lancamento.data, Lancamento.valor)
              .all())
-    cartoes = CartaoCredito.query.order_by(CartaoCredito.nome.asc()).all()
-    dividas = Divida.query.order_by(Divida.nome.asc()).all()
+    cartoes = sorted(cartoes, key=lambda c: c.nome)
+    dividas = sorted(dividas, key=lambda d: d.nome)
 
     def item(tipo, ref_id, titulo, subtitulo, valor):
         return {
@@ -636,13 +2026,19 @@ def get_checklist():
             'checked': state.get((tipo, int(ref_id)), 0)
         }
 
-    return jsonify({
-        'ciclo_id': ciclo_id,
+    subtitulos = {}  # um ciclo tem poucas datas distintas: formata cada uma uma vez só
+    def subtitulo(d):
+        if d not in subtitulos:
+            subtitulos[d] = f"Lançamentos (Débito/Pix) • {d.strftime('%d/%m/%Y')}"
+        return subtitulos[d]
+
+    return {
+        'ciclo_id': ciclo.id,
         'fixos': [item('fixed', g.id, g.nome, 'Fixos (Débito/Pix)', g.valor) for g in fixos],
-        'lancamentos': [item('transaction', l.id, l.descricao, f"Lançamentos (Débito/Pix) • {l.data.strftime('%d/%m/%Y')}", l.valor) for l in lancs],
+        'lancamentos': [item('transaction', i, desc, subtitulo(d), valor) for i, desc, d, valor in lancs],
         'cartoes': [item('card', c.id, f"Fatura {c.nome}", 'Cartões', c.valor_atual) for c in cartoes],
         'dividas': [item('debt', d.id, d.nome, 'Dívidas', d.parcela_mensal if d.parcela_mensal is not None else None) for d in dividas],
-    })
+    }
 
 
 @app.route('/api/checklist', methods=['PUT'])
@@ -655,6 +2051,7 @@ def upsert_checklist():
 
     if not ciclo_id or not tipo or not ref_id:
         return jsonify({'error': 'ciclo_id, tipo e ref_id são obrigatórios'}), 400
+    Ciclo.query.get_or_404(ciclo_id)  # ciclo de outro tenant: 404
 
     row = (ChecklistStatus.query
            .filter_by(ciclo_id=ciclo_id, tipo=tipo, ref_id=ref_id)
@@ -670,91 +2067,1007 @@ def upsert_checklist():
     return jsonify({'message': 'Checklist atualizado'}), 200
 
 
+CHECKLIST_LOTE = 500  # linhas por INSERT (limite de parâmetros do SQLite)
+
+def _upsert_insert():
+    """insert() do dialeto atual, com suporte a ON CONFLICT DO UPDATE (SQLite/PostgreSQL)."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
 
+@app.route('/api/checklist/batch', methods=['PUT'])
+def upsert_checklist_batch():
+    data = request.json or {}
+    ciclo_id = int(data.get('ciclo_id') or 0)
+    itens = data.get('itens')
+    if not ciclo_id or not isinstance(itens, list):
+        return jsonify({'error': 'ciclo_id e itens (lista) são obrigatórios'}), 400
+    Ciclo.query.get_or_404(ciclo_id)  # o ON CONFLICT não filtra tenant: a chave precisa ser de um ciclo deste
+
+    # Deduplica por (tipo, ref_id): vale o último (o PostgreSQL não aceita a mesma chave 2x no mesmo INSERT)
+    agora = datetime.utcnow()
+    linhas = {}
+    for n, it in enumerate(itens, start=1):
+        try:
+            tipo = (it.get('tipo') or '').strip()
+            ref_id = int(it.get('ref_id') or 0)
+            checked = 1 if int(it.get('checked') or 0) == 1 else 0
+        except (AttributeError, TypeError, ValueError):
+            tipo, ref_id = '', 0
+        if not tipo or not ref_id:
+            return jsonify({'error': f'Item {n}: tipo e ref_id são obrigatórios'}), 400
+        linhas[(tipo, ref_id)] = {'ciclo_id': ciclo_id, 'tipo': tipo, 'ref_id': ref_id,
+                                  'checked': checked, 'updated_at': agora}
+
+    # INSERT ... ON CONFLICT (uq_checklist_item) DO UPDATE, numa única transação
+    upsert = _upsert_insert()
+    valores = list(linhas.values())
+    for i in range(0, len(valores), CHECKLIST_LOTE):
+        stmt = upsert(ChecklistStatus).values(valores[i:i + CHECKLIST_LOTE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['ciclo_id', 'tipo', 'ref_id'],
+            set_={'checked': stmt.excluded.checked, 'updated_at': stmt.excluded.updated_at})
+        db.session.execute(stmt)
+    db.session.commit()
+    return jsonify({'message': 'Checklist atualizado', 'itens': len(valores)}), 200
 
 
-# Inicializar banco de dados
-def init_db():
-    with app.app_context():
-        db.create_all()
+# API - Resumo do ciclo (totais do dashboard calculados no banco)
+@app.route('/api/resumo', methods=['GET'])
+@cache_resposta('ciclo', 'gasto_fixo', 'lancamento', 'investimento', 'cartao_credito')
+def get_resumo():
+    ciclo_id = request.args.get('ciclo_id', type=int)
+    if ciclo_id:
+        ciclo = Ciclo.query.get_or_404(ciclo_id)
+    else:
+        ciclo = Ciclo.query.filter_by(ativo=True).first()
+        if not ciclo:
+            return jsonify({'error': 'Nenhum ciclo ativo'}), 404
+
+    fixos = (db.session.query(*_somas_por_forma(GastoFixo.forma_pgto, GastoFixo.valor))
+             .filter(GastoFixo.ciclo_id == ciclo.id)
+             .one())
+    total_inv = db.session.query(db.func.coalesce(db.func.sum(_centavos(Investimento.valor)), 0)).scalar()
+    total_cart = db.session.query(db.func.coalesce(db.func.sum(_centavos(CartaoCredito.valor_atual)), 0)).scalar()
+    return jsonify(_resumo(ciclo, fixos, total_inv, total_cart))
+
+# Mesma regra do frontend: tudo que não é 'Credito' conta como débito (somas em centavos)
+def _somas_por_forma(col_forma, col_valor):
+    credito = db.func.coalesce(col_forma, 'Debito') == 'Credito'
+    col_valor = _centavos(col_valor)
+    return (db.func.coalesce(db.func.sum(db.case((credito, 0), else_=col_valor)), 0),
+            db.func.coalesce(db.func.sum(db.case((credito, col_valor), else_=0)), 0))
+
+def _resumo(ciclo, fixos, total_inv, total_cart):
+    """Totais do dashboard; `fixos` = (débito, crédito). Tudo em centavos até a saída."""
+    fixos_debito, fixos_credito = (int(v) for v in fixos)
+    total_inv, total_cart = int(total_inv), int(total_cart)
+
+    periodo = (Lancamento.data >= ciclo.data_inicio, Lancamento.data <= ciclo.data_fim)
+    lanc_debito, lanc_credito = (db.session.query(*_somas_por_forma(Lancamento.forma_pgto, Lancamento.valor))
+                                 .filter(*periodo)
+                                 .one())
+
+    soma_cat = db.func.sum(_centavos(Lancamento.valor))
+    top_cat = (db.session.query(Lancamento.categoria, soma_cat)
+               .filter(*periodo)
+               .filter(db.func.coalesce(Lancamento.forma_pgto, 'Debito') != 'Credito')
+               .group_by(Lancamento.categoria)
+               .order_by(soma_cat.desc())
+               .first())
+
+    lanc_debito, lanc_credito = int(lanc_debito), int(lanc_credito)
+    total_gastos = fixos_debito + lanc_debito + total_cart
+    orcamento = _para_centavos(ciclo.orcamento or 0)
+
+    return {
+        'ciclo_id': ciclo.id,
+        'orcamento': _para_reais(orcamento),
+        'total_fixos_debito': _para_reais(fixos_debito),
+        'total_fixos_credito': _para_reais(fixos_credito),
+        'total_lancamentos_debito': _para_reais(lanc_debito),
+        'total_lancamentos_credito': _para_reais(lanc_credito),
+        'total_investimentos': _para_reais(total_inv),
+        'total_cartoes': _para_reais(total_cart),
+        'total_gastos': _para_reais(total_gastos),
+        'disponivel': _para_reais(orcamento - total_gastos),
+        'percent_usado': (total_gastos / orcamento * 100) if orcamento else 0,
+        'top_categoria': {'categoria': top_cat[0], 'valor': _para_reais(top_cat[1])} if top_cat else None
+    }
+
+
+# API - Relatório por categoria entre ciclos (lê o rollup: ciclos x categorias, sem varrer lançamentos)
+@app.route('/api/relatorio/categorias', methods=['GET'])
+@cache_resposta('ciclo', 'resumo_categoria')
+@limitar('pesadas')
+def relatorio_categorias():
+    query = (db.session.query(Ciclo, ResumoCategoria.categoria, ResumoCategoria.forma_pgto,
+                              ResumoCategoria.total, ResumoCategoria.quantidade)
+             .join(ResumoCategoria, ResumoCategoria.ciclo_id == Ciclo.id))
+    try:
+        if request.args.get('data_inicio'):
+            query = query.filter(Ciclo.data_fim >= datetime.strptime(request.args['data_inicio'], '%Y-%m-%d').date())
+        if request.args.get('data_fim'):
+            query = query.filter(Ciclo.data_inicio <= datetime.strptime(request.args['data_fim'], '%Y-%m-%d').date())
+    except ValueError:
+        return jsonify({'error': 'Datas devem estar no formato YYYY-MM-DD'}), 400
+    if request.args.get('categoria'):
+        query = query.filter(ResumoCategoria.categoria == request.args['categoria'])
+    if request.args.get('forma_pgto'):
+        query = query.filter(ResumoCategoria.forma_pgto == request.args['forma_pgto'])
+
+    out = OrderedDict()
+    for ciclo, categoria, forma_pgto, total, quantidade in query.order_by(Ciclo.data_inicio.asc(), Ciclo.id.asc(),
+                                                                          ResumoCategoria.categoria.asc(),
+                                                                          ResumoCategoria.forma_pgto.desc()):
+        item = out.setdefault(ciclo.id, {**_ciclo_dict(ciclo), 'categorias': []})
+        item['categorias'].append({'categoria': categoria, 'forma_pgto': forma_pgto,
+                                   'total': total, 'quantidade': quantidade})
+    return jsonify(list(out.values()))
+
+
+# API - Analytics entre ciclos. Tudo calculado no banco com funções de janela (LAG/AVG/SUM OVER)
+# sobre o rollup e os fixos: custo proporcional a ciclos x categorias, não ao número de lançamentos.
+ANALYTICS_JANELA = 3  # ciclos na média móvel
+
+def _analytics_args():
+    """(janela, data_inicio, data_fim) da query string; ValueError se inválidos."""
+    janela = request.args.get('janela', ANALYTICS_JANELA, type=int)
+    if not janela or janela < 1:
+        raise ValueError('janela deve ser um inteiro >= 1')
+    inicio = fim = None
+    if request.args.get('data_inicio'):
+        inicio = datetime.strptime(request.args['data_inicio'], '%Y-%m-%d').date()
+    if request.args.get('data_fim'):
+        fim = datetime.strptime(request.args['data_fim'], '%Y-%m-%d').date()
+    return janela, inicio, fim
+
+def _analytics_periodo(query, sub, inicio, fim):
+    # Filtra depois das janelas, para o 1º ciclo do período ainda ter "anterior"
+    if inicio:
+        query = query.filter(sub.c.data_fim >= inicio)
+    if fim:
+        query = query.filter(sub.c.data_inicio <= fim)
+    return query
+
+def _forma_normalizada(col):
+    return db.case((col == 'Credito', 'Credito'), else_='Debito')
+
+# Agregados voltam como Decimal no PostgreSQL (round arredonda para o par) e int/float no SQLite:
+# arredonda sempre em float, para os dois bancos responderem igual
+def _variacao(total, anterior):
+    if anterior is None:
+        return None, None
+    return _para_reais(total - anterior), (round(float(total - anterior) / float(anterior) * 100, 2) if anterior else None)
+
+@app.route('/api/analytics/categorias', methods=['GET'])
+@cache_resposta('ciclo', 'resumo_categoria')
+@limitar('pesadas')
+def analytics_categorias():
+    """Por ciclo e categoria: total, variação sobre o ciclo anterior e média móvel."""
+    try:
+        janela, inicio, fim = _analytics_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    forma = request.args.get('forma_pgto')
+
+    rollup = db.session.query(ResumoCategoria.ciclo_id, ResumoCategoria.categoria,
+                              db.func.sum(_centavos(ResumoCategoria.total)).label('total'))
+    if forma:
+        rollup = rollup.filter(ResumoCategoria.forma_pgto == forma)
+    if request.args.get('categoria'):
+        rollup = rollup.filter(ResumoCategoria.categoria == request.args['categoria'])
+    rollup = rollup.group_by(ResumoCategoria.ciclo_id, ResumoCategoria.categoria).subquery()
+    categorias = db.session.query(rollup.c.categoria).distinct().subquery()
+
+    # Grade ciclos x categorias: ciclo sem gasto na categoria entra com 0 (LAG compara ciclos vizinhos)
+    total = db.func.coalesce(rollup.c.total, 0)
+    janela_cat = {'partition_by': categorias.c.categoria, 'order_by': (Ciclo.data_inicio, Ciclo.id)}
+    sub = (db.session.query(Ciclo.id.label('ciclo_id'), Ciclo.nome, Ciclo.data_inicio, Ciclo.data_fim,
+                            categorias.c.categoria, total.label('total'),
+                            db.func.lag(total).over(**janela_cat).label('anterior'),
+                            db.func.avg(total).over(**janela_cat, rows=(-(janela - 1), 0)).label('media'))
+           .select_from(Ciclo)
+           .join(categorias, db.true())
+           .outerjoin(rollup, (rollup.c.ciclo_id == Ciclo.id) & (rollup.c.categoria == categorias.c.categoria))
+           .subquery())
+    query = _analytics_periodo(db.session.query(sub), sub, inicio, fim)
 
-        # Migração leve (SQLite): colunas novas para vincular lançamentos a dívidas
-        try:
-            cols_l = [row[1] for row in db.session.execute(text("PRAGMA table_info(lancamento)")).fetchall()]
-            if 'divida_id' not in cols_l:
-                db.session.execute(text("ALTER TABLE lancamento ADD COLUMN divida_id INTEGER"))
-            if 'parcela_num' not in cols_l:
-                db.session.execute(text("ALTER TABLE lancamento ADD COLUMN parcela_num INTEGER"))
-            if 'ultima_parcela' not in cols_l:
-                db.session.execute(text("ALTER TABLE lancamento ADD COLUMN ultima_parcela INTEGER NOT NULL DEFAULT 0"))
-            if 'forma_pgto' not in cols_l:
-                db.session.execute(text("ALTER TABLE lancamento ADD COLUMN forma_pgto VARCHAR(10) NOT NULL DEFAULT 'Debito'"))
-            db.session.commit()
-        except Exception as e:
-            print("Aviso migração lancamento:", e)
+    out = []
+    for r in query.order_by(sub.c.data_inicio, sub.c.ciclo_id, sub.c.categoria):
+        variacao, variacao_pct = _variacao(r.total, r.anterior)
+        out.append({'ciclo_id': r.ciclo_id, 'ciclo': r.nome, 'data_inicio': r.data_inicio.strftime('%Y-%m-%d'),
+                    'categoria': r.categoria, 'total': _para_reais(r.total),
+                    'variacao': variacao, 'variacao_pct': variacao_pct,
+                    'media_movel': round(float(r.media) / 100, 2)})
+    return jsonify(out)
 
-        try:
-            cols_d = [row[1] for row in db.session.execute(text("PRAGMA table_info(divida)")).fetchall()]
-            if 'total_parcelas' not in cols_d:
-                db.session.execute(text("ALTER TABLE divida ADD COLUMN total_parcelas INTEGER"))
-                db.session.commit()
-        except Exception as e:
-            print("Aviso migração divida:", e)
+@app.route('/api/analytics/orcamento', methods=['GET'])
+@cache_resposta('ciclo', 'resumo_categoria', 'gasto_fixo')
+@limitar('pesadas')
+def analytics_orcamento():
+    """Uso do orçamento por ciclo (fixos + lançamentos no débito; cartões não têm histórico)."""
+    try:
+        janela, inicio, fim = _analytics_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    lanc = (db.session.query(ResumoCategoria.ciclo_id, db.func.sum(_centavos(ResumoCategoria.total)).label('total'))
+            .filter(ResumoCategoria.forma_pgto != 'Credito')
+            .group_by(ResumoCategoria.ciclo_id)
+            .subquery())
+    fixos = (db.session.query(GastoFixo.ciclo_id, db.func.sum(_centavos(GastoFixo.valor)).label('total'))
+             .filter(db.func.coalesce(GastoFixo.forma_pgto, 'Debito') != 'Credito')
+             .group_by(GastoFixo.ciclo_id)
+             .subquery())
+    gastos = db.func.coalesce(lanc.c.total, 0) + db.func.coalesce(fixos.c.total, 0)
+    orcamento = _centavos(Ciclo.orcamento)
+    uso = db.case((orcamento > 0, gastos * 100.0 / orcamento))
+    ordem = {'order_by': (Ciclo.data_inicio, Ciclo.id)}
+    sub = (db.session.query(Ciclo.id.label('ciclo_id'), Ciclo.nome, Ciclo.data_inicio, Ciclo.data_fim,
+                            orcamento.label('orcamento'), gastos.label('gastos'), uso.label('uso'),
+                            db.func.avg(uso).over(**ordem, rows=(-(janela - 1), 0)).label('uso_medio'),
+                            db.func.lag(gastos).over(**ordem).label('anterior'),
+                            db.func.sum(gastos).over(**ordem).label('acumulado'))
+           .outerjoin(lanc, lanc.c.ciclo_id == Ciclo.id)
+           .outerjoin(fixos, fixos.c.ciclo_id == Ciclo.id)
+           .subquery())
+    query = _analytics_periodo(db.session.query(sub), sub, inicio, fim)
 
-        
-        # Migração leve (SQLite): adiciona coluna forma_pgto em gasto_fixo se não existir
-        try:
-            cols = [row[1] for row in db.session.execute(db.text("PRAGMA table_info(gasto_fixo)")).fetchall()]
-            if 'forma_pgto' not in cols:
-                db.session.execute(
-                    db.text("ALTER TABLE gasto_fixo ADD COLUMN forma_pgto VARCHAR(10) NOT NULL DEFAULT 'Debito'")
-                )
-                db.session.commit()
-        except Exception as e:
-            print("Aviso migração gasto_fixo:", e)
-            
-        # Migração leve (SQLite): adiciona coluna forma_pgto em lancamento se não existir
-        try:
-            cols_l = [row[1] for row in db.session.execute(db.text("PRAGMA table_info(lancamento)")).fetchall()]
-            if 'forma_pgto' not in cols_l:
-                db.session.execute(
-                    db.text("ALTER TABLE lancamento ADD COLUMN forma_pgto VARCHAR(10) NOT NULL DEFAULT 'Debito'")
-                )
-                db.session.commit()
-        except Exception as e:
-            print("Aviso migração lancamento:", e)
-
-        # Migração leve (SQLite): adiciona coluna forma_pgto em lancamento se não existir
+    out = []
+    for r in query.order_by(sub.c.data_inicio, sub.c.ciclo_id):
+        variacao, variacao_pct = _variacao(r.gastos, r.anterior)
+        out.append({'ciclo_id': r.ciclo_id, 'ciclo': r.nome, 'data_inicio': r.data_inicio.strftime('%Y-%m-%d'),
+                    'orcamento': _para_reais(r.orcamento), 'gastos': _para_reais(r.gastos),
+                    'disponivel': _para_reais(r.orcamento - r.gastos),
+                    'percent_usado': round(float(r.uso), 2) if r.uso is not None else None,
+                    'percent_usado_medio': round(float(r.uso_medio), 2) if r.uso_medio is not None else None,
+                    'variacao': variacao, 'variacao_pct': variacao_pct,
+                    'gastos_acumulados': _para_reais(r.acumulado)})
+    return jsonify(out)
+
+@app.route('/api/analytics/formas', methods=['GET'])
+@cache_resposta('ciclo', 'resumo_categoria', 'gasto_fixo')
+@limitar('pesadas')
+def analytics_formas():
+    """Débito x crédito por ciclo (fixos + lançamentos): total, participação e média móvel."""
+    try:
+        janela, inicio, fim = _analytics_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    partes = db.union_all(
+        db.select(ResumoCategoria.ciclo_id, _forma_normalizada(ResumoCategoria.forma_pgto).label('forma_pgto'),
+                  _centavos(ResumoCategoria.total).label('total')),
+        db.select(GastoFixo.ciclo_id, _forma_normalizada(GastoFixo.forma_pgto).label('forma_pgto'),
+                  _centavos(GastoFixo.valor).label('total'))).subquery()
+    por_forma = (db.session.query(partes.c.ciclo_id, partes.c.forma_pgto, db.func.sum(partes.c.total).label('total'))
+                 .group_by(partes.c.ciclo_id, partes.c.forma_pgto)
+                 .subquery())
+    formas = db.select(db.literal('Debito').label('forma_pgto')).union_all(
+        db.select(db.literal('Credito'))).subquery()
+
+    total = db.func.coalesce(por_forma.c.total, 0)
+    janela_forma = {'partition_by': formas.c.forma_pgto, 'order_by': (Ciclo.data_inicio, Ciclo.id)}
+    sub = (db.session.query(Ciclo.id.label('ciclo_id'), Ciclo.nome, Ciclo.data_inicio, Ciclo.data_fim,
+                            formas.c.forma_pgto, total.label('total'),
+                            db.func.sum(total).over(partition_by=Ciclo.id).label('total_ciclo'),
+                            db.func.lag(total).over(**janela_forma).label('anterior'),
+                            db.func.avg(total).over(**janela_forma, rows=(-(janela - 1), 0)).label('media'))
+           .select_from(Ciclo)
+           .join(formas, db.true())
+           .outerjoin(por_forma, (por_forma.c.ciclo_id == Ciclo.id) & (por_forma.c.forma_pgto == formas.c.forma_pgto))
+           .subquery())
+    query = _analytics_periodo(db.session.query(sub), sub, inicio, fim)
+
+    out = []
+    for r in query.order_by(sub.c.data_inicio, sub.c.ciclo_id, sub.c.forma_pgto.desc()):
+        variacao, variacao_pct = _variacao(r.total, r.anterior)
+        out.append({'ciclo_id': r.ciclo_id, 'ciclo': r.nome, 'data_inicio': r.data_inicio.strftime('%Y-%m-%d'),
+                    'forma_pgto': r.forma_pgto, 'total': _para_reais(r.total),
+                    'participacao_pct': round(float(r.total) / float(r.total_ciclo) * 100, 2) if r.total_ciclo else None,
+                    'variacao': variacao, 'variacao_pct': variacao_pct,
+                    'media_movel': round(float(r.media) / 100, 2)})
+    return jsonify(out)
+
+
+# API - Bootstrap (tudo que a tela inicial precisa, numa requisição só)
+@app.route('/api/bootstrap', methods=['GET'])
+@cache_resposta('ciclo', 'gasto_fixo', 'lancamento', 'investimento', 'cartao_credito', 'divida', 'checklist_status',
+                por_dia=True)
+def get_bootstrap():
+    ciclos = Ciclo.query.order_by(Ciclo.data_inicio.desc()).all()
+    ciclo_id = request.args.get('ciclo_id', type=int)
+    if ciclo_id:
+        ciclo = next((c for c in ciclos if c.id == ciclo_id), None)
+        if ciclo is None:
+            return jsonify({'error': 'Ciclo não encontrado'}), 404
+    else:
+        ciclo = next((c for c in ciclos if c.ativo), ciclos[0] if ciclos else None)
+
+    investimentos = Investimento.query.all()
+    cartoes = CartaoCredito.query.all()
+    dividas = Divida.query.order_by(Divida.id.desc()).all()
+
+    out = {
+        'ciclos': [_ciclo_dict(c) for c in ciclos],
+        'ciclo_id': ciclo.id if ciclo else None,
+        'investimentos': [_investimento_dict(i) for i in investimentos],
+        'cartoes': [_cartao_dict(c) for c in cartoes],
+        'dividas': _dividas_lista(dividas),
+        'gastos_fixos': [],
+        'lancamentos': {'items': [], 'next_cursor': None},
+        'checklist': None,
+        'resumo': None,
+    }
+    if ciclo:
+        fixos = GastoFixo.query.filter_by(ciclo_id=ciclo.id).order_by(GastoFixo.id.desc()).all()
+        items, next_cursor = _pagina_lancamentos(ciclo, limit=request.args.get('limit', 200, type=int))
+        totais_fixos = (sum(_para_centavos(g.valor) for g in fixos if (g.forma_pgto or 'Debito') != 'Credito'),
+                        sum(_para_centavos(g.valor) for g in fixos if g.forma_pgto == 'Credito'))
+        out.update({
+            'gastos_fixos': [_gasto_fixo_dict(g) for g in fixos],
+            'lancamentos': {'items': items, 'next_cursor': next_cursor},
+            'checklist': _checklist(ciclo, fixos, cartoes, dividas),
+            'resumo': _resumo(ciclo, totais_fixos,
+                              sum(_para_centavos(i.valor) for i in investimentos),
+                              sum(_para_centavos(c.valor_atual) for c in cartoes)),
+        })
+    return jsonify(out)
+
+
+# API - Exportação (streaming NDJSON/CSV, leitura em lotes)
+EXPORT_LOTE = 1000
+
+CICLO_CAMPOS = {
+    'id': Ciclo.id,
+    'nome': Ciclo.nome,
+    'data_inicio': Ciclo.data_inicio,
+    'data_fim': Ciclo.data_fim,
+    'orcamento': Ciclo.orcamento,
+    'ativo': Ciclo.ativo,
+}
+CICLO_FORMATOS = {'ativo': bool}  # NULL em bancos antigos sai como false
+
+def _exportar(nome, campos_def, query, formatos=None):
+    """Resposta em streaming: linhas lidas em lotes (yield_per) e escritas uma a uma.
+    `formatos` (campo -> função) converte os valores que não saem prontos da coluna."""
+    formato = (request.args.get('formato') or 'ndjson').lower()
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'error': 'formato deve ser ndjson ou csv'}), 400
+
+    campos = list(campos_def)
+    query = query.with_entities(*[campos_def[f] for f in campos]).yield_per(EXPORT_LOTE)
+
+    def valores(r):
+        if not formatos:
+            return r
+        return [formatos[f](v) if f in formatos else v for f, v in zip(campos, r)]
+
+    def gerar():
+        if formato == 'csv':
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            w.writerow(campos)
+            for r in query:
+                w.writerow(valores(r))
+                if buf.tell() > 64 * 1024:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+            yield buf.getvalue()
+        else:
+            for r in query:
+                yield app.json.dumps(dict(zip(campos, valores(r)))) + '\n'
+
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(gerar()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={nome}.{formato}'})
+
+@app.route('/api/export/lancamentos', methods=['GET'])
+@limitar('pesadas')
+def exportar_lancamentos():
+    query = Lancamento.query
+    try:
+        ciclo_id = request.args.get('ciclo_id', type=int)
+        if ciclo_id:
+            ciclo = Ciclo.query.get_or_404(ciclo_id)
+            query = query.filter(Lancamento.data >= ciclo.data_inicio, Lancamento.data <= ciclo.data_fim)
+        if request.args.get('data_inicio'):
+            query = query.filter(Lancamento.data >= datetime.strptime(request.args['data_inicio'], '%Y-%m-%d').date())
+        if request.args.get('data_fim'):
+            query = query.filter(Lancamento.data <= datetime.strptime(request.args['data_fim'], '%Y-%m-%d').date())
+    except ValueError:
+        return jsonify({'error': 'Datas devem estar no formato AAAA-MM-DD'}), 400
+    if request.args.get('categoria'):
+        query = query.filter(Lancamento.categoria == request.args['categoria'])
+    if request.args.get('forma_pgto'):
+        query = query.filter(Lancamento.forma_pgto == request.args['forma_pgto'])
+
+    return _exportar('lancamentos', LANCAMENTO_CAMPOS,
+                     query.order_by(Lancamento.data.asc(), Lancamento.id.asc()))
+
+@app.route('/api/export/ciclos', methods=['GET'])
+@limitar('pesadas')
+def exportar_ciclos():
+    return _exportar('ciclos', CICLO_CAMPOS, Ciclo.query.order_by(Ciclo.data_inicio.asc()), CICLO_FORMATOS)
+
+
+# API - Busca nas descrições dos lançamentos (SQLite: índice FTS5 mantido por triggers, ver _mig_busca).
+# O total é exato (contado no índice); ordenação por relevância e facetas usam as BUSCA_JANELA ocorrências
+# mais recentes, para um termo comum (dezenas de milhares de lançamentos) não custar uma leitura por linha.
+BUSCA_LIMITE = 50
+BUSCA_JANELA = 1000
+_busca = db.table('lancamento_busca', db.column('rowid'), db.column('lancamento_busca'))
+
+def _busca_frase(texto):
+    return ' '.join(f'"{t}"' for t in re.findall(r'\w+', texto.lower()))
+
+def _busca_expressao(q, categoria=None, forma_pgto=None):
+    """Expressão FTS5: palavras de q como prefixos na descrição ("farm" acha "Farmácia") e os filtros."""
+    termos = ' '.join(f'"{t}"*' for t in re.findall(r'\w+', q.lower()))
+    if not termos:
+        return None
+    expr = f'descricao : ({termos})'
+    for coluna, valor in (('categoria', categoria), ('forma_pgto', forma_pgto)):
+        if valor and _busca_frase(valor):
+            expr += f' AND {coluna} : ({_busca_frase(valor)})'
+    return expr
+
+@app.route('/api/busca', methods=['GET'])
+@cache_resposta('lancamento')
+def buscar_lancamentos():
+    """Lançamentos cuja descrição contém as palavras de `q`, por relevância, com contagens por faceta."""
+    q = request.args.get('q', '')
+    categoria, forma_pgto = request.args.get('categoria'), request.args.get('forma_pgto')
+    expr = _busca_expressao(q, categoria, forma_pgto)
+    if not expr:
+        return jsonify({'error': 'Informe o texto da busca (q)'}), 400
+    limit = max(1, min(request.args.get('limit', BUSCA_LIMITE, type=int), LANCAMENTOS_LIMITE_MAX))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    filtros = []
+    try:
+        if request.args.get('data_inicio'):
+            filtros.append(Lancamento.data >= datetime.strptime(request.args['data_inicio'], '%Y-%m-%d').date())
+        if request.args.get('data_fim'):
+            filtros.append(Lancamento.data <= datetime.strptime(request.args['data_fim'], '%Y-%m-%d').date())
+    except ValueError:
+        return jsonify({'error': 'Datas devem estar no formato YYYY-MM-DD'}), 400
+    # O índice acha por palavras; a igualdade exata confere em seguida ("Renda Fixa" x "Renda Fixa Plus")
+    if categoria:
+        filtros.append(Lancamento.categoria == categoria)
+    if forma_pgto:
+        filtros.append(Lancamento.forma_pgto == forma_pgto)
+
+    # data crua (texto ISO no SQLite): converter milhares de datas só para agrupar por mês pesa mais que a consulta
+    data_txt = db.type_coerce(Lancamento.data, db.String)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # Tenant fora do filtro automático: com "tenant_id = ?" indexável o SQLite (sem estatísticas) percorre
+        # o ix_lancamento_tenant_* e consulta o FTS linha a linha. A contagem filtra o tenant no próprio índice;
+        # a janela em lancamento, com "+ 0" para não usar o índice (no MATCH o bm25 leria o termo do tenant,
+        # presente em todas as linhas, a cada busca)
+        casa = _busca.c.lancamento_busca.op('MATCH')
+        expr_total = expr if app.config['TENANT_ARQUIVOS'] else f'{expr} AND tenant_id : "{_tenant_id()}"'
+        contagem = (db.session.query(db.func.count()).select_from(_busca).filter(casa(expr_total))
+                    .execution_options(todos_tenants=True))
+        if filtros:
+            contagem = contagem.join(Lancamento, Lancamento.id == _busca.c.rowid).filter(*filtros)
+        # bm25 só da descrição (pesos 0 nas colunas de filtro); menor é mais relevante
+        rank = db.func.bm25(db.literal_column('lancamento_busca'), 1.0, 0.0, 0.0, 0.0)
+        janela = (db.session.query(Lancamento.id, rank, data_txt, Lancamento.categoria, Lancamento.forma_pgto)
+                  .select_from(_busca).join(Lancamento, Lancamento.id == _busca.c.rowid)
+                  .filter(casa(expr), Lancamento.tenant_id + 0 == _tenant_id(), *filtros)
+                  .order_by(_busca.c.rowid.desc()).execution_options(todos_tenants=True))
+    else:
+        # Sem FTS5: cada palavra vira um ILIKE (varre a tabela)
+        palavras = [Lancamento.descricao.ilike(f'%{t}%') for t in re.findall(r'\w+', q)]
+        contagem = db.session.query(db.func.count(Lancamento.id)).filter(*palavras, *filtros)
+        janela = (db.session.query(Lancamento.id, db.literal(0), data_txt, Lancamento.categoria, Lancamento.forma_pgto)
+                  .filter(*palavras, *filtros).order_by(Lancamento.id.desc()))
+    total = contagem.scalar()
+    janela = janela.limit(BUSCA_JANELA).all()
+
+    # Facetas e ordenação em memória, sobre a janela
+    facetas = {'categoria': {}, 'forma_pgto': {}, 'mes': {}}
+    for _, _, data_l, cat, forma in janela:
+        for nome, valor in (('categoria', cat), ('forma_pgto', forma), ('mes', str(data_l)[:7])):
+            facetas[nome][valor] = facetas[nome].get(valor, 0) + 1
+    facetas = {nome: [{'valor': v, 'quantidade': n} for v, n in sorted(c.items(), key=lambda i: (-i[1], i[0]))]
+               for nome, c in facetas.items()}
+    facetas['mes'].sort(key=lambda i: i['valor'], reverse=True)
+
+    janela.sort(key=lambda r: (str(r[2]), r[0]), reverse=True)  # empate na relevância: mais recente primeiro
+    janela.sort(key=lambda r: r[1])
+    ids = [r[0] for r in janela[offset:offset + limit]]  # já do tenant: busca pela chave, sem o índice do tenant
+    campos = list(LANCAMENTO_CAMPOS)
+    por_id = {r[0]: r for r in Lancamento.query.with_entities(*[LANCAMENTO_CAMPOS[f] for f in campos])
+              .filter(Lancamento.id.in_(ids)).execution_options(todos_tenants=True)} if ids else {}
+
+    return jsonify({
+        'q': q,
+        'total': total,
+        'items': [dict(zip(campos, por_id[i])) for i in ids if i in por_id],
+        'facetas': facetas,
+        'parcial': len(janela) < total,  # relevância e facetas só das BUSCA_JANELA ocorrências mais recentes
+    })
+
+
+# API - Eventos (SSE). Cada escrita da sessão grava em `evento` (mesma transação); em cada worker, uma
+# thread lê o log e repassa para as filas dos clientes conectados, então um worker vê o que o outro gravou.
+EVENTOS_IGNORADOS = {'evento', 'versao_tabela', 'versao_schema', 'resumo_categoria'}
+EVENTOS_RETENCAO = 10_000   # eventos mantidos no log (os mais antigos são apagados)
+EVENTOS_PODA_A_CADA = 500   # escritas (por processo) entre uma poda e outra
+SSE_FILA_MAX = 1000         # eventos pendentes por cliente; se encher, o cliente recebe "recarregar"
+SSE_HEARTBEAT = 15          # segundos sem evento até mandar um comentário (mantém proxies abertos)
+SSE_LOTE = 500
+
+def _lancamento_dict(l):
+    return {f: getattr(l, f) for f in LANCAMENTO_CAMPOS}
+
+# Linha nova no evento, no mesmo formato das rotas GET (o cliente substitui o item da lista).
+# Tabelas sem serializador (dívidas e checklist têm campos calculados) mandam só tabela/op/id.
+EVENTO_DADOS = {
+    'ciclo': _ciclo_dict,
+    'gasto_fixo': _gasto_fixo_dict,
+    'lancamento': _lancamento_dict,
+    'investimento': _investimento_dict,
+    'cartao_credito': _cartao_dict,
+}
+
+_eventos_gravados = 0
+
+def _gravar_eventos(conn, eventos):
+    global _eventos_gravados
+    if not eventos or not app.config['EVENTOS']:
+        return
+    conn.execute(Evento.__table__.insert(), eventos)
+    _eventos_gravados += len(eventos)
+    if _eventos_gravados >= EVENTOS_PODA_A_CADA:
+        _eventos_gravados = 0
+        ultimo = conn.execute(db.select(db.func.max(Evento.id))).scalar() or 0
+        conn.execute(Evento.__table__.delete().where(Evento.id <= ultimo - EVENTOS_RETENCAO))
+
+@event.listens_for(db.session, 'after_flush')
+def _eventos_apos_flush(session, contexto):
+    eventos = []
+    agora = datetime.utcnow()
+    for op, objs in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for o in objs:
+            tabela = getattr(o, '__tablename__', None)
+            if tabela is None or tabela in EVENTOS_IGNORADOS:
+                continue
+            if op == 'update' and not session.is_modified(o, include_collections=False):
+                continue
+            dados = EVENTO_DADOS.get(tabela) if op != 'delete' else None
+            eventos.append({'tabela': tabela, 'op': op, 'ref_id': getattr(o, 'id', None), 'criado_em': agora,
+                            'dados': app.json.dumps(dados(o)) if dados else None})
+    _gravar_eventos(session.connection(), eventos)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _eventos_dml(estado):
+    # INSERT/UPDATE/DELETE em massa (importação, checklist em lote): um evento "lote" por tabela
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return None
+    tabela = getattr(estado.statement, 'table', None)
+    if tabela is not None and tabela.name not in EVENTOS_IGNORADOS:
+        _gravar_eventos(estado.session.connection(), [{'tabela': tabela.name, 'op': 'lote', 'ref_id': None,
+                                                        'dados': None, 'criado_em': datetime.utcnow()}])
+    return None
+
+
+class _Assinante:
+    def __init__(self, tenant_id):
+        self.tenant_id = tenant_id
+        self.fila = queue.Queue(maxsize=SSE_FILA_MAX)
+        self.perdeu = False  # fila encheu: eventos descartados, o cliente precisa recarregar
+
+
+class DifusorEventos:
+    """Uma thread por banco e processo lê o log `evento` e distribui para as filas dos clientes deste processo.
+
+    Só roda enquanto houver cliente conectado. Os ids crescem na ordem dos commits (no SQLite há um
+    escritor por vez), então basta lembrar o último id lido. O log tem todos os tenants do banco; cada
+    cliente só recebe os eventos do seu. `arquivo` é o tenant do arquivo no modo um-arquivo-por-tenant.
+    """
+
+    def __init__(self, arquivo=None):
+        self.arquivo = arquivo
+        self.assinantes = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.ultimo = 0
+
+    def assinar(self):
+        a = _Assinante(_tenant_id())
+        with self.lock:
+            if self.thread is None:
+                self.ultimo = (db.session.query(db.func.max(Evento.id))
+                               .execution_options(todos_tenants=True).scalar() or 0)
+                self.thread = threading.Thread(target=self._rodar, name='difusor-eventos', daemon=True)
+                self.thread.start()
+            self.assinantes.add(a)
+        return a
+
+    def cancelar(self, a):
+        with self.lock:
+            self.assinantes.discard(a)
+
+    def _rodar(self):
+        if self.arquivo:
+            _tenant_atual.set((self.arquivo, 1))  # contexto próprio da thread: escolhe o arquivo
+        falhas = 0
+        while True:
+            with self.lock:
+                if not self.assinantes:
+                    self.thread = None
+                    return
+            try:
+                with app.app_context():
+                    rows = (Evento.query.with_entities(Evento.id, Evento.tabela, Evento.op, Evento.ref_id, Evento.dados,
+                                                       Evento.tenant_id)
+                            .filter(Evento.id > self.ultimo).order_by(Evento.id).limit(SSE_LOTE)
+                            .execution_options(todos_tenants=True).all())
+            except Exception as e:  # banco ocupado/indisponível: tenta de novo, esperando mais a cada falha
+                falhas += 1
+                if falhas & (falhas - 1) == 0:  # 1ª, 2ª, 4ª, 8ª... falha seguida: não inunda o log
+                    app.logger.warning("Difusor de eventos: %s (%d falha(s) seguida(s))", e, falhas)
+                time.sleep(min(app.config['SSE_INTERVALO'] * 2 ** min(falhas, 10), 30))
+                continue
+            falhas = 0
+            if rows:
+                self.ultimo = rows[-1][0]
+                with self.lock:
+                    assinantes = list(self.assinantes)
+                for a in assinantes:
+                    for r in rows:
+                        if r[5] != a.tenant_id:
+                            continue
+                        try:
+                            a.fila.put_nowait(tuple(r[:5]))
+                        except queue.Full:
+                            a.perdeu = True
+                            break
+            if len(rows) < SSE_LOTE:
+                time.sleep(app.config['SSE_INTERVALO'])
+
+_difusores = {}  # None (banco único) ou tenant (um arquivo por tenant) -> DifusorEventos
+_difusores_lock = threading.Lock()
+
+def _difusor():
+    arquivo = _tenant_slug() if app.config['TENANT_ARQUIVOS'] else None
+    with _difusores_lock:
+        if arquivo not in _difusores:
+            _difusores[arquivo] = DifusorEventos(arquivo)
+        return _difusores[arquivo]
+
+def _sse(evento_id, dados, nome=None):
+    linhas = [f'id: {evento_id}']
+    if nome:
+        linhas.append(f'event: {nome}')
+    linhas.append(f'data: {dados}')
+    return '\n'.join(linhas) + '\n\n'
+
+def _evento_json(r):
+    evento_id, tabela, op, ref_id, dados = r
+    return _sse(evento_id, f'{{"tabela": {json.dumps(tabela)}, "op": {json.dumps(op)}, '
+                           f'"id": {json.dumps(ref_id)}, "dados": {dados or "null"}}}')
+
+@app.route('/api/stream', methods=['GET'])
+def stream_eventos():
+    """Server-sent events: {tabela, op, id, dados} a cada alteração; `event: recarregar` quando o cliente perdeu eventos."""
+    if not app.config['EVENTOS']:
+        return jsonify({'error': 'Eventos desligados (APP_EVENTOS=0 ou banco que não é SQLite)'}), 404
+    desde = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    try:
+        desde = int(desde) if desde not in (None, '') else None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID inválido'}), 400
+
+    difusor = _difusor()
+
+    def gerar():
+        assinante = difusor.assinar()  # antes do replay: nada fica entre um e outro
         try:
-            cols_l = [row[1] for row in db.session.execute(db.text("PRAGMA table_info(lancamento)")).fetchall()]
-            if 'forma_pgto' not in cols_l:
-                db.session.execute(
-                    db.text("ALTER TABLE lancamento ADD COLUMN forma_pgto VARCHAR(10) NOT NULL DEFAULT 'Debito'")
-                )
-                db.session.commit()
-        except Exception as e:
-            print("Aviso migração lancamento:", e)
-            
-        # Migração leve (SQLite): adiciona coluna ciclo_id em gasto_fixo se não existir + backfill
+            visto = desde
+            if visto is None:
+                visto = db.session.query(db.func.max(Evento.id)).execution_options(todos_tenants=True).scalar() or 0
+                yield _sse(visto, '{}', 'pronto')
+            else:
+                # Reconexão: repassa o que foi gravado (neste tenant) desde o último id recebido. A poda é
+                # do log inteiro, então o buraco é medido pelo evento mais antigo de qualquer tenant.
+                primeiro = db.session.query(db.func.min(Evento.id)).execution_options(todos_tenants=True).scalar()
+                rows = (Evento.query.with_entities(Evento.id, Evento.tabela, Evento.op, Evento.ref_id, Evento.dados)
+                        .filter(Evento.id > visto).order_by(Evento.id).limit(SSE_FILA_MAX + 1).all())
+                if len(rows) > SSE_FILA_MAX or (primeiro is not None and primeiro > visto + 1):
+                    visto = db.session.query(db.func.max(Evento.id)).execution_options(todos_tenants=True).scalar() or 0
+                    yield _sse(visto, '{}', 'recarregar')
+                else:
+                    for r in rows:
+                        visto = r[0]
+                        yield _evento_json(r)
+            db.session.remove()  # não segura conexão do pool durante o stream
+
+            fim = time.monotonic() + app.config['SSE_DURACAO']
+            while time.monotonic() < fim:
+                if assinante.perdeu:
+                    while not assinante.fila.empty():
+                        assinante.fila.get_nowait()
+                    assinante.perdeu = False
+                    visto = difusor.ultimo
+                    yield _sse(visto, '{}', 'recarregar')
+                    continue
+                try:
+                    r = assinante.fila.get(timeout=min(SSE_HEARTBEAT, max(fim - time.monotonic(), 0.01)))
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                if r[0] > visto:
+                    visto = r[0]
+                    yield _evento_json(r)
+        finally:
+            difusor.cancelar(assinante)
+
+    return Response(stream_with_context(gerar()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _colunas(tabela, conn=None):
+    """Nomes das colunas de uma tabela (via inspector, funciona em qualquer banco)."""
+    return [c['name'] for c in db.inspect(conn if conn is not None else db.engine).get_columns(tabela)]
+
+# Migrações versionadas: cada passo roda uma vez, em ordem, e o nº aplicado fica em versao_schema.
+# Todas usam a conexão da sessão, dentro da trava (BEGIN IMMEDIATE no SQLite, advisory lock no
+# PostgreSQL): com vários workers subindo juntos, um migra e os outros esperam e acham o banco em dia.
+# Os passos são idempotentes (bancos antigos, sem versao_schema, passam por todos).
+def _mig_tabelas(conn):
+    db.metadata.create_all(conn)
+
+def _mig_colunas_lancamento(conn):
+    cols = _colunas('lancamento', conn)
+    for nome, ddl in (('divida_id', 'INTEGER'),
+                      ('parcela_num', 'INTEGER'),
+                      ('ultima_parcela', 'INTEGER NOT NULL DEFAULT 0'),
+                      ('forma_pgto', "VARCHAR(10) NOT NULL DEFAULT 'Debito'")):
+        if nome not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE lancamento ADD COLUMN {nome} {ddl}")
+
+def _mig_colunas_divida(conn):
+    if 'total_parcelas' not in _colunas('divida', conn):
+        conn.exec_driver_sql("ALTER TABLE divida ADD COLUMN total_parcelas INTEGER")
+
+def _mig_colunas_gasto_fixo(conn):
+    cols = _colunas('gasto_fixo', conn)
+    if 'forma_pgto' not in cols:
+        conn.exec_driver_sql("ALTER TABLE gasto_fixo ADD COLUMN forma_pgto VARCHAR(10) NOT NULL DEFAULT 'Debito'")
+    if 'ciclo_id' not in cols:
+        conn.exec_driver_sql("ALTER TABLE gasto_fixo ADD COLUMN ciclo_id INTEGER")
+    # Backfill: fixos antigos (sem ciclo) ficam no ciclo ativo
+    conn.execute(text("UPDATE gasto_fixo SET ciclo_id = (SELECT id FROM ciclo WHERE ativo = :t LIMIT 1) "
+                      "WHERE ciclo_id IS NULL"), {'t': True})
+
+def _mig_indices_lancamento(conn):
+    # create_all não cria índices em tabelas que já existiam (os que usam tenant_id ficam para _mig_tenants)
+    cols = _colunas('lancamento', conn)
+    for idx in Lancamento.__table__.indexes:
+        if all(c.name in cols for c in idx.columns):
+            idx.create(conn, checkfirst=True)
+
+def _mig_centavos(conn):
+    """Converte colunas monetárias antigas (REAL, em reais) para inteiro em centavos."""
+    insp = db.inspect(conn)
+    for tabela in db.metadata.sorted_tables:
+        monetarias = [c.name for c in tabela.columns if isinstance(c.type, Centavos)]
+        if not monetarias:
+            continue
+        tipos = {c['name']: c['type'] for c in insp.get_columns(tabela.name)}
+        antigas = [n for n in monetarias if n in tipos and not isinstance(tipos[n], db.Integer)]
+        if not antigas:
+            continue
+
+        if conn.dialect.name != 'sqlite':
+            for n in antigas:
+                conn.exec_driver_sql(f"ALTER TABLE {tabela.name} ALTER COLUMN {n} TYPE BIGINT "
+                                     f"USING CAST(ROUND({n} * 100) AS BIGINT)")
+        else:
+            # SQLite não muda o tipo de uma coluna: recria a tabela e copia convertendo
+            cols = [c.name for c in tabela.columns if c.name in tipos]
+            valores = ', '.join(f"CAST(ROUND({n} * 100) AS INTEGER)" if n in antigas else n for n in cols)
+            conn.exec_driver_sql("PRAGMA legacy_alter_table=ON")  # não reescreve FKs das outras tabelas
+            for idx in insp.get_indexes(tabela.name):
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{idx["name"]}"')
+            conn.exec_driver_sql(f"ALTER TABLE {tabela.name} RENAME TO {tabela.name}__reais")
+            tabela.create(conn)
+            conn.exec_driver_sql(f"INSERT INTO {tabela.name} ({', '.join(cols)}) "
+                                 f"SELECT {valores} FROM {tabela.name}__reais")
+            conn.exec_driver_sql(f"DROP TABLE {tabela.name}__reais")
+            conn.exec_driver_sql("PRAGMA legacy_alter_table=OFF")
+        print(f"Migração: {tabela.name}.{', '.join(antigas)} convertido(s) para centavos")
+
+def _mig_versoes_tabelas(conn):
+    # Uma linha de versão por tabela (cache de respostas); em bancos anteriores aos tenants, _mig_tenants recria
+    if 'tenant_id' not in _colunas('versao_tabela', conn):
+        return
+    existentes = {t for (t,) in conn.execute(db.select(VersaoTabela.tabela))}
+    novas = [{'tabela': t, 'versao': 0} for t in db.metadata.tables if t not in existentes]
+    if novas:
+        conn.execute(VersaoTabela.__table__.insert(), novas)
+
+def _mig_busca(conn, colunas='descricao, categoria, forma_pgto'):
+    """Índice FTS5 (só SQLite) de descrição, categoria e forma_pgto (+ tenant_id), com conteúdo externo."""
+    if conn.dialect.name != 'sqlite':
+        return
+    novos = ', '.join(f'new.{c}' for c in colunas.split(', '))
+    velhos = ', '.join(f'old.{c}' for c in colunas.split(', '))
+    conn.exec_driver_sql(f"CREATE VIRTUAL TABLE IF NOT EXISTS lancamento_busca USING fts5({colunas}, "
+                         "content='lancamento', content_rowid='id', "
+                         "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+    conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS lancamento_busca_ai AFTER INSERT ON lancamento BEGIN "
+                         f"INSERT INTO lancamento_busca(rowid, {colunas}) VALUES (new.id, {novos}); END")
+    conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS lancamento_busca_ad AFTER DELETE ON lancamento BEGIN "
+                         f"INSERT INTO lancamento_busca(lancamento_busca, rowid, {colunas}) "
+                         f"VALUES ('delete', old.id, {velhos}); END")
+    conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS lancamento_busca_au AFTER UPDATE OF {colunas} ON lancamento BEGIN "
+                         f"INSERT INTO lancamento_busca(lancamento_busca, rowid, {colunas}) "
+                         f"VALUES ('delete', old.id, {velhos}); "
+                         f"INSERT INTO lancamento_busca(rowid, {colunas}) VALUES (new.id, {novos}); END")
+    conn.exec_driver_sql("INSERT INTO lancamento_busca(lancamento_busca) VALUES ('rebuild')")
+
+def _mig_eventos(conn):
+    Evento.__table__.create(conn, checkfirst=True)
+
+def _mig_rollup(conn):
+    # Resumo por categoria: preenche a partir dos lançamentos já existentes (bancos anteriores aos tenants
+    # só depois de _mig_tenants, que roda este passo de novo)
+    if any('tenant_id' not in _colunas(t, conn) for t in ('lancamento', 'resumo_categoria')):
+        return
+    if not db.session.query(ResumoCategoria.ciclo_id).first() and db.session.query(Lancamento.id).first():
+        print(f"Resumo por categoria: {_rollup_reconstruir()} linha(s) calculada(s)")
+
+def _mig_tenants(conn):
+    """tenant_id em todas as tabelas de dados (linhas existentes ficam no tenant 1) e índices começando por ele."""
+    t = Tenant.__table__
+    t.create(conn, checkfirst=True)
+    if conn.execute(db.select(t.c.id).limit(1)).first() is None:
+        conn.execute(t.insert().values(id=1, slug=_tenant_slug(), criado_em=datetime.utcnow()))
+    for tabela in db.metadata.sorted_tables:
+        if ('tenant_id' in tabela.c and tabela.name != VersaoTabela.__tablename__
+                and 'tenant_id' not in _colunas(tabela.name, conn)):
+            conn.exec_driver_sql(f"ALTER TABLE {tabela.name} ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT 1")
+    # versao_tabela: tenant_id entra na chave primária; recria mantendo as versões no tenant 1
+    if 'tenant_id' not in _colunas(VersaoTabela.__tablename__, conn):
+        versoes = conn.exec_driver_sql("SELECT tabela, versao FROM versao_tabela").all()
+        VersaoTabela.__table__.drop(conn)
+        VersaoTabela.__table__.create(conn)
+        if versoes:
+            conn.execute(VersaoTabela.__table__.insert(),
+                         [{'tenant_id': 1, 'tabela': tab, 'versao': v} for tab, v in versoes])
+    # índices antigos (sem tenant_id) dão lugar aos que começam por tenant_id
+    for nome in ('ix_lancamento_data_forma_pgto', 'ix_lancamento_divida_data', 'ix_gasto_fixo_ciclo_id'):
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {nome}")
+    for tabela in db.metadata.sorted_tables:
+        for idx in tabela.indexes:
+            idx.create(conn, checkfirst=True)
+    # busca: tenant_id vira coluna do índice FTS (filtro dentro do MATCH, sem ir à tabela)
+    if conn.dialect.name == 'sqlite':
+        for sufixo in ('ai', 'ad', 'au'):
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS lancamento_busca_{sufixo}")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS lancamento_busca")
+        _mig_busca(conn, 'descricao, categoria, forma_pgto, tenant_id')
+    _mig_rollup(conn)
+
+def _mig_sequencia_tenant(conn):
+    # _mig_tenants grava o tenant 1 com id explícito: no PostgreSQL a sequência do SERIAL fica para trás
+    # e o próximo tenant criado colidiria com ele
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql("SELECT setval(pg_get_serial_sequence('tenant', 'id'), "
+                             "(SELECT COALESCE(MAX(id), 1) FROM tenant))")
+
+MIGRACOES = [
+    _mig_tabelas,
+    _mig_colunas_lancamento,
+    _mig_colunas_divida,
+    _mig_colunas_gasto_fixo,
+    _mig_indices_lancamento,
+    _mig_centavos,
+    _mig_versoes_tabelas,
+    _mig_rollup,
+    _mig_busca,
+    _mig_eventos,
+    _mig_tenants,
+    _mig_sequencia_tenant,
+]  # só acrescente no fim: a posição (1, 2, ...) é a versão gravada no banco
+
+MIGRACAO_TRAVA_PG = 7_461_020  # chave do pg_advisory_xact_lock
+
+class VersaoSchema(db.Model):
+    """Nº de migrações aplicadas (linha única)."""
+    __tablename__ = 'versao_schema'
+    id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False)
+
+def _versao_schema(conn=None):
+    if conn is not None:  # dentro da trava: sem erro proposital, que abortaria a transação
+        if not db.inspect(conn).has_table(VersaoSchema.__tablename__):
+            return 0
+        return conn.execute(db.select(VersaoSchema.versao)).scalar() or 0
+    try:
+        return db.session.execute(db.select(VersaoSchema.versao)).scalar() or 0
+    except (OperationalError, ProgrammingError):  # tabela ainda não existe
+        db.session.rollback()
+        return 0
+
+def _travar_migracao():
+    """Abre a transação da sessão com a trava de migração (espera outro processo que esteja migrando)."""
+    conn = db.session.connection()
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {'k': MIGRACAO_TRAVA_PG})
+        return conn
+    if conn.dialect.name != 'sqlite':
+        return conn
+    limite = time.monotonic() + app.config['MIGRACAO_ESPERA']
+    while True:
         try:
-            cols_gf = [row[1] for row in db.session.execute(text("PRAGMA table_info(gasto_fixo)")).fetchall()]
-
-            if 'ciclo_id' not in cols_gf:
-                db.session.execute(text("ALTER TABLE gasto_fixo ADD COLUMN ciclo_id INTEGER"))
-                db.session.commit()
-
-            # Backfill: define ciclo_id para registros antigos que ficaram NULL
-            ciclo_ativo = Ciclo.query.filter_by(ativo=True).first()
-            if ciclo_ativo:
-                db.session.execute(
-                    text("UPDATE gasto_fixo SET ciclo_id = :cid WHERE ciclo_id IS NULL"),
-                    {"cid": ciclo_ativo.id}
-                )
-                db.session.commit()
-
-        except Exception as e:
-            print("Aviso migração ciclo_id gasto_fixo:", e)
-            
+            conn.exec_driver_sql("BEGIN IMMEDIATE")  # trava de escrita do arquivo (busy_timeout já espera um pouco)
+            return conn
+        except OperationalError:
+            db.session.rollback()
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.2)
+            conn = db.session.connection()
+
+def migrar():
+    """Aplica as migrações pendentes. Com o banco em dia, é uma única consulta."""
+    if _versao_schema() >= len(MIGRACOES):
+        db.session.rollback()
+        return 0
+    conn = _travar_migracao()
+    try:
+        versao = _versao_schema(conn)  # outro worker pode ter migrado enquanto esperávamos
+        for n, passo in enumerate(MIGRACOES[versao:], start=versao + 1):
+            passo(conn)
+            conn.execute(VersaoSchema.__table__.delete())
+            conn.execute(VersaoSchema.__table__.insert().values(id=1, versao=n))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(MIGRACOES) - versao
+
+@app.cli.command('migrar')
+@click.option('--tenant', help='Com APP_TENANT_ARQUIVOS: migra o arquivo deste tenant (padrão: APP_TENANT_PADRAO)')
+def migrar_cmd(tenant):
+    """Aplica as migrações pendentes do banco."""
+    if tenant and app.config['TENANT_ARQUIVOS']:
+        if not TENANT_SLUG.match(tenant):
+            raise click.BadParameter(f'Tenant inválido: {tenant!r}', param_hint='--tenant')
+        if not os.path.exists(_arquivo_tenant(tenant)):
+            raise click.BadParameter(f'Tenant não encontrado: {tenant} (use criar-tenant)', param_hint='--tenant')
+        _tenant_atual.set((tenant, 1))
+    n = migrar()
+    click.echo(f"{n} migração(ões) aplicada(s); schema na versão {len(MIGRACOES)}")
+
+@app.cli.command('criar-tenant')
+@click.argument('slug')
+def criar_tenant_cmd(slug):
+    """Cria um tenant (com APP_TENANT_ARQUIVOS, o arquivo dele, já migrado)."""
+    try:
+        _, tid = _resolver_tenant(slug, criar=True)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='SLUG')
+    click.echo(f"Tenant {slug} pronto (id {tid})")
+
+if app.config['MIGRAR_AO_INICIAR']:
+    with app.app_context():
+        migrar()
+
+# Inicializar banco de dados (migrações + dados de exemplo num banco sem ciclos)
+def init_db():
+    with app.app_context():
+        migrar()
 
         # Verificar se já existe um ciclo ativo
         if not Ciclo.query.filter_by(ativo=True).first():
@@ -793,8 +3106,8 @@ def init_db():
             
             for item in gastos_exemplo + lancamentos_exemplo + investimentos_exemplo + cartoes_exemplo:
                 db.session.add(item)
-            
-            db.session.commit()
+
+            db.session.commit()  # os lançamentos de exemplo entram no resumo pelo _rollup_apos_flush
             print("Banco de dados inicializado com dados de exemplo!")
 
 if __name__ == '__main__':
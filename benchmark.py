@@ -0,0 +1,250 @@
+"""Benchmark de todas as rotas /api/* pelo test client do Flask (sem servidor).
+
+Roda sobre uma cópia do banco (as escritas não alteram o original) e mede, por rota:
+latência p50/p95, nº de comandos SQL, bytes da resposta e pico de memória (tracemalloc, numa passada
+à parte). O cache de respostas fica desligado por padrão, para medir o trabalho real de cada rota.
+Com --gzip as requisições mandam Accept-Encoding: gzip (tempo e bytes já com a compressão).
+
+    python gerar_dados.py --db /tmp/bench.db --ciclos 120 --lancamentos 500000
+    python benchmark.py --db /tmp/bench.db --saida bench-$(git rev-parse --short HEAD).json
+    python benchmark.py --db /tmp/bench.db --comparar bench-anterior.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+CICLO_TESTE = {'nome': 'Bench', 'data_inicio': '2099-01-01', 'data_fim': '2099-01-31', 'orcamento': 1000}
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def _cenarios(c, m):
+    """[(nome, preparar)]: preparar() devolve (método, url, json) e não entra na medição."""
+    with m.app.app_context():
+        ciclo = m.Ciclo.query.filter_by(ativo=True).first()
+        divida = m.Divida.query.filter(m.Divida.status != 'Quitada').first() or m.Divida.query.first()
+    cid = ciclo.id
+    dia = ciclo.data_inicio.strftime('%Y-%m-%d')
+    lanc = {'data': dia, 'descricao': 'bench', 'valor': 12.34, 'categoria': 'Bench', 'forma_pgto': 'Debito'}
+    fixo = {'nome': 'bench', 'valor': 10, 'categoria': 'Bench', 'forma_pgto': 'Debito', 'ciclo_id': cid}
+    inv = {'nome': 'bench', 'valor': 100, 'tipo': 'Renda Fixa'}
+    cartao = {'nome': 'bench', 'valor_atual': 10, 'limite': 1000, 'data_vencimento': dia}
+    div = {'nome': 'bench', 'tipo': 'Outro', 'saldo_inicial': 1000, 'saldo_atual': 1000,
+           'parcela_mensal': 100, 'taxa_mensal': 1, 'total_parcelas': 12}
+
+    def novo(url, corpo):
+        return c.post(url, json=corpo).get_json()['id']
+
+    def fixo_(metodo, url, corpo=None):
+        return lambda: (metodo, url, corpo)
+
+    return [
+        ('GET /api/ciclo', fixo_('GET', '/api/ciclo')),
+        ('GET /api/ciclos', fixo_('GET', '/api/ciclos')),
+        ('GET /api/bootstrap', fixo_('GET', f'/api/bootstrap?ciclo_id={cid}')),
+        ('GET /api/resumo', fixo_('GET', f'/api/resumo?ciclo_id={cid}')),
+        ('GET /api/gastos-fixos', fixo_('GET', f'/api/gastos-fixos?ciclo_id={cid}')),
+        ('GET /api/lancamentos', fixo_('GET', f'/api/lancamentos?ciclo_id={cid}')),
+        ('GET /api/lancamentos?limit=200', fixo_('GET', f'/api/lancamentos?ciclo_id={cid}&limit=200')),
+        ('GET /api/investimentos', fixo_('GET', '/api/investimentos')),
+        ('GET /api/cartoes', fixo_('GET', '/api/cartoes')),
+        ('GET /api/dividas', fixo_('GET', '/api/dividas')),
+        ('GET /api/dividas/projecao', fixo_('GET', '/api/dividas/projecao?extra_mensal=100')),
+        ('GET /api/dividas/<id>/cronograma', fixo_('GET', f'/api/dividas/{divida.id}/cronograma' if divida else '/api/dividas/0/cronograma')),
+        ('GET /api/checklist', fixo_('GET', f'/api/checklist?ciclo_id={cid}')),
+        ('GET /api/relatorio/categorias', fixo_('GET', '/api/relatorio/categorias')),
+        ('GET /api/analytics/categorias', fixo_('GET', '/api/analytics/categorias')),
+        ('GET /api/analytics/orcamento', fixo_('GET', '/api/analytics/orcamento')),
+        ('GET /api/analytics/formas', fixo_('GET', '/api/analytics/formas')),
+        ('GET /api/export/lancamentos', fixo_('GET', f'/api/export/lancamentos?ciclo_id={cid}')),
+        ('GET /api/export/ciclos', fixo_('GET', '/api/export/ciclos?formato=csv')),
+        ('GET /api/busca', fixo_('GET', '/api/busca?q=financiamento+3')),
+        ('GET /api/busca (termo comum)', fixo_('GET', '/api/busca?q=farm')),
+        ('GET /api/busca (filtros)', fixo_('GET', f'/api/busca?q=conta+luz&forma_pgto=Credito&data_inicio={dia}')),
+
+        ('POST /api/lancamentos', fixo_('POST', '/api/lancamentos', lanc)),
+        ('PUT /api/lancamentos/<id>', lambda: ('PUT', f"/api/lancamentos/{novo('/api/lancamentos', lanc)}", {'valor': 99.9})),
+        ('DELETE /api/lancamentos/<id>', lambda: ('DELETE', f"/api/lancamentos/{novo('/api/lancamentos', lanc)}", None)),
+        ('POST /api/lancamentos/bulk', fixo_('POST', '/api/lancamentos/bulk', [lanc] * 100)),
+        ('POST /api/gastos-fixos', fixo_('POST', '/api/gastos-fixos', fixo)),
+        ('PUT /api/gastos-fixos/<id>', lambda: ('PUT', f"/api/gastos-fixos/{novo('/api/gastos-fixos', fixo)}", {'valor': 11})),
+        ('DELETE /api/gastos-fixos/<id>', lambda: ('DELETE', f"/api/gastos-fixos/{novo('/api/gastos-fixos', fixo)}", None)),
+        ('POST /api/investimentos', fixo_('POST', '/api/investimentos', inv)),
+        ('PUT /api/investimentos/<id>', lambda: ('PUT', f"/api/investimentos/{novo('/api/investimentos', inv)}", {'valor': 1})),
+        ('DELETE /api/investimentos/<id>', lambda: ('DELETE', f"/api/investimentos/{novo('/api/investimentos', inv)}", None)),
+        ('POST /api/cartoes', fixo_('POST', '/api/cartoes', cartao)),
+        ('PUT /api/cartoes/<id>', lambda: ('PUT', f"/api/cartoes/{novo('/api/cartoes', cartao)}", {'valor_atual': 5})),
+        ('DELETE /api/cartoes/<id>', lambda: ('DELETE', f"/api/cartoes/{novo('/api/cartoes', cartao)}", None)),
+        ('POST /api/dividas', fixo_('POST', '/api/dividas', div)),
+        ('PUT /api/dividas/<id>', lambda: ('PUT', f"/api/dividas/{novo('/api/dividas', div)}", {'saldo_atual': 900})),
+        ('DELETE /api/dividas/<id>', lambda: ('DELETE', f"/api/dividas/{novo('/api/dividas', div)}", None)),
+        ('PUT /api/checklist', fixo_('PUT', '/api/checklist', {'ciclo_id': cid, 'tipo': 'transaction', 'ref_id': 1, 'checked': 1})),
+        ('PUT /api/checklist/batch', fixo_('PUT', '/api/checklist/batch', {'ciclo_id': cid, 'itens': [
+            {'tipo': 'transaction', 'ref_id': i, 'checked': i % 2} for i in range(1, 201)]})),
+
+        # Ciclos: criar/gerar mudam o ciclo ativo ou o rollup; ficam por último e desfazem o que criaram
+        ('PUT /api/ciclos/<id>', fixo_('PUT', f'/api/ciclos/{cid}', {'orcamento': 4321})),
+        ('POST /api/ciclos/<id>/ativar', fixo_('POST', f'/api/ciclos/{cid}/ativar')),
+        ('POST /api/ciclo', fixo_('POST', '/api/ciclo', CICLO_TESTE)),
+        ('DELETE /api/ciclos/<id>', lambda: ('DELETE', f"/api/ciclos/{novo('/api/ciclo', CICLO_TESTE)}", None)),
+        ('POST /api/ciclos/gerar', fixo_('POST', '/api/ciclos/gerar', {'data_inicio': '2099-03-01', 'meses': 1, 'orcamento': 1})),
+    ], cid
+
+
+def _limpar_ciclos(c, m, cid):
+    """Remove os ciclos criados pelos cenários e reativa o ciclo original."""
+    with m.app.app_context():
+        ids = [i for (i,) in m.db.session.query(m.Ciclo.id).filter(m.Ciclo.data_inicio >= '2099-01-01')]
+    for i in ids:
+        c.delete(f'/api/ciclos/{i}')
+    c.post(f'/api/ciclos/{cid}/ativar')
+
+
+def medir(db, repeticoes, com_cache, rotas=None, gzip=False):
+    if not com_cache:
+        os.environ['RESPOSTAS_CACHE_MAX_BYTES'] = '0'
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db
+    import app as m
+    from sqlalchemy import event
+
+    sql = [0]
+    with m.app.app_context():
+        event.listen(m.db.engine, 'before_cursor_execute', lambda *a: sql.__setitem__(0, sql[0] + 1))
+        contagens = {t: m.db.session.execute(m.text(f'SELECT COUNT(*) FROM {t}')).scalar()
+                     for t in ('ciclo', 'lancamento', 'gasto_fixo', 'divida', 'checklist_status')}
+
+    c = m.app.test_client()
+    cabecalhos = {'Accept-Encoding': 'gzip'} if gzip else {}
+    cenarios, cid = _cenarios(c, m)
+    if rotas:
+        cenarios = [(nome, preparar) for nome, preparar in cenarios if any(r in nome for r in rotas)]
+    resultados = {}
+    for nome, preparar in cenarios:
+        tempos, queries, status, tamanho = [], [], None, 0
+        for i in range(repeticoes + 1):  # a 1ª é aquecimento
+            metodo, url, corpo = preparar()
+            antes = sql[0]
+            t = time.perf_counter()
+            r = c.open(url, method=metodo, json=corpo, headers=cabecalhos)
+            tamanho = len(r.get_data())  # consome respostas em streaming
+            r.close()  # como o servidor WSGI: libera a vaga de limitar() das exportações
+            dur = time.perf_counter() - t
+            if i:
+                tempos.append(dur)
+                queries.append(sql[0] - antes)
+            status = r.status_code
+            if nome in ('POST /api/ciclo', 'POST /api/ciclos/gerar'):
+                _limpar_ciclos(c, m, cid)
+
+        # Memória numa passada separada (tracemalloc deixa tudo mais lento)
+        metodo, url, corpo = preparar()
+        tracemalloc.start()
+        r = c.open(url, method=metodo, json=corpo, headers=cabecalhos)
+        r.get_data()
+        r.close()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if nome in ('POST /api/ciclo', 'POST /api/ciclos/gerar'):
+            _limpar_ciclos(c, m, cid)
+
+        resultados[nome] = {
+            'status': status,
+            'p50_ms': round(_percentil(tempos, .50) * 1000, 3),
+            'p95_ms': round(_percentil(tempos, .95) * 1000, 3),
+            'media_ms': round(statistics.fmean(tempos) * 1000, 3),
+            'queries': int(statistics.median(queries)),
+            'bytes': tamanho,
+            'pico_memoria_kb': round(pico / 1024, 1),
+        }
+        print(f"{nome:<40} {status}  p50={resultados[nome]['p50_ms']:>9.2f}ms  p95={resultados[nome]['p95_ms']:>9.2f}ms"
+              f"  sql={resultados[nome]['queries']:>4}  bytes={tamanho:>9}  mem={resultados[nome]['pico_memoria_kb']:>9.1f}KB")
+
+    # Rotas /api sem cenário (para não esquecer de incluir rotas novas)
+    if rotas:
+        return resultados, contagens
+    cobertas = {n.split('?')[0] for n in resultados}
+    for regra in m.app.url_map.iter_rules():
+        if not regra.rule.startswith('/api/') or regra.rule == '/api/stream':  # SSE: conexão longa, fora do benchmark
+            continue
+        rota = regra.rule.replace('<int:id>', '<id>')
+        for metodo in sorted(regra.methods - {'HEAD', 'OPTIONS'}):
+            if f'{metodo} {rota}' not in cobertas:
+                print(f"aviso: rota sem cenário: {metodo} {rota}", file=sys.stderr)
+
+    return resultados, contagens
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def comparar(atual, base):
+    print(f"\n{'rota':<40} {'p50 base':>10} {'p50 atual':>10} {'Δ%':>8} {'sql':>9} {'bytes':>21}")
+    for nome, r in atual.items():
+        b = base.get(nome)
+        if not b:
+            print(f"{nome:<40} {'-':>10} {r['p50_ms']:>10.2f}")
+            continue
+        delta = (r['p50_ms'] - b['p50_ms']) / b['p50_ms'] * 100 if b['p50_ms'] else 0
+        tamanho = f"{b['bytes']}->{r['bytes']}" if 'bytes' in b and 'bytes' in r else ''
+        print(f"{nome:<40} {b['p50_ms']:>10.2f} {r['p50_ms']:>10.2f} {delta:>+7.1f}% {b['queries']:>4}->{r['queries']:<4}"
+              f" {tamanho:>21}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--db', required=True, help='banco SQLite gerado por gerar_dados.py (não é alterado)')
+    ap.add_argument('--repeticoes', type=int, default=20)
+    ap.add_argument('--com-cache', action='store_true', help='mantém o cache de respostas ligado')
+    ap.add_argument('--gzip', action='store_true', help='requisições com Accept-Encoding: gzip')
+    ap.add_argument('--saida', help='grava os resultados em JSON')
+    ap.add_argument('--comparar', help='JSON de uma execução anterior')
+    ap.add_argument('--rotas', nargs='+', help='só os cenários cujo nome contém um destes trechos (ex.: /api/busca)')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        copia = os.path.join(tmp, 'bench.db')
+        with sqlite3.connect(args.db) as origem, sqlite3.connect(copia) as destino:
+            origem.backup(destino)  # inclui o que ainda está no WAL
+        resultados, contagens = medir(copia, args.repeticoes, args.com_cache, args.rotas, args.gzip)
+
+    saida = {
+        'meta': {
+            'commit': _commit(),
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeticoes': args.repeticoes,
+            'cache': args.com_cache,
+            'gzip': args.gzip,
+            'banco': contagens,
+        },
+        'rotas': resultados,
+    }
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(saida, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados em {args.saida}")
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(resultados, json.load(f)['rotas'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Gera um banco com dados sintéticos (reprodutíveis pela semente) para testes de escala.
+
+Exemplo (10 anos, 500 mil lançamentos):
+
+    python gerar_dados.py --db /tmp/bench.db --ciclos 120 --lancamentos 500000 --dividas 30
+
+O banco indicado precisa ser novo (use --sobrescrever para apagar um existente).
+Também aceita uma URL (--db postgresql+psycopg://...), que deve apontar para um banco vazio.
+Com --tenant os dados vão para esse tenant (criado se preciso), e o banco pode já existir (vários tenants no mesmo arquivo):
+
+    python gerar_dados.py --db /tmp/bench.db --tenant ana --lancamentos 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+CATEGORIAS = ['Alimentação', 'Transporte', 'Moradia', 'Saúde', 'Lazer', 'Educação',
+              'Vestuário', 'Assinatura', 'Utilidades', 'Pets', 'Presentes', 'Outros']
+DESCRICOES = ['Supermercado', 'Padaria', 'Gasolina', 'Uber', 'Farmácia', 'Restaurante', 'Cinema',
+              'Livraria', 'Loja de roupas', 'Streaming', 'Conta de luz', 'Pet shop', 'Feira', 'Ifood']
+LOTE = 10_000
+
+
+def _url(db):
+    return db if '://' in db else 'sqlite:///' + os.path.abspath(db)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--db', required=True, help='arquivo SQLite ou URL do banco')
+    ap.add_argument('--sobrescrever', action='store_true', help='apaga o arquivo SQLite se já existir')
+    ap.add_argument('--tenant', help='tenant dos dados (padrão: APP_TENANT_PADRAO); o tenant precisa estar vazio')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--inicio', default='2024-01-01', help='data de início do 1º ciclo (YYYY-MM-DD)')
+    ap.add_argument('--ciclos', type=int, default=24, help='ciclos mensais consecutivos')
+    ap.add_argument('--fixos', type=int, default=10, help='gastos fixos por ciclo')
+    ap.add_argument('--lancamentos', type=int, default=20_000)
+    ap.add_argument('--dividas', type=int, default=10, help='dívidas, com lançamentos das parcelas pagas')
+    ap.add_argument('--cartoes', type=int, default=5)
+    ap.add_argument('--investimentos', type=int, default=5)
+    ap.add_argument('--checklist', type=float, default=0.5, help='fração dos itens marcados como pagos')
+    args = ap.parse_args()
+
+    url = _url(args.db)
+    if url.startswith('sqlite:///'):
+        caminho = url[len('sqlite:///'):]
+        if os.path.exists(caminho) and args.sobrescrever:
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(caminho + sufixo):
+                    os.remove(caminho + sufixo)
+        elif os.path.exists(caminho) and not args.tenant:  # com --tenant, acrescenta um tenant ao banco
+            sys.exit(f"{caminho} já existe (use --sobrescrever ou --tenant)")
+    os.environ['DATABASE_URL'] = url  # lido pelo app na importação
+    import app as m
+
+    rnd = random.Random(args.seed)
+    t0 = time.perf_counter()
+    with m.app.app_context():
+        m.migrar()  # já roda na importação, a menos que APP_MIGRAR=0
+    with m.app.app_context(), m.usar_tenant(args.tenant or m.app.config['TENANT_PADRAO'], criar=True):
+        if m.Ciclo.query.first():
+            sys.exit("O tenant já tem dados; use um banco (ou --tenant) vazio")
+
+        inicio = datetime.strptime(args.inicio, '%Y-%m-%d').date()
+        ids, erro = m.gerar_ciclos(inicio, 5000.0, meses=args.ciclos)
+        if erro:
+            sys.exit(erro)
+        ciclos = m.Ciclo.query.order_by(m.Ciclo.data_inicio).all()
+        ciclos[-1].ativo = True
+        for c in ciclos:
+            c.orcamento = float(rnd.randrange(3000, 9000, 100))
+        m.db.session.commit()
+        fim = ciclos[-1].data_fim
+        dias = (fim - inicio).days + 1
+
+        fixos = [{'nome': f"{rnd.choice(['Aluguel', 'Internet', 'Celular', 'Academia', 'Streaming', 'Seguro'])} {i + 1}",
+                  'valor': round(rnd.uniform(30, 1500), 2), 'categoria': rnd.choice(CATEGORIAS),
+                  'forma_pgto': 'Credito' if rnd.random() < 0.3 else 'Debito', 'ciclo_id': c.id}
+                 for c in ciclos for i in range(args.fixos)]
+        if fixos:
+            m.db.session.execute(m.GastoFixo.__table__.insert(), fixos)
+
+        dividas = []
+        for i in range(args.dividas):
+            total = rnd.choice([12, 24, 36, 48, 60])
+            saldo = round(rnd.uniform(2000, 80000), 2)
+            taxa = round(rnd.uniform(0.5, 3.5), 2)
+            q = 1 + taxa / 100
+            parcela = round(saldo * (taxa / 100) / (1 - q ** -total), 2)
+            d_ini = inicio + timedelta(days=rnd.randrange(max(dias - 30, 1)))
+            pagas = min(total, max(0, (fim.year - d_ini.year) * 12 + fim.month - d_ini.month))
+            dividas.append(m.Divida(nome=f"{rnd.choice(['Financiamento', 'Empréstimo', 'Consórcio'])} {i + 1}",
+                                    tipo=rnd.choice(['Financiamento', 'Empréstimo', 'Outro']),
+                                    saldo_inicial=saldo, saldo_atual=round(saldo * (1 - pagas / total), 2),
+                                    parcela_mensal=parcela, taxa_mensal=taxa, data_inicio=d_ini,
+                                    total_parcelas=total, status='Quitada' if pagas >= total else 'Ativa'))
+        m.db.session.add_all(dividas)
+        m.db.session.add_all([m.CartaoCredito(nome=f"Cartão {i + 1}", valor_atual=round(rnd.uniform(100, 4000), 2),
+                                              limite=float(rnd.randrange(2000, 20000, 500)),
+                                              data_vencimento=inicio + timedelta(days=rnd.randrange(28)))
+                              for i in range(args.cartoes)])
+        m.db.session.add_all([m.Investimento(nome=f"Investimento {i + 1}", valor=round(rnd.uniform(500, 50000), 2),
+                                             tipo=rnd.choice(['Renda Fixa', 'Renda Variável', 'Tesouro Direto']))
+                              for i in range(args.investimentos)])
+        m.db.session.commit()
+
+        # Parcelas pagas das dívidas (lançamentos vinculados, uma por mês desde o início)
+        pagamentos = []
+        for d in dividas:
+            for k in range(1, d.total_parcelas + 1):
+                dia = m._add_months(d.data_inicio, k - 1)
+                if dia > fim:
+                    break
+                pagamentos.append({'data': dia, 'descricao': f"Parcela {k}/{d.total_parcelas} {d.nome}",
+                                   'valor': d.parcela_mensal, 'categoria': 'Dívidas', 'forma_pgto': 'Debito',
+                                   'divida_id': d.id, 'parcela_num': k, 'ultima_parcela': 0})
+        if pagamentos:
+            m.db.session.execute(m.Lancamento.__table__.insert(), pagamentos)
+
+        for n in range(0, args.lancamentos, LOTE):
+            m.db.session.execute(m.Lancamento.__table__.insert(), [
+                {'data': inicio + timedelta(days=rnd.randrange(dias)), 'descricao': rnd.choice(DESCRICOES),
+                 'valor': round(rnd.lognormvariate(4, 1), 2), 'categoria': rnd.choice(CATEGORIAS),
+                 'forma_pgto': 'Credito' if rnd.random() < 0.35 else 'Debito',
+                 'divida_id': None, 'parcela_num': None, 'ultima_parcela': 0}
+                for _ in range(min(LOTE, args.lancamentos - n))])
+        m.db.session.commit()
+
+        # Checklist: fixos no débito, cartões e dívidas de cada ciclo
+        cartoes = [c.id for c in m.CartaoCredito.query]
+        itens = []
+        for (gid, cid) in m.db.session.query(m.GastoFixo.id, m.GastoFixo.ciclo_id).filter(m.GastoFixo.forma_pgto != 'Credito'):
+            itens.append((cid, 'fixed', gid))
+        for c in ciclos:
+            itens += [(c.id, 'card', i) for i in cartoes] + [(c.id, 'debt', d.id) for d in dividas]
+        agora = datetime.utcnow()
+        marcados = [{'ciclo_id': cid, 'tipo': tipo, 'ref_id': ref, 'checked': 1, 'updated_at': agora}
+                    for cid, tipo, ref in itens if rnd.random() < args.checklist]
+        for n in range(0, len(marcados), LOTE):
+            m.db.session.execute(m.ChecklistStatus.__table__.insert(), marcados[n:n + LOTE])
+        m.db.session.commit()
+
+        # Inserções em massa não passam pelas rotas: o resumo por categoria é calculado no fim
+        m._rollup_reconstruir()
+        m.db.session.commit()
+
+    print(f"{len(ciclos)} ciclos, {len(fixos)} fixos, {args.lancamentos + len(pagamentos)} lançamentos "
+          f"({len(pagamentos)} parcelas de {len(dividas)} dívidas), {args.cartoes} cartões, "
+          f"{len(marcados)} itens de checklist em {time.perf_counter() - t0:.1f}s -> {url}")
+
+
+if __name__ == '__main__':
+    main()
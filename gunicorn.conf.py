@@ -0,0 +1,17 @@
+"""Configuração do gunicorn (lida automaticamente quando o comando roda nesta pasta).
+
+    gunicorn app:app                                # 4 workers x 8 threads (gthread)
+    APP_THREADS=1 gunicorn app:app                  # workers síncronos (1 requisição por processo)
+    APP_WORKERS=8 APP_THREADS=16 gunicorn app:app
+
+Com threads, uma exportação ou analytics lenta ocupa uma thread, não o processo inteiro: o SQLite libera o
+GIL enquanto executa a consulta. O app limita as rotas pesadas simultâneas por worker (APP_LIMITE_PESADAS),
+então sempre sobram threads para as leves. /api/stream (SSE) também precisa de threads.
+"""
+import os
+
+bind = os.environ.get('APP_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('APP_WORKERS') or 4)
+threads = int(os.environ.get('APP_THREADS') or 8)
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('APP_TIMEOUT') or 120)
@@ -0,0 +1,142 @@
+"""Teste de carga simples contra um servidor já em execução.
+
+Exemplo (4 workers do gunicorn + 1 escritor concorrente):
+
+    gunicorn -w 4 -b 127.0.0.1:8000 app:app
+    python loadtest.py --url http://127.0.0.1:8000 --clientes 16 --duracao 20 --escritor
+
+Mede vazão (req/s) e latência p50/p95 das leituras; com --escritor, uma thread
+cria lançamentos continuamente (e os apaga no fim) para medir leitura sob escrita.
+Com --pesadas N, N dos clientes só fazem requisições pesadas (exportação completa,
+lista de lançamentos sem paginação, analytics) e as latências saem separadas:
+mostra quanto uma rota lenta atrapalha as leves (workers síncronos x gthread):
+
+    APP_THREADS=1 gunicorn app:app &   # ou só `gunicorn app:app` (gthread)
+    python loadtest.py --clientes 100 --pesadas 10 --duracao 20
+
+Com --tenants os clientes se dividem entre os tenants (header X-Tenant) e, com --escritor, há um
+escritor por tenant: compara um banco só (uma trava de escrita) com um arquivo por tenant:
+
+    APP_TENANT_ARQUIVOS=/tmp/tenants gunicorn app:app &
+    python loadtest.py --clientes 32 --escritor --tenants ana,bruno,carla,davi
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from urllib.error import HTTPError, URLError
+
+ROTAS_PESADAS = [
+    '/api/export/lancamentos',
+    '/api/lancamentos',
+    '/api/analytics/categorias',
+    '/api/analytics/orcamento',
+]
+ROTAS_LEITURA = [
+    '/api/ciclos',
+    '/api/lancamentos?ciclo_id={ciclo_id}',
+    '/api/gastos-fixos?ciclo_id={ciclo_id}',
+    '/api/dividas',
+    '/api/checklist?ciclo_id={ciclo_id}',
+    '/api/resumo?ciclo_id={ciclo_id}',
+]
+
+
+def _req(url, metodo='GET', corpo=None, tenant=None):
+    dados = json.dumps(corpo).encode() if corpo is not None else None
+    headers = {'Content-Type': 'application/json'} if dados else {}
+    if tenant:
+        headers['X-Tenant'] = tenant
+    r = urllib.request.Request(url, data=dados, method=metodo, headers=headers)
+    with urllib.request.urlopen(r, timeout=30) as resp:
+        return resp.status, resp.read()
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--url', default='http://127.0.0.1:8000')
+    ap.add_argument('--clientes', type=int, default=8, help='threads de leitura concorrentes')
+    ap.add_argument('--duracao', type=float, default=10.0, help='segundos')
+    ap.add_argument('--escritor', action='store_true', help='cria lançamentos durante o teste')
+    ap.add_argument('--pesadas', type=int, default=0, help='dos clientes, quantos fazem só requisições pesadas')
+    ap.add_argument('--tenants', help='tenants separados por vírgula (cada um precisa ter ciclos)')
+    args = ap.parse_args()
+
+    tenants = args.tenants.split(',') if args.tenants else [None]
+    ciclo, rotas = {}, {}
+    for tenant in tenants:
+        ciclos = json.loads(_req(args.url + '/api/ciclos', tenant=tenant)[1])
+        ciclo[tenant] = next((c for c in ciclos if c['ativo']), ciclos[0])
+        rotas[tenant] = [args.url + r.format(ciclo_id=ciclo[tenant]['id']) for r in ROTAS_LEITURA]
+    pesadas = [args.url + r for r in ROTAS_PESADAS]
+
+    fim = time.monotonic() + args.duracao
+    latencias, latencias_pesadas, erros, escritas, criados = [], [], [0], [0], []
+    trava = threading.Lock()
+
+    def leitor(n, tenant, lista, destino):
+        locais, i = [], n
+        while time.monotonic() < fim:
+            t = time.perf_counter()
+            try:
+                _req(lista[i % len(lista)], tenant=tenant)
+                locais.append(time.perf_counter() - t)
+            except (HTTPError, URLError, OSError):
+                with trava:
+                    erros[0] += 1
+            i += 1
+        with trava:
+            destino.extend(locais)
+
+    def escritor(tenant):
+        while time.monotonic() < fim:
+            try:
+                _, corpo = _req(args.url + '/api/lancamentos', 'POST', {
+                    'data': ciclo[tenant]['data_inicio'], 'descricao': 'loadtest', 'valor': 1,
+                    'categoria': 'Teste', 'forma_pgto': 'Debito'}, tenant=tenant)
+                criados.append((tenant, json.loads(corpo)['id']))
+                escritas[0] += 1
+            except (HTTPError, URLError, OSError):
+                with trava:
+                    erros[0] += 1
+
+    threads = []
+    for n in range(args.clientes):
+        tenant = tenants[n % len(tenants)]
+        args_leitor = (n, tenant, pesadas, latencias_pesadas) if n < args.pesadas else (n, tenant, rotas[tenant], latencias)
+        threads.append(threading.Thread(target=leitor, args=args_leitor))
+    if args.escritor:
+        threads += [threading.Thread(target=escritor, args=(tenant,)) for tenant in tenants]
+    inicio = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.monotonic() - inicio
+
+    for tenant, lid in criados:
+        try:
+            _req(f"{args.url}/api/lancamentos/{lid}", 'DELETE', tenant=tenant)
+        except (HTTPError, URLError, OSError):
+            pass
+
+    print(f"leituras: {len(latencias)} em {decorrido:.1f}s = {len(latencias) / decorrido:.1f} req/s")
+    print(f"latência p50={_percentil(latencias, .50) * 1000:.1f}ms p95={_percentil(latencias, .95) * 1000:.1f}ms")
+    if args.pesadas:
+        print(f"pesadas: {len(latencias_pesadas)} = {len(latencias_pesadas) / decorrido:.1f} req/s, "
+              f"p50={_percentil(latencias_pesadas, .50) * 1000:.1f}ms p95={_percentil(latencias_pesadas, .95) * 1000:.1f}ms")
+    if args.escritor:
+        print(f"escritas: {escritas[0]} = {escritas[0] / decorrido:.1f} req/s")
+    print(f"erros: {erros[0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Fixtures dos testes: cada teste roda num tenant novo (dados isolados).
+
+O banco é um SQLite temporário; com TEST_DATABASE_URL (ex.: postgresql+psycopg://...) os testes rodam nele.
+Use um banco só para testes: as tabelas são migradas e cada execução deixa seus tenants lá.
+"""
+import contextlib
+import os
+import tempfile
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+_pasta = tempfile.mkdtemp(prefix='financeiro-testes-')
+os.environ['DATABASE_URL'] = (os.environ.get('TEST_DATABASE_URL')
+                              or 'sqlite:///' + os.path.join(_pasta, 'teste.db'))
+for _var in ('APP_TENANT_ARQUIVOS', 'APP_TENANT_OBRIGATORIO', 'APP_INSTRUMENTACAO'):
+    os.environ.pop(_var, None)
+
+import app as app_module  # noqa: E402  (lê DATABASE_URL ao importar)
+
+
+@pytest.fixture(scope='session')
+def app():
+    return app_module.app
+
+
+def _novo_tenant(app):
+    slug = f't{uuid.uuid4().hex[:12]}'
+    with app.app_context():
+        app_module._resolver_tenant(slug, criar=True)
+    return slug
+
+
+def _cliente(app, slug):
+    c = app.test_client()
+    c.environ_base['HTTP_' + app.config['TENANT_HEADER'].upper().replace('-', '_')] = slug
+    return c
+
+
+@pytest.fixture
+def tenant(app):
+    return _novo_tenant(app)
+
+
+@pytest.fixture
+def client(app, tenant):
+    return _cliente(app, tenant)
+
+
+@pytest.fixture
+def outro_client(app):
+    """Cliente de um segundo tenant, para testar o isolamento entre tenants."""
+    return _cliente(app, _novo_tenant(app))
+
+
+@pytest.fixture
+def no_tenant(app, tenant):
+    """Abre o contexto do app como o tenant do teste (montar e ler dados pelo ORM). Use fora das requisições."""
+    @contextlib.contextmanager
+    def abrir():
+        with app.app_context(), app_module.usar_tenant(tenant):
+            yield app_module.db
+    return abrir
+
+
+@pytest.fixture
+def sql(app):
+    """Instruções executadas no banco durante o teste: [(sql, parâmetros)]."""
+    with app.app_context():
+        engine = app_module.db.engine
+    executadas = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        executadas.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', registrar)
+    yield executadas
+    event.remove(engine, 'before_cursor_execute', registrar)
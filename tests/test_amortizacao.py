@@ -0,0 +1,91 @@
+"""Price e SAC em forma fechada (amortizacao/cronograma) contra uma simulação mês a mês."""
+import pytest
+
+from app import amortizacao, cronograma
+
+
+def _simular(saldo, taxa, sistema, parcela=None, n=None, extra_mensal=0.0, extra_unico=0.0):
+    """[(prestação, juros, amortização, saldo)] mês a mês: juros sobre o saldo, a última paga só o que falta."""
+    saldo = max(saldo - extra_unico, 0.0)
+    if sistema == 'price':
+        if parcela is None:
+            parcela = saldo / n if taxa == 0 else saldo * taxa / (1 - (1 + taxa) ** -n)
+        pagamento = parcela + extra_mensal
+    else:
+        amort = (saldo / n if n else parcela - saldo * taxa) + extra_mensal
+    linhas = []
+    while saldo >= 0.005:
+        juros = saldo * taxa
+        prestacao = min(pagamento, saldo + juros) if sistema == 'price' else min(amort, saldo) + juros
+        saldo -= prestacao - juros
+        linhas.append((prestacao, juros, prestacao - juros, max(saldo, 0.0)))
+        assert len(linhas) <= 1200
+    return linhas
+
+
+CASOS = [
+    # (saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico)
+    (10000, 0.02, 'price', 500, None, 0, 0),
+    (10000, 0.02, 'price', None, 24, 0, 0),
+    (25000, 0.0125, 'price', 750.55, None, 120, 0),
+    (25000, 0.0125, 'price', 750.55, None, 0, 5000),
+    (25000, 0.0125, 'price', None, 48, 200, 3000),
+    (10000, 0.0, 'price', 300, None, 0, 0),       # sem juros: última parcela menor
+    (12000, 0.0, 'price', 1000, None, 0, 0),      # sem juros, divisão exata
+    (12000, 0.0, 'price', None, 10, 250, 1000),
+    (10000, 0.015, 'sac', None, 36, 0, 0),
+    (10000, 0.015, 'sac', 800, None, 0, 0),       # amortização derivada da 1ª prestação
+    (18000, 0.01, 'sac', None, 60, 150, 0),
+    (18000, 0.01, 'sac', None, 60, 0, 4500),
+    (18000, 0.01, 'sac', 900, None, 75.5, 2000),
+    (9000, 0.0, 'sac', None, 12, 0, 0),
+    (9000, 0.0, 'sac', None, 12, 100, 500),
+]
+
+
+@pytest.mark.parametrize('saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico', CASOS)
+def test_resumo_igual_a_simulacao(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico):
+    res = amortizacao(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico)
+    sim = _simular(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico)
+    assert res['parcelas'] == len(sim)
+    assert res['primeira'] == pytest.approx(sim[0][0], abs=0.01)
+    assert res['ultima'] == pytest.approx(sim[-1][0], abs=0.01)
+    assert res['juros'] == pytest.approx(sum(l[1] for l in sim), abs=0.01)
+    assert res['total'] == pytest.approx(sum(l[0] for l in sim), abs=0.01)
+
+
+@pytest.mark.parametrize('saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico', CASOS)
+def test_cronograma_igual_a_simulacao(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico):
+    linhas = cronograma(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico)
+    sim = _simular(saldo, taxa, sistema, parcela, n, extra_mensal, extra_unico)
+    assert [l['parcela'] for l in linhas] == list(range(1, len(sim) + 1))
+    for linha, (prestacao, juros, amortizado, resto) in zip(linhas, sim):
+        assert (linha['prestacao'], linha['juros'], linha['amortizacao'], linha['saldo']) == pytest.approx(
+            (prestacao, juros, amortizado, resto), abs=0.011)
+    assert linhas[-1]['saldo'] == 0
+
+
+def test_extras_reduzem_prazo_e_juros():
+    base = amortizacao(25000, 0.0125, 'price', 750.55)
+    for extras in ({'extra_mensal': 120}, {'extra_unico': 5000}):
+        cenario = amortizacao(25000, 0.0125, 'price', 750.55, **extras)
+        assert cenario['parcelas'] < base['parcelas'] and cenario['juros'] < base['juros']
+
+
+@pytest.mark.parametrize('args, kwargs', [
+    ((10000, 0.02, 'price', 200), {}),           # parcela = juros do mês: nunca quita
+    ((10000, 0.02, 'price', 150), {}),
+    ((10000, 0.02, 'price'), {}),                # sem parcela nem prazo
+    ((10000, 0.02, 'sac', 150), {}),             # 1ª prestação não cobre os juros
+    ((10000, 0.0, 'price', 5), {}),              # passa do limite de parcelas
+])
+def test_sem_quitacao(args, kwargs):
+    assert amortizacao(*args, **kwargs) is None
+    assert cronograma(*args, **kwargs) is None
+
+
+def test_extra_unico_quita_tudo():
+    for sistema in ('price', 'sac'):
+        res = amortizacao(1000, 0.02, sistema, 100, 12, extra_unico=1500)
+        assert res['parcelas'] == 0 and res['total'] == 0
+        assert cronograma(1000, 0.02, sistema, 100, 12, extra_unico=1500) == []
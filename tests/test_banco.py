@@ -0,0 +1,248 @@
+"""Caminhos que dependem do banco (migrações, upsert, busca, janelas): rodam no SQLite e, com
+TEST_DATABASE_URL, no PostgreSQL."""
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date
+
+import pytest
+from sqlalchemy import (Boolean, Column, Date, Float, Integer, MetaData, String, Table, create_engine,
+                        inspect, make_url, text)
+
+import app as app_module
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _lancar(client, dia, descricao, valor, categoria='Mercado', forma_pgto='Debito'):
+    resp = client.post('/api/lancamentos', json={'data': dia, 'descricao': descricao, 'valor': valor,
+                                                 'categoria': categoria, 'forma_pgto': forma_pgto})
+    assert resp.status_code == 201, resp.get_json()
+
+
+def _ciclo(client, nome, inicio, fim, orcamento=3000):
+    resp = client.post('/api/ciclo', json={'nome': nome, 'data_inicio': inicio, 'data_fim': fim,
+                                           'orcamento': orcamento})
+    assert resp.status_code == 201, resp.get_json()
+    return resp.get_json()['id']
+
+
+def test_migrar_idempotente(app):
+    with app.app_context():
+        assert app_module.migrar() == 0
+        assert app_module.migrar() == 0
+        assert app_module._versao_schema() == len(app_module.MIGRACOES)
+
+
+def test_fluxo_basico(client, no_tenant):
+    ciclo_id = _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    _lancar(client, '2025-03-05', 'Mercado', 120.35)
+    _lancar(client, '2025-03-05', 'Mercado', 80.1)   # mesma data e descrição: desempata pelo id
+    _lancar(client, '2025-03-02', 'Farmácia', 45.9, categoria='Saúde')
+    _lancar(client, '2025-03-07', 'Posto', 200, categoria='Mercado', forma_pgto='Credito')
+
+    checklist = client.get(f'/api/checklist?ciclo_id={ciclo_id}').get_json()
+    lancs = checklist['lancamentos']
+    assert [(i['titulo'], i['valor']) for i in lancs] == [('Farmácia', 45.9), ('Mercado', 120.35), ('Mercado', 80.1)]
+
+    # 1ª vez insere, 2ª cai no ON CONFLICT DO UPDATE
+    itens = [{'tipo': i['tipo'], 'ref_id': i['ref_id'], 'checked': 1} for i in lancs]
+    for marcado in (1, 0):
+        itens[0]['checked'] = marcado
+        resp = client.put('/api/checklist/batch', json={'ciclo_id': ciclo_id, 'itens': itens})
+        assert resp.status_code == 200 and resp.get_json()['itens'] == 3
+    lancs = client.get(f'/api/checklist?ciclo_id={ciclo_id}').get_json()['lancamentos']
+    assert [i['checked'] for i in lancs] == [0, 1, 1]
+
+    relatorio = client.get('/api/relatorio/categorias').get_json()
+    assert [(c['categoria'], c['forma_pgto'], c['total'], c['quantidade']) for c in relatorio[0]['categorias']] == [
+        ('Mercado', 'Debito', 200.45, 2), ('Mercado', 'Credito', 200.0, 1), ('Saúde', 'Debito', 45.9, 1)]
+
+    with no_tenant():
+        assert app_module._rollup_divergencias() == []
+
+
+def test_deletar_ciclo_com_fixos_e_checklist(client, no_tenant):
+    """gasto_fixo.ciclo_id é FK sem cascata: no PostgreSQL o ciclo só sai se os fixos saírem antes."""
+    marco = _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    assert client.post('/api/gastos-fixos', json={'nome': 'Luz', 'valor': 150, 'categoria': 'Casa',
+                                                  'ciclo_id': marco}).status_code == 201
+    abril = _ciclo(client, 'Abril', '2025-04-01', '2025-04-30')  # copia os fixos de março
+    _lancar(client, '2025-04-03', 'Mercado', 50)
+    fixo_abril, = client.get(f'/api/gastos-fixos?ciclo_id={abril}').get_json()
+    resp = client.put('/api/checklist/batch', json={'ciclo_id': abril, 'itens': [
+        {'tipo': 'fixed', 'ref_id': fixo_abril['id'], 'checked': 1}]})
+    assert resp.status_code == 200
+
+    assert client.delete(f'/api/ciclos/{abril}').status_code == 200
+    assert [c['id'] for c in client.get('/api/ciclos').get_json()] == [marco]
+    assert [g['nome'] for g in client.get(f'/api/gastos-fixos?ciclo_id={marco}').get_json()] == ['Luz']
+    with no_tenant():
+        assert app_module.GastoFixo.query.filter_by(ciclo_id=abril).count() == 0
+        assert app_module.ChecklistStatus.query.filter_by(ciclo_id=abril).count() == 0
+        assert app_module._rollup_divergencias() == []
+
+
+def test_busca_por_prefixo(client):
+    """SQLite: FTS5; PostgreSQL: um ILIKE por palavra."""
+    _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    _lancar(client, '2025-03-02', 'Farmácia Popular', 30, categoria='Saúde')
+    _lancar(client, '2025-03-03', 'FARMACIA do bairro', 12.5, categoria='Saúde')
+    _lancar(client, '2025-03-04', 'Mercado', 99)
+
+    corpo = client.get('/api/busca?q=farm').get_json()
+    assert corpo['total'] == 2
+    assert sorted(json.dumps(corpo, ensure_ascii=False).count(d) for d in ('Farmácia Popular', 'FARMACIA do bairro',
+                                                                          'Mercado')) == [0, 1, 1]
+
+
+def test_media_movel_arredonda_igual_nos_dois_bancos(client):
+    # média de 10,00 e 10,05 = 1002,5 centavos: o Decimal do PostgreSQL arredondaria para o par (10,02)
+    _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    _ciclo(client, 'Abril', '2025-04-01', '2025-04-30')
+    _lancar(client, '2025-03-10', 'Mercado', 10)
+    _lancar(client, '2025-04-10', 'Mercado', 10.05)
+
+    categorias = client.get('/api/analytics/categorias?janela=2').get_json()
+    formas = client.get('/api/analytics/formas?janela=2').get_json()
+    abril = [r for r in categorias + formas if r['ciclo'] == 'Abril' and r.get('forma_pgto', 'Debito') == 'Debito']
+    assert len(abril) == 2
+    for r in abril:
+        assert r['media_movel'] == round(1002.5 / 100, 2)
+        assert r['variacao'] == 0.05 and r['variacao_pct'] == 0.5
+
+
+# Banco antigo: valores em REAL (reais), sem tenants nem as colunas de dívida dos lançamentos
+def _schema_antigo(engine):
+    meta = MetaData()
+    ciclo = Table('ciclo', meta, Column('id', Integer, primary_key=True), Column('nome', String(100), nullable=False),
+                  Column('data_inicio', Date, nullable=False), Column('data_fim', Date, nullable=False),
+                  Column('orcamento', Float, nullable=False), Column('ativo', Boolean))
+    lancamento = Table('lancamento', meta, Column('id', Integer, primary_key=True),
+                       Column('data', Date, nullable=False), Column('descricao', String(200), nullable=False),
+                       Column('valor', Float, nullable=False), Column('categoria', String(50), nullable=False))
+    divida = Table('divida', meta, Column('id', Integer, primary_key=True),
+                   Column('nome', String(120), nullable=False), Column('tipo', String(50), nullable=False),
+                   Column('saldo_inicial', Float, nullable=False), Column('saldo_atual', Float, nullable=False),
+                   Column('parcela_mensal', Float), Column('taxa_mensal', Float), Column('data_inicio', Date),
+                   Column('data_fim_prevista', Date), Column('status', String(20)))
+    meta.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(ciclo.insert(), [{'id': 1, 'nome': 'Março', 'data_inicio': date(2025, 3, 1),
+                                       'data_fim': date(2025, 3, 31), 'orcamento': 3000.5, 'ativo': True}])
+        conn.execute(lancamento.insert(), [
+            {'id': 1, 'data': date(2025, 3, 2), 'descricao': 'Farmácia', 'valor': 19.99, 'categoria': 'Saúde'},
+            {'id': 2, 'data': date(2025, 3, 3), 'descricao': 'Mercado', 'valor': 0.1 + 0.2, 'categoria': 'Mercado'}])
+        conn.execute(divida.insert(), [{'id': 1, 'nome': 'Carro', 'tipo': 'Financiamento', 'saldo_inicial': 20000,
+                                        'saldo_atual': 15000.75, 'parcela_mensal': 812.34, 'status': 'Ativa'}])
+
+
+@pytest.fixture
+def banco_vazio(app, tmp_path):
+    """URL de um banco novo, do mesmo tipo do de testes."""
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        yield f"sqlite:///{tmp_path / 'antigo.db'}"
+        return
+    nome = f'financeiro_teste_{uuid.uuid4().hex[:12]}'
+    admin = create_engine(url, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.exec_driver_sql(f'CREATE DATABASE {nome}')
+    try:
+        yield url.set(database=nome).render_as_string(hide_password=False)
+    finally:
+        with admin.connect() as conn:
+            conn.exec_driver_sql(f'DROP DATABASE IF EXISTS {nome} WITH (FORCE)')
+        admin.dispose()
+
+
+def _rodar(url, *args):
+    env = {**os.environ, 'DATABASE_URL': url, 'APP_MIGRAR': '0'}
+    feito = subprocess.run([sys.executable, *args], cwd=RAIZ, env=env, capture_output=True, text=True, timeout=120)
+    assert feito.returncode == 0, feito.stderr
+    return feito.stdout
+
+
+def test_migra_banco_antigo(banco_vazio):
+    engine = create_engine(banco_vazio)
+    try:
+        _schema_antigo(engine)
+        assert 'migração(ões) aplicada(s)' in _rodar(banco_vazio, '-m', 'flask', '--app', 'app', 'migrar')
+        assert _rodar(banco_vazio, '-m', 'flask', '--app', 'app', 'migrar').startswith('0 migração(ões)')
+
+        tipos = {c['name']: c['type'] for c in inspect(engine).get_columns('lancamento')}
+        assert isinstance(tipos['valor'], Integer) and {'tenant_id', 'divida_id', 'forma_pgto'} <= set(tipos)
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT valor, tenant_id FROM lancamento ORDER BY id')).all() == [(1999, 1),
+                                                                                                   (30, 1)]
+            assert conn.execute(text('SELECT saldo_atual, parcela_mensal FROM divida')).one() == (1500075, 81234)
+    finally:
+        engine.dispose()
+
+    lido = json.loads(_rodar(banco_vazio, '-c', (
+        "import json, app\n"
+        "c = app.app.test_client()\n"
+        "print(json.dumps({r: c.get(r).get_json() for r in "
+        "('/api/ciclos', '/api/lancamentos?ciclo_id=1', '/api/dividas', '/api/relatorio/categorias')}))")))
+    assert lido['/api/ciclos'][0]['orcamento'] == 3000.5
+    assert sorted(l['valor'] for l in lido['/api/lancamentos?ciclo_id=1']) == [0.3, 19.99]
+    assert (lido['/api/dividas'][0]['saldo_atual'], lido['/api/dividas'][0]['parcela_mensal']) == (15000.75, 812.34)
+    assert {c['categoria']: c['total'] for c in lido['/api/relatorio/categorias'][0]['categorias']} == {
+        'Mercado': 0.3, 'Saúde': 19.99}
+
+
+def test_banco_novo_com_dados_de_exemplo_tem_resumo_consistente(banco_vazio):
+    saida = _rodar(banco_vazio, '-c', (
+        "import json, app\n"
+        "app.init_db()\n"
+        "with app.app.app_context():\n"
+        "    divergencias = [str(d) for d in app._rollup_divergencias()]\n"
+        "c = app.app.test_client()\n"
+        "print(json.dumps({'divergencias': divergencias, 'relatorio': c.get('/api/relatorio/categorias').get_json()}))"))
+    lido = json.loads(saida.splitlines()[-1])
+    assert lido['divergencias'] == []
+    assert {c['categoria']: c['total'] for c in lido['relatorio'][0]['categorias']} == {
+        'Alimentação': 250.0, 'Transporte': 200.0}
+
+
+def test_migracoes_concorrentes_aplicam_uma_vez(banco_vazio):
+    """Dois `flask migrar` no mesmo banco vazio: um migra, o outro espera a trava e acha o schema em dia."""
+    engine = create_engine(banco_vazio)
+    sqlite = engine.dialect.name == 'sqlite'
+    env = {**os.environ, 'DATABASE_URL': banco_vazio, 'APP_MIGRAR': '0'}
+    try:
+        # a trava fica com o teste até os dois processos chegarem nela
+        with engine.connect() as trava:
+            if sqlite:
+                trava.exec_driver_sql('BEGIN IMMEDIATE')
+            else:
+                trava.execute(text('SELECT pg_advisory_lock(:k)'), {'k': app_module.MIGRACAO_TRAVA_PG})
+            procs = [subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'migrar'], cwd=RAIZ, env=env,
+                                      stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) for _ in range(2)]
+            limite = time.monotonic() + 60
+            if sqlite:
+                time.sleep(3)  # sem como ver quem espera o BEGIN IMMEDIATE: tempo de sobra para importar o app
+            else:
+                while trava.execute(text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' "
+                                         "AND NOT granted")).scalar() < 2:
+                    assert time.monotonic() < limite, 'os processos não chegaram na trava'
+                    time.sleep(0.1)
+            assert all(p.poll() is None for p in procs)
+            if sqlite:
+                trava.rollback()
+            else:
+                trava.execute(text('SELECT pg_advisory_unlock(:k)'), {'k': app_module.MIGRACAO_TRAVA_PG})
+                trava.commit()
+
+        saidas = [p.communicate(timeout=120) for p in procs]
+        assert [p.returncode for p in procs] == [0, 0], [err for _, err in saidas]
+        aplicadas = sorted(int(out.split()[0]) for out, _ in saidas)
+        assert aplicadas == [0, len(app_module.MIGRACOES)]
+        with engine.connect() as conn:
+            assert conn.execute(text('SELECT versao FROM versao_schema')).all() == [(len(app_module.MIGRACOES),)]
+            assert conn.execute(text('SELECT count(*) FROM tenant')).scalar() == 1
+    finally:
+        engine.dispose()
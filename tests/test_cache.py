@@ -0,0 +1,98 @@
+"""cache_resposta: 304 pelo ETag, invalidação por escrita em cada tabela listada e vencimento à meia-noite."""
+from datetime import date
+
+import pytest
+
+import app as app_module
+
+
+class Hoje(date):
+    """date com today() controlado pelo teste."""
+    valor = date(2025, 3, 10)
+
+    @classmethod
+    def today(cls):
+        return cls.valor
+
+
+@pytest.fixture
+def ids(client):
+    ciclo = client.post('/api/ciclo', json={'nome': 'Março', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                            'orcamento': 3000}).get_json()['id']
+    divida = client.post('/api/dividas', json={'nome': 'Carro', 'tipo': 'Financiamento', 'saldo_inicial': 20000,
+                                               'saldo_atual': 15000, 'total_parcelas': 10}).get_json()['id']
+    return {'ciclo': ciclo, 'divida': divida}
+
+
+def _rotas_cacheadas(app, ids):
+    """[(url, tabelas)] de todas as rotas com cache_resposta."""
+    rotas = []
+    for regra in app.url_map.iter_rules():
+        tabelas = getattr(app.view_functions[regra.endpoint], 'cache_tabelas', None)
+        if tabelas is not None:
+            url = regra.rule.replace('<int:id>', str(ids['divida']))
+            rotas.append((f"{url}?ciclo_id={ids['ciclo']}&q=mercado", tabelas))
+    return rotas
+
+
+def test_etag_responde_304_com_uma_consulta(client, sql):
+    resp = client.get('/api/ciclos')
+    assert resp.status_code == 200 and resp.headers['Cache-Control'] == 'no-cache'
+    etag = resp.headers['ETag']
+
+    sql.clear()
+    resp = client.get('/api/ciclos', headers={'If-None-Match': etag})
+    assert resp.status_code == 304 and resp.get_data() == b''
+    assert len(sql) == 1 and 'versao_tabela' in sql[0][0]
+
+    sql.clear()
+    resp = client.get('/api/ciclos')  # sem If-None-Match: corpo do cache, mesma consulta de versões
+    assert resp.status_code == 200 and resp.headers['ETag'] == etag
+    assert len(sql) == 1
+
+
+def test_escrita_em_cada_tabela_listada_invalida(app, client, no_tenant, ids):
+    rotas = _rotas_cacheadas(app, ids)
+    assert len(rotas) >= 15
+    for url, tabelas in rotas:
+        etag = client.get(url).headers['ETag']
+        for tabela in tabelas:
+            with no_tenant() as db:
+                app_module._incrementar_versoes(db.session.connection(), [tabela])
+                db.session.commit()
+            resp = client.get(url, headers={'If-None-Match': etag})
+            assert resp.status_code == 200 and resp.headers['ETag'] != etag, (url, tabela)
+            etag = resp.headers['ETag']
+        # tabela que a rota não lê: continua valendo
+        with no_tenant() as db:
+            app_module._incrementar_versoes(db.session.connection(), ['investimento' if 'investimento' not in tabelas
+                                                                       else 'evento'])
+            db.session.commit()
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304, url
+
+
+def test_escrita_pela_rota_invalida(client, ids):
+    url = f"/api/lancamentos?ciclo_id={ids['ciclo']}"
+    antes = client.get(url)
+    client.post('/api/lancamentos', json={'data': '2025-03-05', 'descricao': 'Mercado', 'valor': 10,
+                                          'categoria': 'Alimentação'})
+    depois = client.get(url, headers={'If-None-Match': antes.headers['ETag']})
+    assert depois.status_code == 200 and [l['descricao'] for l in depois.get_json()] == ['Mercado']
+
+
+def test_por_dia_vence_a_meia_noite(client, ids, monkeypatch):
+    monkeypatch.setattr(app_module, 'date', Hoje)
+    dividas = client.get('/api/dividas')
+    ciclos = client.get('/api/ciclos')
+    assert client.get('/api/dividas', headers={'If-None-Match': dividas.headers['ETag']}).status_code == 304
+
+    monkeypatch.setattr(Hoje, 'valor', date(2025, 3, 11))
+    novo = client.get('/api/dividas', headers={'If-None-Match': dividas.headers['ETag']})
+    assert novo.status_code == 200 and novo.headers['ETag'] != dividas.headers['ETag']
+    assert novo.get_json()[0]['data_fim_estimado_atual'] == dividas.get_json()[0]['data_fim_estimado_atual']
+
+    monkeypatch.setattr(Hoje, 'valor', date(2025, 4, 1))  # sem pagamentos, a previsão parte de hoje
+    abril = client.get('/api/dividas').get_json()
+    assert abril[0]['data_fim_estimado_atual'] != dividas.get_json()[0]['data_fim_estimado_atual']
+    # rota sem por_dia não vence com a data
+    assert client.get('/api/ciclos', headers={'If-None-Match': ciclos.headers['ETag']}).status_code == 304
@@ -0,0 +1,125 @@
+"""IndiceCiclos (data -> ciclo por bisect), sobreposição de ciclos e reconstrução do índice após escritas."""
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+from app import Ciclo, IndiceCiclos
+
+D = date.fromisoformat
+
+# Jan e Fev colados, buraco em Março, Abril isolado; Longo (1º/mai a 31/dez) contém Junho
+CICLOS = [(D('2025-01-01'), D('2025-01-31'), 1), (D('2025-02-01'), D('2025-02-28'), 2),
+          (D('2025-04-01'), D('2025-04-30'), 3), (D('2025-05-01'), D('2025-12-31'), 4),
+          (D('2025-06-01'), D('2025-06-30'), 5)]
+
+
+@pytest.mark.parametrize('dia, esperado', [
+    ('2025-01-01', 1), ('2025-01-31', 1), ('2025-02-01', 2), ('2025-02-28', 2),   # 1º e último dia
+    ('2024-12-31', None), ('2025-03-01', None), ('2025-03-31', None),            # antes e no buraco
+    ('2025-04-01', 3), ('2025-04-30', 3), ('2025-05-01', 4),
+    ('2025-05-31', 4), ('2025-06-01', 5), ('2025-06-30', 5), ('2025-07-01', 4),   # sobreposição: o mais recente
+    ('2025-12-31', 4), ('2026-01-01', None),
+])
+def test_buscar(dia, esperado):
+    assert IndiceCiclos(reversed(CICLOS)).buscar(D(dia)) == esperado
+
+
+def test_buscar_igual_a_varredura():
+    indice = IndiceCiclos(CICLOS)
+    d = D('2024-12-25')
+    while d <= D('2026-01-05'):
+        cobrem = [c for c in CICLOS if c[0] <= d <= c[1]]
+        assert indice.buscar(d) == (max(cobrem)[2] if cobrem else None), d
+        d += timedelta(days=1)
+
+
+def test_sobreposicoes():
+    assert IndiceCiclos(CICLOS).sobreposicoes() == [(4, 5)]
+    assert IndiceCiclos(CICLOS[:3]).sobreposicoes() == []  # ciclos que só se encostam não contam
+    um_dia = IndiceCiclos([(D('2025-01-01'), D('2025-01-31'), 1), (D('2025-01-31'), D('2025-02-28'), 2)])
+    assert um_dia.sobreposicoes() == [(1, 2)] and um_dia.buscar(D('2025-01-31')) == 2
+    assert IndiceCiclos([]).buscar(D('2025-01-01')) is None
+
+
+def _ciclo(client, nome, ini, fim):
+    resp = client.post('/api/ciclo', json={'nome': nome, 'data_inicio': ini, 'data_fim': fim, 'orcamento': 1000})
+    assert resp.status_code == 201
+    return resp.get_json()
+
+
+def _lancar(client, dia):
+    return client.post('/api/lancamentos', json={'data': dia, 'descricao': 'X', 'valor': 1, 'categoria': 'Y'})
+
+
+def test_lancamento_nas_bordas_e_no_buraco(client):
+    _ciclo(client, 'Janeiro', '2025-01-01', '2025-01-31')
+    _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    for dia in ('2025-01-01', '2025-01-31', '2025-03-01', '2025-03-31'):
+        assert _lancar(client, dia).status_code == 201, dia
+    for dia in ('2024-12-31', '2025-02-01', '2025-02-28', '2025-04-01'):
+        resp = _lancar(client, dia)
+        assert resp.status_code == 400 and resp.get_json()['error'] == 'Nenhum ciclo cobre esta data', dia
+
+
+def test_sobreposicao_avisada_nas_rotas_e_recusada_na_geracao(client):
+    assert 'aviso' not in _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    abril = _ciclo(client, 'Abril', '2025-03-25', '2025-04-30')
+    assert abril['aviso'] == 'Atenção: o período deste ciclo se sobrepõe a: Março'
+    resp = client.put(f"/api/ciclos/{abril['id']}", json={'data_inicio': '2025-04-01'})
+    assert resp.status_code == 200 and 'aviso' not in resp.get_json()
+
+    resp = client.post('/api/ciclos/gerar', json={'data_inicio': '2025-02-15', 'meses': 3, 'orcamento': 1})
+    assert resp.status_code == 400 and resp.get_json()['error'].startswith('Já existem ciclos nesse período')
+    assert len(client.get('/api/ciclos').get_json()) == 2
+
+
+def test_indice_reconstruido_apos_editar_e_excluir(client):
+    marco = _ciclo(client, 'Março', '2025-03-01', '2025-03-31')['id']
+    assert _lancar(client, '2025-03-31').status_code == 201  # índice montado e em cache
+
+    assert client.put(f'/api/ciclos/{marco}', json={'data_fim': '2025-03-20'}).status_code == 200
+    assert _lancar(client, '2025-03-31').status_code == 400
+    assert client.put(f'/api/ciclos/{marco}', json={'data_inicio': '2025-02-20'}).status_code == 200
+    assert _lancar(client, '2025-02-20').status_code == 201
+
+    assert client.delete(f'/api/ciclos/{marco}').status_code == 200
+    assert _lancar(client, '2025-03-10').status_code == 400
+
+
+def test_indice_reconstruido_por_escrita_de_outro_processo(client, no_tenant):
+    """Sem _invalidar_indice_ciclos (outro worker): a versão da tabela ciclo refaz o índice."""
+    _ciclo(client, 'Março', '2025-03-01', '2025-03-31')
+    assert _lancar(client, '2025-04-10').status_code == 400
+    with no_tenant() as db:
+        db.session.add(Ciclo(nome='Abril', data_inicio=D('2025-04-01'), data_fim=D('2025-04-30'), orcamento=1,
+                             ativo=False))
+        db.session.commit()
+        assert app_module._indice_ciclos_cache  # o cache do processo não foi limpo
+    assert _lancar(client, '2025-04-10').status_code == 201
+
+
+def _fixos(client, ciclo_id):
+    return sorted(f['nome'] for f in client.get(f'/api/gastos-fixos?ciclo_id={ciclo_id}').get_json())
+
+
+@pytest.mark.parametrize('copiar, esperado', [
+    (None, ['Luz']), ('__origem__', ['Luz']), ('', []), (0, []),
+])
+def test_gerar_copia_fixos(client, copiar, esperado):
+    origem = _ciclo(client, 'Janeiro', '2025-01-01', '2025-01-31')['id']  # ativo
+    client.post('/api/gastos-fixos', json={'nome': 'Luz', 'valor': 150, 'categoria': 'Casa', 'ciclo_id': origem})
+    corpo = {'data_inicio': '2025-02-01', 'meses': 2, 'orcamento': 1}
+    if copiar is not None:
+        corpo['copiar_fixos_de'] = str(origem) if copiar == '__origem__' else copiar
+    resp = client.post('/api/ciclos/gerar', json=corpo)
+    assert resp.status_code == 201
+    assert [_fixos(client, i) for i in resp.get_json()['ids']] == [esperado] * 2
+
+
+@pytest.mark.parametrize('copiar', ['abc', '1.5', [1], {'id': 1}])
+def test_gerar_com_copiar_fixos_de_invalido_da_400(client, copiar):
+    resp = client.post('/api/ciclos/gerar', json={'data_inicio': '2025-02-01', 'meses': 2, 'orcamento': 1,
+                                                  'copiar_fixos_de': copiar})
+    assert resp.status_code == 400 and 'error' in resp.get_json()
+    assert client.get('/api/ciclos').get_json() == []
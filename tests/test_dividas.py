@@ -0,0 +1,90 @@
+"""GET /api/dividas: mesma saída da lógica antiga (duas consultas por dívida) com nº fixo de consultas."""
+from datetime import date
+
+from app import Divida, Lancamento, _add_months
+
+
+def _esperado(dividas, pagamentos):
+    """Saída da versão por linha de get_dividas, refeita em Python sobre os mesmos dados."""
+    out = []
+    for d in sorted(dividas, key=lambda d: d.id, reverse=True):
+        meus = [p for p in pagamentos if p.divida_id == d.id]
+        frente = [int(p.parcela_num) for p in meus if p.parcela_num is not None and int(p.ultima_parcela or 0) == 0]
+        final = {int(p.parcela_num) for p in meus if p.parcela_num is not None and int(p.ultima_parcela or 0) == 1}
+
+        parcela_atual = max(frente) if frente else 0
+        total_ajustado = d.total_parcelas - len(final) if d.total_parcelas is not None else None
+        faltam = total_ajustado - parcela_atual if total_ajustado is not None else None
+        proxima = None
+        if total_ajustado is not None:
+            proxima = min(parcela_atual + 1, total_ajustado) if parcela_atual < total_ajustado else total_ajustado
+        base_ref = max((p.data for p in meus), default=None) or date.today()
+        fim = _add_months(base_ref, max(faltam - 1, 0)) if faltam is not None else None
+
+        out.append({
+            'id': d.id, 'nome': d.nome, 'tipo': d.tipo,
+            'saldo_inicial': d.saldo_inicial, 'saldo_atual': d.saldo_atual,
+            'parcela_mensal': d.parcela_mensal, 'taxa_mensal': d.taxa_mensal,
+            'data_inicio': d.data_inicio.strftime('%Y-%m-%d') if d.data_inicio else None,
+            'data_fim_estimado_atual': fim.strftime('%Y-%m-15') if fim else None,
+            'status': d.status,
+            'total_parcelas': d.total_parcelas, 'total_parcelas_ajustada': total_ajustado,
+            'parcela_atual': parcela_atual, 'faltam': faltam, 'proxima_parcela': proxima,
+            'parcelas_registradas': len(set(frente)) + len(final), 'antecipadas_final': len(final),
+        })
+    return out
+
+
+def _pagamento(divida, dia, parcela, ultima=0, valor=500.0):
+    return Lancamento(data=dia, descricao=f'Parcela {divida.nome}', valor=valor, categoria='Dívidas',
+                      forma_pgto='Debito', divida_id=divida.id, parcela_num=parcela, ultima_parcela=ultima)
+
+
+def _semear(db, n):
+    """n dívidas variadas: com pagamentos da frente e do final, parcela repetida, sem total e sem pagamentos."""
+    for i in range(n):
+        d = Divida(nome=f'Dívida {i}', tipo='Financiamento', saldo_inicial=10000 + i, saldo_atual=8000.55 + i,
+                   parcela_mensal=500.0, taxa_mensal=1.2, data_inicio=date(2025, 1 + i % 12, 10),
+                   total_parcelas=None if i % 4 == 1 else 24 + i, status='Ativa')
+        db.session.add(d)
+        db.session.flush()
+        if i % 4 == 2:
+            continue  # sem pagamentos: previsão a partir de hoje
+        for p in range(1, 4 + i % 3):
+            db.session.add(_pagamento(d, date(2025, p, 5 + i % 20), p))
+        db.session.add(_pagamento(d, date(2025, 3, 28), 3))                  # parcela paga duas vezes
+        db.session.add(_pagamento(d, date(2025, 4, 2), None))                # pagamento sem parcela
+        if d.total_parcelas:
+            db.session.add(_pagamento(d, date(2025, 6, 1), d.total_parcelas, ultima=1))
+            db.session.add(_pagamento(d, date(2025, 6, 1), d.total_parcelas - 1, ultima=1))
+    db.session.add(Lancamento(data=date(2025, 5, 1), descricao='Mercado', valor=80.0, categoria='Alimentação',
+                              forma_pgto='Debito'))
+    db.session.commit()
+
+
+def test_saida_igual_a_logica_por_divida(client, no_tenant):
+    with no_tenant() as db:
+        _semear(db, 8)
+        esperado = _esperado(Divida.query.all(), Lancamento.query.all())
+
+    resp = client.get('/api/dividas')
+    assert resp.status_code == 200
+    assert resp.get_json() == esperado
+
+
+def test_numero_de_consultas_nao_cresce_com_as_dividas(client, no_tenant, sql):
+    with no_tenant() as db:
+        _semear(db, 2)
+    client.get('/api/ciclos')  # aquece o que é lido uma vez por processo
+
+    sql.clear()
+    poucas = client.get('/api/dividas').get_json()
+    consultas_poucas = len(sql)
+
+    with no_tenant() as db:
+        _semear(db, 20)
+    sql.clear()
+    muitas = client.get('/api/dividas').get_json()
+
+    assert len(muitas) == len(poucas) + 20
+    assert len(sql) == consultas_poucas
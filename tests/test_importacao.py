@@ -0,0 +1,76 @@
+"""Importação em lote: linha inválida vira erro da linha (400 ou importação parcial), nunca 500."""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def ciclo(client):
+    resp = client.post('/api/ciclo', json={'nome': 'Março', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                           'orcamento': 3000})
+    assert resp.status_code == 201
+    return resp.get_json()['id']
+
+
+def _linha(**campos):
+    return {'data': '2025-03-10', 'descricao': 'Mercado', 'valor': '12,50', 'categoria': 'Alimentação', **campos}
+
+
+RUINS = [
+    ({'valor': 'nan'}, 'valor inválido'),
+    ({'valor': 'inf'}, 'valor inválido'),
+    ({'valor': '1e400'}, 'valor inválido'),
+    ({'valor': 'doze'}, 'could not convert'),
+    ({'data': '31/02/2025'}, 'data inválida'),
+]
+
+
+@pytest.mark.parametrize('campos, erro', RUINS)
+def test_linha_ruim_cancela_a_importacao(client, ciclo, no_tenant, campos, erro):
+    resp = client.post('/api/lancamentos/bulk', json=[_linha(), _linha(**campos)])
+    assert resp.status_code == 400
+    erros = resp.get_json()['erros']
+    assert [e['linha'] for e in erros] == [2] and erro in erros[0]['error']
+    assert client.get(f'/api/lancamentos?ciclo_id={ciclo}').get_json() == []
+
+
+@pytest.mark.parametrize('campos, erro', RUINS)
+def test_linha_ruim_no_modo_parcial(client, ciclo, no_tenant, campos, erro):
+    resp = client.post('/api/lancamentos/bulk?parcial=1', json=[_linha(), _linha(**campos), _linha(valor=3)])
+    assert resp.status_code == 201
+    corpo = resp.get_json()
+    assert corpo['inseridos'] == 2 and [e['linha'] for e in corpo['erros']] == [2]
+    assert sorted(l['valor'] for l in client.get(f'/api/lancamentos?ciclo_id={ciclo}').get_json()) == [3.0, 12.5]
+    with no_tenant():
+        assert app_module._rollup_divergencias() == []
+
+
+def test_numero_json_que_estoura_o_float(client, ciclo):
+    corpo = '[{"data": "2025-03-10", "descricao": "Mercado", "valor": 1e400, "categoria": "Alimentação"}]'
+    resp = client.post('/api/lancamentos/bulk', data=corpo, content_type='application/json')
+    assert resp.status_code == 400 and 'valor inválido' in resp.get_json()['erros'][0]['error']
+
+
+@pytest.mark.parametrize('valor', ['nan', '-inf', 10 ** 400, 1e300, 'R$ 1.000.000.000.000,00'])
+def test_parse_valor_recusa(valor):
+    with pytest.raises(ValueError):
+        app_module._parse_valor(valor)
+
+
+def test_categoria_e_forma_numericas_viram_texto(client, ciclo):
+    resp = client.post('/api/lancamentos/bulk', json=[_linha(categoria=42, forma_pgto=7)])
+    assert resp.status_code == 201
+    lanc, = client.get(f'/api/lancamentos?ciclo_id={ciclo}').get_json()
+    assert (lanc['categoria'], lanc['forma_pgto']) == ('42', '7')
+
+
+@pytest.mark.parametrize('valor', ['nan', 'inf', '1e400'])
+def test_criar_e_editar_lancamento_recusam_valor_nao_finito(client, ciclo, valor):
+    resp = client.post('/api/lancamentos', json=_linha(valor=valor))
+    assert resp.status_code == 400 and 'valor inválido' in resp.get_json()['error']
+
+    resp = client.post('/api/lancamentos', json=_linha(valor=10))
+    lanc_id = resp.get_json()['id']
+    resp = client.put(f'/api/lancamentos/{lanc_id}', json={'valor': valor})
+    assert resp.status_code == 400
+    assert [l['valor'] for l in client.get(f'/api/lancamentos?ciclo_id={ciclo}').get_json()] == [10.0]
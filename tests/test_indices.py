@@ -0,0 +1,66 @@
+"""As consultas em `lancamento` das rotas de lançamentos, checklist e dívidas usam índice, nunca varredura."""
+import re
+from datetime import date, timedelta
+
+import pytest
+
+from app import Ciclo, Divida, Lancamento
+
+
+# SQLite: SCAN, ou um índice usado só pelo tenant_id, que lê todas as linhas do tenant do mesmo jeito
+VARREDURA_SQLITE = re.compile(r'\bSCAN (TABLE )?lancamento\b|\bSEARCH (TABLE )?lancamento USING .*\(tenant_id=\?\)')
+VARREDURA_PG = re.compile(r'Seq Scan on lancamento\b')  # com enable_seqscan=off: nenhum índice serve
+
+
+def _varreduras(db, executadas):
+    """(n de SELECTs em lancamento analisados, [(sql, plano)] dos que varrem a tabela)."""
+    conn = db.session.connection()
+    sqlite = conn.dialect.name == 'sqlite'
+    if not sqlite:
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    analisados, achadas = 0, []
+    for stmt, params in executadas:
+        if not stmt.lstrip().upper().startswith('SELECT') or not re.search(r'\blancamento\b', stmt):
+            continue
+        analisados += 1
+        plano = '\n'.join(str(r[-1]) for r in conn.exec_driver_sql(
+            ('EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN ') + stmt, params))
+        if (VARREDURA_SQLITE if sqlite else VARREDURA_PG).search(plano):
+            achadas.append((stmt, plano))
+    return analisados, achadas
+
+
+@pytest.fixture
+def ciclo_id(no_tenant):
+    with no_tenant() as db:
+        ciclo = Ciclo(nome='Março', data_inicio=date(2025, 3, 1), data_fim=date(2025, 3, 31), orcamento=3000,
+                      ativo=True)
+        divida = Divida(nome='Carro', tipo='Financiamento', saldo_inicial=20000, saldo_atual=15000,
+                        total_parcelas=48, data_inicio=date(2024, 1, 10))
+        db.session.add_all([ciclo, divida])
+        db.session.flush()
+        for i in range(120):
+            dia = date(2025, 1, 1) + timedelta(days=i)
+            db.session.add(Lancamento(data=dia, descricao=f'Compra {i}', valor=10 + i, categoria='Mercado',
+                                      forma_pgto='Credito' if i % 3 else 'Debito'))
+        for p in range(1, 13):
+            db.session.add(Lancamento(data=date(2024, p, 10), descricao='Parcela', valor=500, categoria='Dívidas',
+                                      forma_pgto='Debito', divida_id=divida.id, parcela_num=p))
+        db.session.commit()
+        return ciclo.id
+
+
+@pytest.mark.parametrize('rota', [
+    '/api/lancamentos?ciclo_id={ciclo_id}',
+    '/api/lancamentos?ciclo_id={ciclo_id}&limit=20',
+    '/api/checklist?ciclo_id={ciclo_id}',
+    '/api/dividas',
+])
+def test_rota_nao_varre_lancamento(rota, client, no_tenant, sql, ciclo_id):
+    sql.clear()
+    assert client.get(rota.format(ciclo_id=ciclo_id)).status_code == 200
+
+    with no_tenant() as db:
+        analisados, varreduras = _varreduras(db, list(sql))
+    assert analisados, 'a rota não consultou lancamento'
+    assert not varreduras, '\n\n'.join(f'{stmt}\n-> {plano}' for stmt, plano in varreduras)
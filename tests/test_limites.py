@@ -0,0 +1,41 @@
+"""limitar('pesadas'): sem vaga livre as leituras pesadas respondem 503; a página de lançamentos não espera vaga."""
+import threading
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def sem_vaga(app, monkeypatch):
+    """Grupo 'pesadas' com uma vaga já ocupada e sem espera."""
+    sem = threading.BoundedSemaphore(1)
+    sem.acquire()
+    monkeypatch.setitem(app_module._limites, 'pesadas', sem)
+    monkeypatch.setitem(app.config, 'LIMITE_ESPERA', 0)
+    yield sem
+    sem.release()
+
+
+def test_leituras_pesadas_sem_vaga_dao_503(client, sem_vaga):
+    ciclo = client.post('/api/ciclo', json={'nome': 'Março', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                            'orcamento': 3000}).get_json()['id']
+    for rota in ('/api/lancamentos', f'/api/lancamentos?ciclo_id={ciclo}', '/api/dividas',
+                 f'/api/checklist?ciclo_id={ciclo}', '/api/export/lancamentos', '/api/relatorio/categorias'):
+        resp = client.get(rota)
+        assert resp.status_code == 503 and resp.headers['Retry-After'] == '1', rota
+
+
+def test_lancamentos_paginados_nao_ocupam_vaga(client, sem_vaga):
+    client.post('/api/lancamentos', json={'data': '2025-03-10', 'descricao': 'Mercado', 'valor': 10,
+                                          'categoria': 'Alimentação'})
+    pagina = client.get('/api/lancamentos?limit=1')
+    assert pagina.status_code == 200 and pagina.get_json()['next_cursor'] is None
+    assert client.get('/api/lancamentos?limit=1&cursor=2025-03-11_0').status_code == 200
+
+
+def test_vaga_devolvida_depois_da_resposta(client, sem_vaga):
+    sem_vaga.release()
+    for i in range(3):  # query diferente a cada vez: passa do cache para o limitador
+        assert client.get(f'/api/dividas?x={i}').status_code == 200
+    assert sem_vaga.acquire(blocking=False)
@@ -0,0 +1,63 @@
+"""GET /api/lancamentos paginado: cursor (data, id) em ordem decrescente e projeção por `fields=`."""
+import pytest
+
+
+@pytest.fixture
+def lancamentos(client):
+    """Sete lançamentos, cinco no mesmo dia; devolve os ids na ordem esperada (data desc, id desc)."""
+    ciclo = client.post('/api/ciclo', json={'nome': 'Março', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                            'orcamento': 3000}).get_json()['id']
+    criados = []
+    for i, dia in enumerate(['2025-03-10'] * 5 + ['2025-03-12', '2025-03-05']):
+        resp = client.post('/api/lancamentos', json={'data': dia, 'descricao': f'L{i}', 'valor': i + 1,
+                                                     'categoria': 'Alimentação'})
+        criados.append((dia, resp.get_json()['id']))
+    return ciclo, [i for _, i in sorted(criados, reverse=True)]
+
+
+def _paginar(client, url, limit):
+    paginas, cursor = [], None
+    while True:
+        corpo = client.get(f'{url}&limit={limit}' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        paginas.append([l['id'] for l in corpo['items']])
+        cursor = corpo['next_cursor']
+        if cursor is None:
+            return paginas
+        assert len(paginas) <= 10, 'cursor não avança'
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 4, 7, 8])
+def test_paginas_cobrem_tudo_sem_repetir_com_datas_iguais(client, lancamentos, limit):
+    ciclo, esperado = lancamentos
+    for url in (f'/api/lancamentos?ciclo_id={ciclo}', '/api/lancamentos?x=1'):
+        paginas = _paginar(client, url, limit)
+        assert [i for p in paginas for i in p] == esperado
+        assert all(len(p) == limit for p in paginas[:-1]) and 0 < len(paginas[-1]) <= limit
+
+
+def test_cursor_no_meio_do_dia_desempata_pelo_id(client, lancamentos):
+    _, esperado = lancamentos
+    corpo = client.get('/api/lancamentos?limit=3').get_json()
+    assert [l['id'] for l in corpo['items']] == esperado[:3]
+    assert corpo['next_cursor'] == f'2025-03-10_{esperado[2]}'  # 2º e 3º itens são do mesmo dia
+    resto = client.get(f"/api/lancamentos?limit=10&cursor={corpo['next_cursor']}").get_json()
+    assert [l['id'] for l in resto['items']] == esperado[3:] and resto['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', ['abc', '2025-03-10', '2025-13-01_5', '2025-03-10_x', '_'])
+def test_cursor_invalido_da_400(client, lancamentos, cursor):
+    resp = client.get(f'/api/lancamentos?limit=2&cursor={cursor}')
+    assert resp.status_code == 400 and resp.get_json()['error'] == 'cursor inválido'
+
+
+def test_fields_projeta_colunas(client, lancamentos):
+    _, esperado = lancamentos
+    corpo = client.get('/api/lancamentos?limit=2&fields=descricao, valor').get_json()
+    assert [set(l) for l in corpo['items']] == [{'descricao', 'valor'}] * 2
+    assert corpo['next_cursor'].endswith(f'_{esperado[1]}')  # id e data lidos mesmo fora da projeção
+    assert set(client.get('/api/lancamentos?fields=id').get_json()[0]) == {'id'}
+
+
+def test_fields_desconhecido_da_400(client, lancamentos):
+    resp = client.get('/api/lancamentos?fields=valor,senha,tenant_id')
+    assert resp.status_code == 400 and resp.get_json()['error'] == 'Campos inválidos: senha, tenant_id'
@@ -0,0 +1,107 @@
+"""Resumo por categoria: depois de cada escrita em lançamentos ou ciclos, igual ao recálculo a partir de `lancamento`."""
+from datetime import date
+
+import pytest
+
+import app as app_module
+from app import Lancamento
+
+
+@pytest.fixture
+def ciclos(client):
+    """Março e Abril, com lançamentos nos dois; devolve {nome: id}."""
+    ids = {}
+    for nome, ini, fim in (('Março', '2025-03-01', '2025-03-31'), ('Abril', '2025-04-01', '2025-04-30')):
+        ids[nome] = client.post('/api/ciclo', json={'nome': nome, 'data_inicio': ini, 'data_fim': fim,
+                                                    'orcamento': 3000}).get_json()['id']
+    for dia, desc, valor, cat, forma in (('2025-03-02', 'Mercado', 100.1, 'Alimentação', 'Debito'),
+                                         ('2025-03-31', 'Padaria', 12.35, 'Alimentação', 'Debito'),
+                                         ('2025-04-01', 'Posto', 200, 'Transporte', 'Credito'),
+                                         ('2025-04-15', 'Mercado', 55.5, 'Alimentação', 'Debito')):
+        resp = client.post('/api/lancamentos', json={'data': dia, 'descricao': desc, 'valor': valor,
+                                                     'categoria': cat, 'forma_pgto': forma})
+        assert resp.status_code == 201
+    return ids
+
+
+def _lanc_id(client, ciclo_id, descricao):
+    return next(l['id'] for l in client.get(f'/api/lancamentos?ciclo_id={ciclo_id}').get_json()
+                if l['descricao'] == descricao)
+
+
+def _resumo(client):
+    return {(c['nome'], r['categoria'], r['forma_pgto']): (r['total'], r['quantidade'])
+            for c in client.get('/api/relatorio/categorias').get_json() for r in c['categorias']}
+
+
+def _consistente(no_tenant):
+    with no_tenant():
+        assert app_module._rollup_divergencias() == []
+
+
+def test_criacao(client, ciclos, no_tenant):
+    assert _resumo(client) == {('Março', 'Alimentação', 'Debito'): (112.45, 2),
+                               ('Abril', 'Transporte', 'Credito'): (200.0, 1),
+                               ('Abril', 'Alimentação', 'Debito'): (55.5, 1)}
+    _consistente(no_tenant)
+
+
+def test_edicao_de_valor_categoria_e_forma(client, ciclos, no_tenant):
+    lanc = _lanc_id(client, ciclos['Março'], 'Padaria')
+    assert client.put(f'/api/lancamentos/{lanc}', json={'valor': 20}).status_code == 200
+    assert client.put(f'/api/lancamentos/{lanc}', json={'categoria': 'Lazer', 'forma_pgto': 'Credito'}).status_code == 200
+    resumo = _resumo(client)
+    assert resumo[('Março', 'Alimentação', 'Debito')] == (100.1, 1)
+    assert resumo[('Março', 'Lazer', 'Credito')] == (20.0, 1)
+    _consistente(no_tenant)
+
+
+def test_mudar_data_para_outro_ciclo(client, ciclos, no_tenant):
+    lanc = _lanc_id(client, ciclos['Março'], 'Padaria')
+    assert client.put(f'/api/lancamentos/{lanc}', json={'data': '2025-04-01'}).status_code == 200
+    resumo = _resumo(client)
+    assert resumo[('Março', 'Alimentação', 'Debito')] == (100.1, 1)
+    assert resumo[('Abril', 'Alimentação', 'Debito')] == (67.85, 2)
+    _consistente(no_tenant)
+
+
+def test_exclusao(client, ciclos, no_tenant):
+    assert client.delete(f"/api/lancamentos/{_lanc_id(client, ciclos['Abril'], 'Posto')}").status_code == 200
+    assert ('Abril', 'Transporte', 'Credito') not in _resumo(client)
+    _consistente(no_tenant)
+
+
+def test_edicao_das_datas_do_ciclo(client, ciclos, no_tenant):
+    # Março perde o dia 31 e Abril passa a começar nele; depois Abril encolhe e o dia 1º fica sem ciclo
+    assert client.put(f"/api/ciclos/{ciclos['Março']}", json={'data_fim': '2025-03-30'}).status_code == 200
+    assert client.put(f"/api/ciclos/{ciclos['Abril']}", json={'data_inicio': '2025-03-31'}).status_code == 200
+    assert _resumo(client)[('Abril', 'Alimentação', 'Debito')] == (67.85, 2)
+    _consistente(no_tenant)
+
+    assert client.put(f"/api/ciclos/{ciclos['Abril']}", json={'data_inicio': '2025-04-02'}).status_code == 200
+    resumo = _resumo(client)
+    assert resumo[('Abril', 'Alimentação', 'Debito')] == (55.5, 1)
+    assert ('Abril', 'Transporte', 'Credito') not in resumo
+    _consistente(no_tenant)
+
+
+def test_exclusao_de_ciclo(client, ciclos, no_tenant):
+    assert client.delete(f"/api/ciclos/{ciclos['Abril']}").status_code == 200
+    assert set(_resumo(client)) == {('Março', 'Alimentação', 'Debito')}
+    _consistente(no_tenant)
+
+
+def test_escrita_direta_pelo_orm(client, ciclos, no_tenant):
+    """Sem passar pelas rotas: o flush da sessão mantém o resumo."""
+    with no_tenant() as db:
+        db.session.add(Lancamento(data=date(2025, 3, 20), descricao='Cinema', valor=40, categoria='Lazer',
+                                  forma_pgto='Debito'))
+        padaria = Lancamento.query.filter_by(descricao='Padaria').one()
+        padaria.data, padaria.valor = date(2025, 4, 20), 10
+        db.session.delete(Lancamento.query.filter_by(descricao='Posto').one())
+        db.session.commit()
+    resumo = _resumo(client)
+    assert resumo[('Março', 'Lazer', 'Debito')] == (40.0, 1)
+    assert resumo[('Abril', 'Alimentação', 'Debito')] == (65.5, 2)
+    assert ('Abril', 'Transporte', 'Credito') not in resumo
+    _consistente(no_tenant)
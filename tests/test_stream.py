@@ -0,0 +1,115 @@
+"""GET /api/stream: replay a partir do Last-Event-ID e "recarregar" para quem ficou fora da janela do log."""
+import json
+import time
+
+import pytest
+
+import app as app_module
+
+pytestmark = pytest.mark.skipif(not app_module.app.config['EVENTOS'], reason='eventos só no SQLite')
+
+
+@pytest.fixture
+def curto(app, monkeypatch):
+    """Conexão SSE que termina logo depois do replay."""
+    monkeypatch.setitem(app.config, 'SSE_DURACAO', 0)
+
+
+def _eventos(texto):
+    """[(id, nome, dados)] de um corpo text/event-stream."""
+    saida = []
+    for bloco in texto.split('\n\n'):
+        campos = dict(l.split(': ', 1) for l in bloco.splitlines() if not l.startswith(':'))
+        if campos:
+            saida.append((int(campos['id']), campos.get('event'), json.loads(campos['data'])))
+    return saida
+
+
+def _conectar(client, ultimo=None):
+    headers = {'Last-Event-ID': str(ultimo)} if ultimo is not None else {}
+    resp = client.get('/api/stream', headers=headers)
+    assert resp.status_code == 200 and resp.mimetype == 'text/event-stream'
+    return _eventos(resp.get_data(as_text=True))
+
+
+def _lancar(client, descricao):
+    resp = client.post('/api/lancamentos', json={'data': '2025-03-10', 'descricao': descricao, 'valor': 5,
+                                                 'categoria': 'Alimentação'})
+    assert resp.status_code == 201
+    return resp.get_json()['id']
+
+
+@pytest.fixture
+def ciclo(client):
+    return client.post('/api/ciclo', json={'nome': 'Março', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                           'orcamento': 3000}).get_json()['id']
+
+
+def test_replay_depois_do_last_event_id(client, outro_client, ciclo, curto):
+    (pronto, nome, _), = _conectar(client)
+    assert nome == 'pronto'
+
+    primeiro = _lancar(client, 'Mercado')
+    outro_client.post('/api/ciclo', json={'nome': 'B', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                          'orcamento': 1})  # outro tenant: não aparece no replay
+    segundo = _lancar(client, 'Padaria')
+    client.delete(f'/api/lancamentos/{primeiro}')
+
+    eventos = _conectar(client, pronto)
+    assert [(e[2]['tabela'], e[2]['op'], e[2]['id']) for e in eventos] == [
+        ('lancamento', 'insert', primeiro), ('lancamento', 'insert', segundo), ('lancamento', 'delete', primeiro)]
+    assert [e[0] for e in eventos] == sorted(e[0] for e in eventos) and eventos[0][0] > pronto
+    assert eventos[1][2]['dados']['descricao'] == 'Padaria' and eventos[2][2]['dados'] is None
+
+    # retomando do meio: só o que veio depois
+    assert [e[0] for e in _conectar(client, eventos[0][0])] == [e[0] for e in eventos[1:]]
+    assert _conectar(client, eventos[-1][0]) == []
+
+
+def test_last_event_id_invalido(client):
+    resp = client.get('/api/stream', headers={'Last-Event-ID': 'abc'})
+    assert resp.status_code == 400 and resp.get_json()['error'] == 'Last-Event-ID inválido'
+
+
+def test_cliente_atras_do_log_podado_recarrega(client, ciclo, curto, monkeypatch):
+    (pronto, _, _), = _conectar(client)
+    monkeypatch.setattr(app_module, 'EVENTOS_RETENCAO', 2)
+    monkeypatch.setattr(app_module, 'EVENTOS_PODA_A_CADA', 1)
+    for i in range(4):
+        _lancar(client, f'L{i}')
+
+    (ultimo, nome, dados), = _conectar(client, pronto)  # os primeiros eventos já foram apagados
+    assert nome == 'recarregar' and dados == {}
+    assert _conectar(client, ultimo) == []  # depois de recarregar, segue do fim do log
+
+
+def test_replay_maior_que_a_fila_recarrega(client, ciclo, curto, monkeypatch):
+    (pronto, _, _), = _conectar(client)
+    monkeypatch.setattr(app_module, 'SSE_FILA_MAX', 3)
+    for i in range(3):
+        _lancar(client, f'L{i}')
+    assert [n for _, n, _ in _conectar(client, pronto)] == [None] * 3
+
+    _lancar(client, 'L3')
+    (_, nome, _), = _conectar(client, pronto)
+    assert nome == 'recarregar'
+
+
+def test_fila_cheia_durante_o_stream_recarrega(app, client, ciclo, monkeypatch):
+    monkeypatch.setitem(app.config, 'SSE_DURACAO', 5)
+    monkeypatch.setitem(app.config, 'SSE_INTERVALO', 0.02)
+    monkeypatch.setattr(app_module, 'SSE_FILA_MAX', 2)
+    resp = client.get('/api/stream', buffered=False)
+    partes = iter(resp.response)
+    assert 'event: pronto' in next(partes).decode()
+    ids = [_lancar(client, f'L{i}') for i in range(6)]  # o difusor enche a fila de 2 enquanto ninguém lê
+
+    recebidos, fim = [], time.monotonic() + 5
+    while time.monotonic() < fim:
+        recebidos += _eventos(next(partes).decode())
+        if recebidos and recebidos[-1][1] == 'recarregar':
+            break
+    resp.close()
+    nomes = [n for _, n, _ in recebidos]
+    assert nomes[-1] == 'recarregar' and len(nomes) <= 3  # no máximo o que coube na fila, depois recarregar
+    assert all(d['id'] in ids for _, n, d in recebidos if n is None)
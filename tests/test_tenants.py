@@ -0,0 +1,81 @@
+"""Isolamento entre tenants: um tenant não lê, altera nem apaga dados do outro, e o cache é por tenant."""
+import json
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def dados_a(client):
+    """Ciclo, fixo e lançamento do tenant de `client`."""
+    ciclo = client.post('/api/ciclo', json={'nome': 'Março', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                            'orcamento': 3000}).get_json()['id']
+    fixo = client.post('/api/gastos-fixos', json={'nome': 'Luz', 'valor': 150, 'categoria': 'Casa',
+                                                  'ciclo_id': ciclo}).get_json()['id']
+    lanc = client.post('/api/lancamentos', json={'data': '2025-03-10', 'descricao': 'Mercado', 'valor': 80,
+                                                 'categoria': 'Alimentação'}).get_json()['id']
+    return {'ciclo': ciclo, 'fixo': fixo, 'lancamento': lanc}
+
+
+def _estado(c, d):
+    return {r: c.get(r).get_data(as_text=True) for r in (
+        '/api/ciclos', f"/api/lancamentos?ciclo_id={d['ciclo']}", f"/api/gastos-fixos?ciclo_id={d['ciclo']}",
+        f"/api/checklist?ciclo_id={d['ciclo']}")}
+
+
+def test_leituras_so_veem_o_proprio_tenant(client, outro_client, dados_a):
+    for rota in ('/api/ciclos', '/api/lancamentos', '/api/gastos-fixos', '/api/dividas', '/api/relatorio/categorias'):
+        assert outro_client.get(rota).get_json() == [], rota
+    assert outro_client.get('/api/busca?q=merc').get_json()['total'] == 0
+    assert client.get('/api/busca?q=merc').get_json()['total'] == 1
+    assert outro_client.get('/api/export/lancamentos').get_data(as_text=True) == ''
+    assert outro_client.get('/api/export/ciclos?formato=csv').get_data(as_text=True).splitlines() == [
+        'id,nome,data_inicio,data_fim,orcamento,ativo']
+    assert len(client.get('/api/export/lancamentos').get_data(as_text=True).splitlines()) == 1
+    assert outro_client.get(f"/api/checklist?ciclo_id={dados_a['ciclo']}").status_code == 404
+
+
+def test_escritas_em_ids_de_outro_tenant_dao_404(client, outro_client, dados_a):
+    antes = _estado(client, dados_a)
+    ciclo, lanc, fixo = dados_a['ciclo'], dados_a['lancamento'], dados_a['fixo']
+    tentativas = [
+        outro_client.put(f'/api/ciclos/{ciclo}', json={'nome': 'Invadido', 'data_fim': '2025-04-30'}),
+        outro_client.post(f'/api/ciclos/{ciclo}/ativar'),
+        outro_client.put(f'/api/lancamentos/{lanc}', json={'valor': 1, 'descricao': 'Invadido'}),
+        outro_client.put(f'/api/gastos-fixos/{fixo}', json={'valor': 1}),
+        outro_client.put('/api/checklist', json={'ciclo_id': ciclo, 'tipo': 'fixed', 'ref_id': fixo, 'checked': 1}),
+        outro_client.put('/api/checklist/batch', json={'ciclo_id': ciclo, 'itens': [
+            {'tipo': 'transaction', 'ref_id': lanc, 'checked': 1}]}),
+        outro_client.post('/api/gastos-fixos', json={'nome': 'X', 'valor': 1, 'categoria': 'X', 'ciclo_id': ciclo}),
+        outro_client.delete(f'/api/lancamentos/{lanc}'),
+        outro_client.delete(f'/api/gastos-fixos/{fixo}'),
+        outro_client.delete(f'/api/ciclos/{ciclo}'),
+    ]
+    assert [r.status_code for r in tentativas] == [404] * len(tentativas)
+    assert _estado(client, dados_a) == antes
+    assert json.loads(antes['/api/ciclos'])[0]['ativo'] is True
+
+
+def test_cache_e_etag_por_tenant(client, outro_client, dados_a):
+    a = client.get('/api/ciclos')
+    b = outro_client.get('/api/ciclos')  # mesma rota e query, logo depois: não pode sair do cache de A
+    assert b.get_json() == [] and len(a.get_json()) == 1
+    assert a.headers['ETag'] != b.headers['ETag']
+    assert outro_client.get('/api/ciclos', headers={'If-None-Match': a.headers['ETag']}).status_code == 200
+
+    # escrita em B não invalida A (versões por tenant)
+    outro_client.post('/api/ciclo', json={'nome': 'B', 'data_inicio': '2025-03-01', 'data_fim': '2025-03-31',
+                                          'orcamento': 1})
+    assert client.get('/api/ciclos', headers={'If-None-Match': a.headers['ETag']}).status_code == 304
+    assert [c['nome'] for c in outro_client.get('/api/ciclos').get_json()] == ['B']
+
+
+def test_versoes_de_tenant_novo_criadas_por_upsert(no_tenant):
+    with no_tenant() as db:
+        conn = db.session.connection()
+        antes = app_module._versoes(('ciclo', 'lancamento', 'divida'))
+        for _ in range(2):  # 1ª vez pode inserir a linha, 2ª cai no ON CONFLICT
+            app_module._incrementar_versoes(conn, ['lancamento', 'ciclo'])
+        assert app_module._versoes(('ciclo', 'lancamento', 'divida')) == (antes[0] + 2, antes[1] + 2, antes[2])
+        db.session.rollback()